@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.schemas.ambiente import AmbienteCreate, AmbienteUpdate, AmbienteOut
 from app.crud import ambiente as crud_ambiente
-from core.database import get_db
+from app.services import listados as listados_service
+from core.database import get_db, SessionLocal
 from app.api.dependencies import get_current_user
 from app.schemas.users import UserOut
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
@@ -50,7 +52,15 @@ def get_ambiente_by_id(ambiente_id: int, db: Session = Depends(get_db), current_
     return ambiente
 
 @router.get("/activos/centro/{cod_centro}", response_model=List[AmbienteOut])
-def get_ambientes_activos_by_centro(cod_centro: int, db: Session = Depends(get_db), current_user: UserOut = Depends(get_current_user)):
+def get_ambientes_activos_by_centro(
+    cod_centro: int,
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$", description="Transmitir el listado por lotes: ndjson o json (Opcional)"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    if stream:
+        contenido = listados_service.generar_listado(stream, AmbienteOut, crud_ambiente.iter_ambientes_activos_by_centro, SessionLocal, cod_centro=cod_centro)
+        return StreamingResponse(contenido, media_type=listados_service.FORMATOS[stream])
     ambientes = crud_ambiente.get_ambientes_activos_by_centro(db, cod_centro)
     return ambientes
 
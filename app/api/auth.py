@@ -7,7 +7,7 @@ from app.schemas.auth import ResponseLoggin, ForgotPasswordRequest, ForgotPasswo
 from app.crud.users import get_user_by_email, reset_password, get_user_by_id
 from core.security import create_access_token, create_reset_password_token, verify_reset_password_token
 from core.database import get_db
-from core.email import send_email_async
+from core.email import send_email_async, template_registry
 from core.config import settings
 from fastapi.security import OAuth2PasswordRequestForm
 import logging
@@ -69,49 +69,14 @@ async def forgot_password(
             # Construir enlace de recuperación usando la URL del frontend configurada
             reset_url = f"{settings.frontend_url}/reset-password?token={reset_token}"
             
-            # Preparar el contenido del correo
+            # Preparar el contenido del correo con la plantilla precompilada
             subject = "Recuperación de contraseña - Gestión Formación"
-            email_body = f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                        <div style="text-align: center; margin-bottom: 30px;">
-                            <h1 style="color: #2c3e50;">Gestión Formación</h1>
-                        </div>
-                        
-                        <h2 style="color: #2c3e50;">Recuperación de contraseña</h2>
-                        
-                        <p>Hola <strong>{user.nombre_completo}</strong>,</p>
-                        
-                        <p>Hemos recibido una solicitud para restablecer tu contraseña. Si no fuiste tú quien realizó esta solicitud, puedes ignorar este correo.</p>
-                        
-                        <p>Para crear una nueva contraseña, haz clic en el siguiente enlace:</p>
-                        
-                        <div style="text-align: center; margin: 30px 0;">
-                            <a href="{reset_url}" 
-                               style="background-color: #3498db; color: white; padding: 12px 24px; 
-                                      text-decoration: none; border-radius: 5px; display: inline-block;">
-                                Restablecer contraseña
-                            </a>
-                        </div>
-                        
-                        <p><strong>Este enlace expirará en 15 minutos por seguridad.</strong></p>
-                        
-                        <p>Si el botón no funciona, puedes copiar y pegar el siguiente enlace en tu navegador:</p>
-                        <p style="word-break: break-all; background-color: #f8f9fa; padding: 10px; border-radius: 4px;">
-                            {reset_url}
-                        </p>
-                        
-                        <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-                        
-                        <p style="color: #666; font-size: 12px; text-align: center;">
-                            Este es un mensaje automático, por favor no responda a este correo.<br>
-                            © 2025 Gestión Formación. Todos los derechos reservados.
-                        </p>
-                    </div>
-                </body>
-            </html>
-            """
+            email_body = template_registry.render("password_reset.html", {
+                "subject": subject,
+                "name": user.nombre_completo,
+                "action_url": reset_url,
+                "expire_minutes": 15
+            })
             
             # Enviar correo de forma asíncrona
             email_sent = await send_email_async(
@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from app.schemas.users import UserOut
 from app.schemas.centro_formacion import CentroFormacionOut
 from app.crud import centro_formacion as CrudCentroFormacion
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, cache_catalogo
 from core.database import get_db
 
 router = APIRouter()
@@ -13,7 +13,7 @@ router = APIRouter()
 Solo se obtiene informacion de los centros de formación, no se permite crear, actualizar o eliminar centros de formación.
 """
 
-@router.get("/centros", response_model=List[CentroFormacionOut])
+@router.get("/centros", response_model=List[CentroFormacionOut], dependencies=[Depends(cache_catalogo("centro_formacion"))])
 def get_all_centros_formacion(
     db: Session = Depends(get_db),
     current_user: UserOut = Depends(get_current_user)
@@ -25,7 +25,7 @@ def get_all_centros_formacion(
     return centros_formacion
 
 
-@router.get("/{cod_centro}", response_model=CentroFormacionOut)
+@router.get("/{cod_centro}", response_model=CentroFormacionOut, dependencies=[Depends(cache_catalogo("centro_formacion"))])
 def get_centro_formacion(
     cod_centro: int,
     db: Session = Depends(get_db),
@@ -40,7 +40,7 @@ def get_centro_formacion(
     return centro_formacion
 
 
-@router.get("/nombre/{nombre_centro}", response_model=CentroFormacionOut)
+@router.get("/nombre/{nombre_centro}", response_model=CentroFormacionOut, dependencies=[Depends(cache_catalogo("centro_formacion"))])
 def get_centro_formacion_by_nombre(
     nombre: str,
     db: Session = Depends(get_db),
@@ -55,7 +55,7 @@ def get_centro_formacion_by_nombre(
     return centro_formacion
 
 
-@router.get("/regional/{cod_regional}", response_model= List[CentroFormacionOut])
+@router.get("/regional/{cod_regional}", response_model= List[CentroFormacionOut], dependencies=[Depends(cache_catalogo("centro_formacion"))])
 def get_centro_formacion_by_cod_regional(
     cod_regional: int,
     db: Session = Depends(get_db),
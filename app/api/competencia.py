@@ -1,10 +1,14 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from core.database import get_db
+from core.database import get_db, get_read_db
 from app.schemas.competencia import CompetenciaCreate, CompetenciaOut, CompetenciaUpdate
 from app.crud import competencia as crud_competencia
-from app.api.dependencies import get_current_user
+from app.services import listados as listados_service
+from app.services import versiones as versiones_service
+from app.services.catalogo import catalogo
+from app.api.dependencies import get_current_user, cache_catalogo
 from app.schemas.users import UserOut
 
 router = APIRouter()
@@ -14,11 +18,11 @@ def only_admins(user: UserOut):
     if user.id_rol not in [1, 2]:
         raise HTTPException(status_code=403, detail="No autorizado")
 
-@router.get("/programa/{cod_programa}/{la_version}", response_model=List[CompetenciaOut])
+@router.get("/programa/{cod_programa}/{la_version}", response_model=List[CompetenciaOut], dependencies=[Depends(cache_catalogo("competencia", "programa_competencia"))])
 def get_competencias_by_programa(
     cod_programa: int,
     la_version: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
@@ -28,7 +32,7 @@ def get_competencias_by_programa(
     por lo que el parámetro la_version se mantiene por compatibilidad pero no afecta el resultado.
     """
     try:
-        competencias = crud_competencia.get_competencias_by_programa(db, cod_programa, la_version)
+        competencias = catalogo.get_competencias_by_programa(db, cod_programa)
         return competencias
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -52,16 +56,18 @@ def create_competencia(
             raise HTTPException(status_code=400, detail="La competencia ya existe")
         
         crud_competencia.create_competencia(db, competencia)
+        versiones_service.invalidar_tablas("competencia")
+        catalogo.invalidar()
         return {"message": "Competencia creada correctamente"}
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{cod_competencia}", response_model=CompetenciaOut)
+@router.get("/{cod_competencia}", response_model=CompetenciaOut, dependencies=[Depends(cache_catalogo("competencia"))])
 def get_competencia(
     cod_competencia: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
@@ -77,15 +83,19 @@ def get_competencia(
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/", response_model=List[CompetenciaOut])
+@router.get("/", response_model=List[CompetenciaOut], dependencies=[Depends(cache_catalogo("competencia"))])
 def get_all_competencias(
-    db: Session = Depends(get_db),
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$", description="Transmitir el listado por lotes: ndjson o json (Opcional)"),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
     Obtener todas las competencias.
     """
     try:
+        if stream:
+            contenido = listados_service.generar_listado(stream, CompetenciaOut, crud_competencia.iter_all_competencias)
+            return StreamingResponse(contenido, media_type=listados_service.FORMATOS[stream])
         competencias = crud_competencia.get_all_competencias(db)
         return competencias
     except Exception as e:
@@ -109,6 +119,8 @@ def update_competencia(
             raise HTTPException(status_code=404, detail="Competencia no encontrada")
         
         success = crud_competencia.update_competencia(db, cod_competencia, competencia_update)
+        versiones_service.invalidar_tablas("competencia")
+        catalogo.invalidar()
         if not success:
             raise HTTPException(status_code=400, detail="No se pudo actualizar la competencia")
         
@@ -135,6 +147,8 @@ def delete_competencia(
             raise HTTPException(status_code=404, detail="Competencia no encontrada")
         
         success = crud_competencia.delete_competencia(db, cod_competencia)
+        versiones_service.invalidar_tablas("competencia", "programa_competencia", "resultado_aprendizaje")
+        catalogo.invalidar()
         if not success:
             raise HTTPException(status_code=400, detail="No se pudo eliminar la competencia")
             
@@ -143,10 +157,10 @@ def delete_competencia(
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{cod_competencia}/programas")
+@router.get("/{cod_competencia}/programas", dependencies=[Depends(cache_catalogo("programa_competencia", "programa_formacion"))])
 def get_programas_by_competencia(
     cod_competencia: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
@@ -154,11 +168,11 @@ def get_programas_by_competencia(
     """
     try:
         # Verificar si la competencia existe
-        competencia = crud_competencia.get_competencia_by_id(db, cod_competencia)
+        competencia = catalogo.get_competencia(db, cod_competencia)
         if not competencia:
             raise HTTPException(status_code=404, detail="Competencia no encontrada")
         
-        programas = crud_competencia.get_programas_by_competencia(db, cod_competencia)
+        programas = catalogo.get_programas_by_competencia(db, cod_competencia)
         return programas
     except Exception as e:
         if isinstance(e, HTTPException):
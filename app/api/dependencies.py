@@ -1,21 +1,28 @@
-from fastapi import Depends, HTTPException
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from app.crud.users import get_user_by_email, get_user_by_id
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.users import get_user_by_email, get_user_by_id, get_user_by_id_async
 from core.security import verify_password, verify_token
-from core.database import get_db
+from core.database import get_db, get_async_db
+from app.services import versiones as versiones_service
 from fastapi.security import OAuth2PasswordBearer
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/access/token")
 
-def get_current_user(
-        token: str = Depends(oauth2_scheme), 
-        db: Session = Depends(get_db)
-):
+# Variante sin error automático para los endpoints que aceptan el token por query string
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/access/token", auto_error=False)
+
+def _verify_user_token(token: str) -> int:
     user = verify_token(token)
     if user is None:
         raise HTTPException(status_code=401, detail="Token Invalido")
-    user_db = get_user_by_id(db, user)
+    return user
+
+
+def _check_user(user_db):
     if user_db is None:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     if not user_db.estado:
@@ -23,10 +30,86 @@ def get_current_user(
     return user_db
 
 
+def _resolve_user(token: str, db: Session):
+    return _check_user(get_user_by_id(db, _verify_user_token(token)))
+
+
+def get_current_user(
+        token: str = Depends(oauth2_scheme), 
+        db: Session = Depends(get_db)
+):
+    return _resolve_user(token, db)
+
+
+async def get_current_user_async(
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Igual que `get_current_user` pero con la sesión asíncrona,
+    para los endpoints `async def` que no deben ocupar el threadpool.
+    """
+    user_id = _verify_user_token(token)
+    return _check_user(await get_user_by_id_async(db, user_id))
+
+
+def get_current_user_stream(
+        header_token: Optional[str] = Depends(oauth2_scheme_optional),
+        token: Optional[str] = Query(None, description="Token JWT (EventSource no permite enviar encabezados)"),
+        db: Session = Depends(get_db)
+):
+    """
+    Autenticación para conexiones de larga duración (SSE).
+    Acepta el token en el encabezado Authorization o en el parámetro `token`,
+    ya que EventSource del navegador no permite enviar encabezados.
+    """
+    access_token = header_token or token
+    if not access_token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return _resolve_user(access_token, db)
+
+
+def _no_modificado(request: Request, etag: str, modificada: float) -> bool:
+    # If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etiquetas = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+        return "*" in etiquetas or etag.removeprefix("W/") in etiquetas
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= int(modificada)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cache_catalogo(*tablas: str):
+    """
+    Caché HTTP para los GET de catálogos que leen `tablas`.
+    Agrega ETag y Last-Modified a la respuesta y, si el cliente ya tiene la versión
+    vigente, responde 304 validando solo el JWT, sin consultar la base de datos.
+    Se declara en `dependencies=[...]` del decorador para que se resuelva antes que
+    `get_current_user`.
+    """
+    def dependencia(request: Request, response: Response, token: str = Depends(oauth2_scheme)):
+        _verify_user_token(token)
+        etag, modificada = versiones_service.validadores(tablas)
+        encabezados = {
+            "ETag": etag,
+            "Last-Modified": formatdate(modificada, usegmt=True),
+            "Cache-Control": "private, no-cache",
+        }
+        if _no_modificado(request, etag, modificada):
+            raise HTTPException(status_code=304, headers=encabezados)
+        response.headers.update(encabezados)
+    return dependencia
+
+
 def authenticate_user(username: str, password: str, db: Session):
     user = get_user_by_email(db, username)
     if not user:
         return False
     if not verify_password(password, user.pass_hash):
         return False
-    return user
\ No newline at end of file
+    return user
@@ -0,0 +1,83 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.api.dependencies import get_current_user
+from app.schemas.users import UserOut
+from core.config import settings
+from core.database import get_pool_stats
+from core.diagnostics import slow_query_log
+from core.profiling import perfiles
+
+router = APIRouter()
+
+def _verificar_superadmin(current_user: UserOut):
+    if current_user.id_rol != 1:
+        raise HTTPException(status_code=403, detail="No autorizado para realizar esta acción")
+
+@router.get("/pool")
+def get_estado_pool(
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Estado de los pools de conexiones a la base de datos: conexiones prestadas,
+    overflow en uso y tiempo de espera para obtener una conexión.
+    Solo para superadministradores.
+    """
+    _verificar_superadmin(current_user)
+    return get_pool_stats()
+
+@router.get("/consultas-lentas")
+def get_consultas_lentas(
+    limit: Optional[int] = Query(None, ge=1, description="Número máximo de huellas a devolver"),
+    recientes: int = Query(20, ge=0, le=200, description="Número de capturas recientes a incluir"),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Consultas que superaron el umbral de lentitud, agrupadas por huella (SQL sin valores),
+    de la más lenta a la menos lenta, con parámetros de ejemplo y su EXPLAIN.
+    Solo para superadministradores.
+    """
+    _verificar_superadmin(current_user)
+    return {
+        "umbral_ms": slow_query_log.umbral_ms,
+        "consultas": slow_query_log.get_top(limit),
+        "recientes": slow_query_log.get_recientes(recientes) if recientes else [],
+    }
+
+@router.delete("/consultas-lentas")
+def limpiar_consultas_lentas(
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Vacía el registro de consultas lentas. Solo para superadministradores.
+    """
+    _verificar_superadmin(current_user)
+    slow_query_log.clear()
+    return {"message": "Registro de consultas lentas vaciado"}
+
+@router.get("/perfiles")
+def get_perfiles(
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Últimos perfiles de peticiones tomados con el encabezado X-Profile (o ?profile=1),
+    del más reciente al más antiguo. Solo para superadministradores.
+    """
+    _verificar_superadmin(current_user)
+    return {"habilitado": settings.PROFILING_ENABLED, "perfiles": perfiles.listar()}
+
+@router.get("/perfiles/{perfil_id}", response_class=PlainTextResponse)
+def get_perfil(
+    perfil_id: str,
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Pilas muestreadas de un perfil en formato "collapsed" (una pila por línea con su
+    número de muestras), para abrir en speedscope o flamegraph.pl.
+    Solo para superadministradores.
+    """
+    _verificar_superadmin(current_user)
+    perfil = perfiles.get(perfil_id)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return PlainTextResponse(perfil.collapsed())
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from app.schemas.festivos import FestivoOut, FestivosResponse
-from app.crud import festivos as crud_festivos
+from app.schemas.festivos import FestivoOut, FestivosResponse, DiasHabilesResponse, SumarDiasResponse, DiasClaseFicha
+from app.crud import grupos as crud_grupos
+from app.services.calendario import calendario
+from app.services import versiones as versiones_service
+from app.services import capacidad as capacidad_service
 from core.database import get_db
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, cache_catalogo
 from app.schemas.users import UserOut
 from typing import List, Optional
 from datetime import date
@@ -12,7 +15,7 @@ import logging
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.get("/", response_model=List[FestivoOut])
+@router.get("/", response_model=List[FestivoOut], dependencies=[Depends(cache_catalogo("festivos"))])
 def get_all_festivos(
     db: Session = Depends(get_db),
     current_user: UserOut = Depends(get_current_user)
@@ -24,13 +27,13 @@ def get_all_festivos(
         List[FestivoOut]: Lista de todos los festivos
     """
     try:
-        festivos = crud_festivos.get_festivos(db)
+        festivos = calendario.get_festivos(db)
         return [{"festivo": festivo} for festivo in festivos]
     except Exception as e:
         logger.error(f"Error al obtener festivos: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
-@router.get("/year/{year}", response_model=List[FestivoOut])
+@router.get("/year/{year}", response_model=List[FestivoOut], dependencies=[Depends(cache_catalogo("festivos"))])
 def get_festivos_by_year(
     year: int,
     db: Session = Depends(get_db),
@@ -49,7 +52,7 @@ def get_festivos_by_year(
         if year < 1900 or year > 2100:
             raise HTTPException(status_code=400, detail="Año debe estar entre 1900 y 2100")
         
-        festivos = crud_festivos.get_festivos_by_year(db, year)
+        festivos = calendario.get_festivos(db, year)
         return [{"festivo": festivo} for festivo in festivos]
     except HTTPException:
         raise
@@ -57,7 +60,7 @@ def get_festivos_by_year(
         logger.error(f"Error al obtener festivos por año: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
-@router.get("/festivos-y-domingos", response_model=FestivosResponse)
+@router.get("/festivos-y-domingos", response_model=FestivosResponse, dependencies=[Depends(cache_catalogo("festivos"))])
 def get_festivos_y_domingos(
     year: Optional[int] = Query(None, description="Año para filtrar (opcional, por defecto año actual)"),
     db: Session = Depends(get_db),
@@ -78,11 +81,14 @@ def get_festivos_y_domingos(
         if year and (year < 1900 or year > 2100):
             raise HTTPException(status_code=400, detail="Año debe estar entre 1900 y 2100")
         
-        result = crud_festivos.get_festivos_y_domingos(db, year)
+        festivos = calendario.get_festivos(db, year)
+        # Sin año: domingos del año actual
+        year_domingos = year or date.today().year
+        domingos = calendario.get_domingos(date(year_domingos, 1, 1), date(year_domingos, 12, 31))
         return FestivosResponse(
-            festivos=result["festivos"],
-            domingos=result["domingos"],
-            total_dias=result["total_dias"]
+            festivos=festivos,
+            domingos=domingos,
+            total_dias=len(festivos) + len(domingos)
         )
     except HTTPException:
         raise
@@ -111,7 +117,7 @@ def get_domingos_by_year(
         
         start_date = date(year, 1, 1)
         end_date = date(year, 12, 31)
-        domingos = crud_festivos.get_domingos_in_range(start_date, end_date)
+        domingos = calendario.get_domingos(start_date, end_date)
         
         return {
             "year": year,
@@ -123,3 +129,93 @@ def get_domingos_by_year(
     except Exception as e:
         logger.error(f"Error al obtener domingos: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@router.get("/dias-habiles", response_model=DiasHabilesResponse, dependencies=[Depends(cache_catalogo("festivos"))])
+def get_dias_habiles(
+    fecha_inicio: date = Query(..., description="Fecha inicial (inclusive)"),
+    fecha_fin: date = Query(..., description="Fecha final (inclusive)"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Cuenta los días lectivos (lunes a sábado, sin festivos) entre dos fechas.
+    """
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(status_code=400, detail="La fecha final debe ser mayor o igual a la fecha inicial")
+    try:
+        dias = calendario.contar_dias_habiles(db, fecha_inicio, fecha_fin)
+        return DiasHabilesResponse(fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, dias_habiles=dias)
+    except Exception as e:
+        logger.error(f"Error al contar días hábiles: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@router.get("/sumar-dias", response_model=SumarDiasResponse, dependencies=[Depends(cache_catalogo("festivos"))])
+def sumar_dias_habiles(
+    fecha: date = Query(..., description="Fecha de partida"),
+    dias: int = Query(..., ge=-3650, le=3650, description="Días lectivos a sumar (negativo para restar)"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Calcula la fecha que resulta de sumar N días lectivos a una fecha.
+    """
+    try:
+        resultado = calendario.sumar_dias_habiles(db, fecha, dias)
+        return SumarDiasResponse(fecha=fecha, dias=dias, fecha_resultado=resultado)
+    except Exception as e:
+        logger.error(f"Error al sumar días hábiles: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@router.get("/dias-clase/ficha/{cod_ficha}", response_model=DiasClaseFicha)
+def get_dias_clase_ficha(
+    cod_ficha: int,
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Días de clase totales, transcurridos y restantes de una ficha según sus fechas de inicio y fin.
+    """
+    try:
+        grupo = crud_grupos.get_grupo_by_cod_ficha(db, cod_ficha)
+        if grupo is None:
+            raise HTTPException(status_code=404, detail="Grupo no encontrado")
+        if grupo["fecha_inicio"] is None or grupo["fecha_fin"] is None:
+            raise HTTPException(status_code=400, detail="El grupo no tiene fecha de inicio o fin registrada")
+        return calendario.dias_clase_por_fichas(db, [grupo])[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al calcular días de clase de la ficha {cod_ficha}: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@router.get("/dias-clase/centro/{cod_centro}", response_model=List[DiasClaseFicha])
+def get_dias_clase_centro(
+    cod_centro: int,
+    estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Días de clase de todas las fichas de un centro, calculados en un solo paso vectorizado.
+    """
+    try:
+        grupos = crud_grupos.get_fechas_grupos_by_centro(db, cod_centro, estado_grupo)
+        return calendario.dias_clase_por_fichas(db, grupos)
+    except Exception as e:
+        logger.error(f"Error al calcular días de clase del centro {cod_centro}: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@router.post("/recargar", status_code=status.HTTP_204_NO_CONTENT)
+def recargar_calendario(
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Fuerza la recarga del calendario en memoria después de modificar la tabla festivos.
+    Solo para superadministradores.
+    """
+    if current_user.id_rol != 1:
+        raise HTTPException(status_code=403, detail="No autorizado para realizar esta acción")
+    calendario.invalidar()
+    # Los días hábiles restantes de cada ficha dependen de los festivos
+    capacidad_service.invalidar_capacidad()
+    versiones_service.invalidar_tablas("festivos")
@@ -1,10 +1,17 @@
 from ast import List
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.grupos import GrupoUpdate, GrupoOut, GrupoSelect, GrupoEnriched, DashboardKPISchema, GruposPorMunicipioSchema, GruposPorJornadaSchema, GruposPorModalidadSchema, GruposPorEtapaSchema, GruposPorNivelSchema, GrupoPage, GrupoAdvancedPage
+from app.schemas.programacion import CapacidadResumen
 from app.crud import grupos as crud_grupo
-from core.database import get_db
-from app.api.dependencies import get_current_user
+from app.services import capacidad as capacidad_service
+from app.services import exportacion as exportacion_service
+from app.services import reportes as reportes_service
+from core.database import get_db, get_read_db, get_async_read_db
+from core.serializacion import respuesta_rapida
+from app.api.dependencies import get_current_user, get_current_user_async
 from app.schemas.users import UserOut
 from typing import List, Optional
 
@@ -13,11 +20,11 @@ router = APIRouter()
 # Rutas específicas primero para evitar conflictos con rutas paramétricas
 
 @router.get("/search", response_model=List[GrupoSelect])
-def search_grupos_for_select(
+async def search_grupos_for_select(
     search: str = Query("", description="Texto para buscar en código de ficha, nombre de programa, responsable o nombre del ambiente"),
     limit: int = Query(20, ge=1, le=100, description="Número máximo de resultados"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Busca grupos para usar en un select/autocompletar.
@@ -26,7 +33,7 @@ def search_grupos_for_select(
     Útil para formularios donde se necesita seleccionar un grupo.
     """
     try:
-        grupos = crud_grupo.search_grupos_for_select(db, search_text=search, limit=limit)
+        grupos = await crud_grupo.search_grupos_for_select_async(db, search_text=search, limit=limit)
         return grupos
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -39,7 +46,7 @@ def advanced_search_grupos(
     cod_centro: int,
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
@@ -60,7 +67,7 @@ def advanced_search_grupos(
 def get_all_grupos(
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
@@ -73,7 +80,7 @@ def get_all_grupos(
     
     try:
         result = crud_grupo.get_grupos(db, skip=skip, limit=limit)
-        return result
+        return respuesta_rapida(GrupoOut, result["items"], total_items=result["total_items"])
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -84,7 +91,7 @@ def get_grupos_by_centro(
     cod_centro: int,
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
@@ -92,7 +99,7 @@ def get_grupos_by_centro(
     """
     try:
         result = crud_grupo.get_grupos_by_cod_centro(db, cod_centro=cod_centro, skip=skip, limit=limit)
-        return result
+        return respuesta_rapida(GrupoOut, result["items"], total_items=result["total_items"])
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -100,7 +107,7 @@ def get_grupos_by_centro(
 
 
 @router.get("/kpis", response_model=DashboardKPISchema)
-def get_dashboard_kpis(
+async def get_dashboard_kpis(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -109,23 +116,40 @@ def get_dashboard_kpis(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene el número total de grupos según los filtros aplicados.
     """
     try:
-        kpis = crud_grupo.get_dashboard_kpis(db, cod_centro=cod_centro, estado_grupo=estado_grupo, nombre_nivel=nombre_nivel, etapa=etapa, modalidad=modalidad, jornada=jornada, nombre_municipio=nombre_municipio, año=año)
+        kpis = await crud_grupo.get_dashboard_kpis_async(db, cod_centro=cod_centro, estado_grupo=estado_grupo, nombre_nivel=nombre_nivel, etapa=etapa, modalidad=modalidad, jornada=jornada, nombre_municipio=nombre_municipio, año=año)
         return kpis
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/capacidad", response_model=CapacidadResumen)
+def get_dashboard_capacidad(
+    cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
+    estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
+    db: Session = Depends(get_read_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Métrica del dashboard: horas lectivas programadas y pendientes de las fichas activas del centro.
+    El cálculo se guarda en caché y se invalida al modificar la programación.
+    """
+    try:
+        return capacidad_service.get_resumen_capacidad(db, cod_centro, estado_grupo)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # --- Endpoints de Distribución con Filtros ---
 
 @router.get("/distribucion/por-municipio", response_model=List[GruposPorMunicipioSchema])
-def get_distribucion_por_municipio(
+async def get_distribucion_por_municipio(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -134,19 +158,20 @@ def get_distribucion_por_municipio(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene la distribución de grupos por municipio con filtros.
     """
     try:
-        return crud_grupo.get_grupos_por_municipio_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        distribucion = await crud_grupo.get_distribucion_filtrada_async(db, "municipio", cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return respuesta_rapida(GruposPorMunicipioSchema, distribucion)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/distribucion/por-jornada", response_model=List[GruposPorJornadaSchema])
-def get_distribucion_por_jornada(
+async def get_distribucion_por_jornada(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -155,19 +180,20 @@ def get_distribucion_por_jornada(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene la distribución de grupos por jornada con filtros.
     """
     try:
-        return crud_grupo.get_grupos_por_jornada_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        distribucion = await crud_grupo.get_distribucion_filtrada_async(db, "jornada", cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return respuesta_rapida(GruposPorJornadaSchema, distribucion)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/distribucion/por-modalidad", response_model=List[GruposPorModalidadSchema])
-def get_distribucion_por_modalidad(
+async def get_distribucion_por_modalidad(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -176,19 +202,20 @@ def get_distribucion_por_modalidad(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene la distribución de grupos por modalidad con filtros.
     """
     try:
-        return crud_grupo.get_grupos_por_modalidad_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        distribucion = await crud_grupo.get_distribucion_filtrada_async(db, "modalidad", cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return respuesta_rapida(GruposPorModalidadSchema, distribucion)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/distribucion/por-etapa", response_model=List[GruposPorEtapaSchema])
-def get_distribucion_por_etapa(
+async def get_distribucion_por_etapa(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -197,19 +224,20 @@ def get_distribucion_por_etapa(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene la distribución de grupos por etapa con filtros.
     """
     try:
-        return crud_grupo.get_grupos_por_etapa_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        distribucion = await crud_grupo.get_distribucion_filtrada_async(db, "etapa", cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return respuesta_rapida(GruposPorEtapaSchema, distribucion)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/distribucion/por-nivel", response_model=List[GruposPorNivelSchema])
-def get_distribucion_por_nivel(
+async def get_distribucion_por_nivel(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -218,25 +246,92 @@ def get_distribucion_por_nivel(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene la distribución de grupos por nivel de formación con filtros.
     """
     try:
-        return crud_grupo.get_grupos_por_nivel_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        distribucion = await crud_grupo.get_distribucion_filtrada_async(db, "nivel", cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return respuesta_rapida(GruposPorNivelSchema, distribucion)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/exportar/parquet", response_class=FileResponse)
+def exportar_grupos_parquet(
+    cod_centro: Optional[int] = Query(None, description="Código del centro de formación (Opcional, sin él se exportan todos)"),
+    estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
+    nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
+    etapa: Optional[str] = Query(None, description="Etapa (Opcional)"),
+    modalidad: Optional[str] = Query(None, description="Modalidad (Opcional)"),
+    jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
+    nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
+    año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
+    db: Session = Depends(get_read_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Descarga en Parquet (un row group por lote, comprimido) los grupos filtrados con
+    sus datos de aprendices. Reemplaza recorrer `/grupos/` página por página.
+    Si los datos no cambiaron desde la última exportación con los mismos filtros, se
+    entrega el archivo ya generado. Solo disponible para administradores.
+    """
+    if current_user.id_rol not in [1, 2]:
+        raise HTTPException(status_code=401, detail="No autorizado para exportar los grupos")
+
+    try:
+        ruta = exportacion_service.exportar_grupos_parquet(
+            db, cod_centro=cod_centro, estado_grupo=estado_grupo, nombre_nivel=nombre_nivel, etapa=etapa,
+            modalidad=modalidad, jornada=jornada, nombre_municipio=nombre_municipio, año=año
+        )
+        nombre = f"grupos_{cod_centro if cod_centro is not None else 'todos'}.parquet"
+        return FileResponse(ruta, media_type="application/vnd.apache.parquet", filename=nombre)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/export")
+def exportar_grupos(
+    formato: str = Query("csv", pattern="^(csv|xlsx)$", description="Formato del archivo: csv o xlsx"),
+    cod_centro: Optional[int] = Query(None, description="Código del centro de formación (Opcional, sin él se exportan todos)"),
+    estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
+    nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
+    etapa: Optional[str] = Query(None, description="Etapa (Opcional)"),
+    modalidad: Optional[str] = Query(None, description="Modalidad (Opcional)"),
+    jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
+    nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
+    año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Descarga los grupos filtrados con sus datos de aprendices en CSV o XLSX.
+    El archivo se genera por lotes mientras se descarga. Solo disponible para administradores.
+    """
+    if current_user.id_rol not in [1, 2]:
+        raise HTTPException(status_code=401, detail="No autorizado para exportar los grupos")
+
+    try:
+        contenido = reportes_service.generar_reporte(
+            formato, crud_grupo.COLUMNAS_EXPORTACION, crud_grupo.iter_grupos_exportacion, "Grupos",
+            cod_centro=cod_centro, estado_grupo=estado_grupo, nombre_nivel=nombre_nivel, etapa=etapa,
+            modalidad=modalidad, jornada=jornada, nombre_municipio=nombre_municipio, año=año
+        )
+        return StreamingResponse(
+            contenido,
+            media_type=reportes_service.FORMATOS[formato],
+            headers={"Content-Disposition": f'attachment; filename="grupos.{formato}"'}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 # Rutas paramétricas al final
 
 @router.get("/{cod_ficha}", response_model=GrupoEnriched)
 def get_grupo(
     cod_ficha: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
@@ -272,6 +367,7 @@ def update_grupo(
         success = crud_grupo.update_grupo(db, cod_ficha, grupo)
         if not success:
             raise HTTPException(status_code=404, detail="Grupo no encontrado o sin cambios para aplicar")
+        exportacion_service.invalidar_exportaciones()
         return {"message": "Grupo actualizado correctamente"}
     except Exception as e:
         if isinstance(e, HTTPException):
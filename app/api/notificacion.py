@@ -1,28 +1,84 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+from typing import AsyncIterator, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import get_db, get_async_db
+from core.broker import notification_broker
 from app.schemas import notificacion as schemas
 from app.schemas.users import UserOut
 from app.crud import notificacion as crud_notificacion
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, get_current_user_async, get_current_user_stream
 
 router = APIRouter()
 
+# Intervalo del comentario de keep-alive para que proxies no cierren la conexión SSE
+SSE_HEARTBEAT_SECONDS = 15
+
+
+async def sse_event_stream(request: Request, user_id: int, queue: asyncio.Queue) -> AsyncIterator[str]:
+    """
+    Generador de eventos SSE para una suscripción del broker.
+    Libera la suscripción cuando el cliente se desconecta.
+    """
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                evento = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+            yield f"event: notificacion\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+    finally:
+        notification_broker.unsubscribe(user_id, queue)
+
+@router.get("/stream")
+async def stream_notificaciones(
+    request: Request,
+    current_user: UserOut = Depends(get_current_user_stream)
+):
+    """
+    Canal Server-Sent Events con las notificaciones nuevas del usuario actual.
+    
+    El cliente se suscribe una sola vez (por ejemplo con `new EventSource("/notificaciones/stream?token=...")`)
+    y recibe un evento `notificacion` por cada notificación creada, en lugar de consultar
+    periódicamente `GET /notificaciones/`. La autenticación se hace solo al conectarse.
+    """
+    queue = notification_broker.subscribe(current_user.id_usuario)
+    return StreamingResponse(
+        sse_event_stream(request, current_user.id_usuario, queue),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Evita que nginx acumule los eventos
+        }
+    )
+
 @router.get("/", response_model=List[schemas.Notificacion])
-def get_notificaciones(
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+async def get_notificaciones(
+    skip: int = Query(0, ge=0, description="Número de notificaciones a omitir"),
+    limit: int = Query(50, ge=1, le=200, description="Número máximo de notificaciones a devolver"),
+    solo_no_leidas: bool = Query(False, description="Retornar solo las notificaciones sin leer"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
-    Obtiene todas las notificaciones del usuario actual.
+    Obtiene una página de notificaciones del usuario actual.
     
     Returns:
         Lista de notificaciones del usuario ordenadas por fecha descendente
     """
-    notificaciones = crud_notificacion.get_notifications_by_user_id(
+    notificaciones = await crud_notificacion.get_notifications_by_user_id_async(
         db=db, 
-        user_id=current_user.id_usuario
+        user_id=current_user.id_usuario,
+        skip=skip,
+        limit=limit,
+        solo_no_leidas=solo_no_leidas
     )
     
     if notificaciones is None:
@@ -33,6 +89,55 @@ def get_notificaciones(
     
     return notificaciones
 
+@router.get("/unread-count", response_model=schemas.NotificacionesNoLeidas)
+async def get_notificaciones_no_leidas(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserOut = Depends(get_current_user_async)
+):
+    """
+    Obtiene el número de notificaciones sin leer del usuario actual.
+    Pensado para el contador de la campana sin descargar la lista completa.
+    """
+    total = await crud_notificacion.count_unread_notifications_async(db=db, user_id=current_user.id_usuario)
+    
+    if total is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al contar las notificaciones"
+        )
+    
+    return {"total": total}
+
+@router.put("/leer-todas")
+def marcar_notificaciones_leidas(
+    payload: Optional[schemas.MarcarNotificacionesLeidas] = None,
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Marca como leídas varias notificaciones del usuario actual en una sola operación.
+    Si no se envían IDs, se marcan todas las notificaciones sin leer.
+    
+    Returns:
+        Mensaje de confirmación con el número de notificaciones actualizadas
+    """
+    actualizadas = crud_notificacion.mark_notifications_as_read(
+        db=db,
+        user_id=current_user.id_usuario,
+        notificacion_ids=payload.ids if payload else None
+    )
+    
+    if actualizadas is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al marcar las notificaciones como leídas"
+        )
+    
+    return {
+        "message": "Notificaciones marcadas como leídas exitosamente",
+        "actualizadas": actualizadas
+    }
+
 @router.put("/{id_notificacion}/leer")
 def marcar_notificacion_leida(
     id_notificacion: int,
@@ -1,13 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.schemas.programacion import (ProgramacionCreate, ProgramacionUpdate, ProgramacionOut, 
-                                    CompetenciaOut, ResultadoAprendizajeOut, ValidarCruceRequest, ValidarCruceResponse)
+                                    CompetenciaOut, ResultadoAprendizajeOut, ValidarCruceRequest, ValidarCruceResponse,
+                                    CapacidadCentro, CapacidadFicha)
 from app.crud import programacion as crud_programacion
-from core.database import get_db
-from app.api.dependencies import get_current_user
+from app.crud import grupos as crud_grupos
+from app.services.calendario import calendario
+from app.services.catalogo import catalogo
+from app.services import capacidad as capacidad_service
+from app.services import reportes as reportes_service
+from app.services import listados as listados_service
+from core.database import get_db, get_read_db, get_async_read_db
+from core.serializacion import respuesta_rapida
+from app.api.dependencies import get_current_user, get_current_user_async
 from app.schemas.users import UserOut
-from typing import List
+from typing import List, Optional
+from datetime import date
 
 router = APIRouter()
 
@@ -53,10 +65,16 @@ def validar_cruce_programacion(
         resultado_verificacion = db.execute(verificacion_query, verificacion_params).mappings().first()
         
         conflicto = resultado_verificacion and resultado_verificacion['conflictos'] > 0
+        dia_no_lectivo = not calendario.es_dia_lectivo(db, request.fecha_programada)
+        
+        mensaje = "El instructor ya tiene una programación que se cruza en este horario" if conflicto else "No hay conflictos de horario"
+        if dia_no_lectivo:
+            mensaje += ". La fecha programada es domingo o festivo"
         
         return ValidarCruceResponse(
             conflicto=conflicto,
-            mensaje="El instructor ya tiene una programación que se cruza en este horario" if conflicto else "No hay conflictos de horario"
+            mensaje=mensaje,
+            dia_no_lectivo=dia_no_lectivo
         )
         
     except Exception as e:
@@ -69,7 +87,7 @@ def validar_cruce_programacion(
 def get_competencias_by_programa(
     cod_programa: int,
     la_version: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
@@ -79,7 +97,7 @@ def get_competencias_by_programa(
     por lo que el parámetro la_version se mantiene por compatibilidad pero no afecta el resultado.
     """
     try:
-        competencias = crud_programacion.get_competencias_by_programa(db, cod_programa=cod_programa, la_version=la_version)
+        competencias = catalogo.get_competencias_by_programa(db, cod_programa, orden="nombre")
         return competencias
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -89,14 +107,14 @@ def get_competencias_by_programa(
 @router.get("/resultados/{cod_competencia}", response_model=List[ResultadoAprendizajeOut])
 def get_resultados_by_competencia(
     cod_competencia: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
     Obtiene todos los resultados de aprendizaje para una competencia específica.
     """
     try:
-        resultados = crud_programacion.get_resultados_by_competencia(db, cod_competencia=cod_competencia)
+        resultados = catalogo.get_resultados_by_competencia(db, cod_competencia)
         return resultados
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -104,10 +122,10 @@ def get_resultados_by_competencia(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/instructor/{id_instructor}", response_model=List[ProgramacionOut])
-def get_programaciones_by_instructor(
+async def get_programaciones_by_instructor(
     id_instructor: int,
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene todas las programaciones de un instructor específico.
@@ -119,19 +137,20 @@ def get_programaciones_by_instructor(
         raise HTTPException(status_code=403, detail="No autorizado para ver las programaciones de otro instructor")
 
     try:
-        programaciones = crud_programacion.get_programaciones_by_instructor(db, id_instructor=id_instructor)
-        return programaciones
+        programaciones = await crud_programacion.get_programaciones_by_instructor_async(db, id_instructor=id_instructor)
+        return respuesta_rapida(ProgramacionOut, programaciones)
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/all", response_model=List[ProgramacionOut])
-def get_all_programaciones(
+async def get_all_programaciones(
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a devolver"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$", description="Transmitir todas las programaciones por lotes, sin paginar: ndjson o json (Opcional)"),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene todas las programaciones con paginación.
@@ -141,8 +160,12 @@ def get_all_programaciones(
         raise HTTPException(status_code=403, detail="No autorizado para ver todas las programaciones")
 
     try:
-        programaciones = crud_programacion.get_all_programaciones(db, skip=skip, limit=limit)
-        return programaciones
+        if stream:
+            # El listado completo se lee con la sesión síncrona en el threadpool; skip y limit no aplican
+            contenido = await run_in_threadpool(listados_service.generar_listado, stream, ProgramacionOut, crud_programacion.iter_all_programaciones)
+            return StreamingResponse(contenido, media_type=listados_service.FORMATOS[stream])
+        programaciones = await crud_programacion.get_all_programaciones_async(db, skip=skip, limit=limit)
+        return respuesta_rapida(ProgramacionOut, programaciones)
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -151,7 +174,7 @@ def get_all_programaciones(
 @router.get("/detalle/{id_programacion}", response_model=ProgramacionOut)
 def get_programacion_by_id(
     id_programacion: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: UserOut = Depends(get_current_user)
 ):
     """
@@ -167,19 +190,94 @@ def get_programacion_by_id(
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/export")
+def exportar_programaciones(
+    formato: str = Query("csv", pattern="^(csv|xlsx)$", description="Formato del archivo: csv o xlsx"),
+    cod_regional: Optional[int] = Query(None, description="Código de la regional (Opcional)"),
+    cod_centro: Optional[int] = Query(None, description="Código del centro de formación (Opcional)"),
+    id_instructor: Optional[int] = Query(None, description="ID del instructor (Opcional)"),
+    cod_ficha: Optional[int] = Query(None, description="Código de la ficha (Opcional)"),
+    fecha_desde: Optional[date] = Query(None, description="Fecha programada inicial, inclusive (Opcional)"),
+    fecha_hasta: Optional[date] = Query(None, description="Fecha programada final, inclusive (Opcional)"),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Descarga las programaciones filtradas en CSV o XLSX, con los nombres de instructor,
+    competencia y resultado. El archivo se genera por lotes mientras se descarga.
+    Los instructores solo pueden exportar sus propias programaciones.
+    """
+    if current_user.id_rol == 3:
+        if id_instructor is not None and id_instructor != current_user.id_usuario:
+            raise HTTPException(status_code=403, detail="No autorizado para exportar las programaciones de otro instructor")
+        id_instructor = current_user.id_usuario
+
+    try:
+        contenido = reportes_service.generar_reporte(
+            formato, crud_programacion.COLUMNAS_EXPORTACION, crud_programacion.iter_programaciones_exportacion, "Programaciones",
+            cod_regional=cod_regional, cod_centro=cod_centro, id_instructor=id_instructor, cod_ficha=cod_ficha,
+            fecha_desde=fecha_desde, fecha_hasta=fecha_hasta
+        )
+        return StreamingResponse(
+            contenido,
+            media_type=reportes_service.FORMATOS[formato],
+            headers={"Content-Disposition": f'attachment; filename="programaciones.{formato}"'}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/capacidad/centro/{cod_centro}", response_model=CapacidadCentro)
+def get_capacidad_centro(
+    cod_centro: int,
+    estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
+    horas_max_dia: Optional[int] = Query(None, ge=1, le=24, description="Horas lectivas máximas por día (Opcional)"),
+    db: Session = Depends(get_read_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Horas lectivas programadas y restantes por ficha y por competencia
+    para todas las fichas activas de un centro.
+    """
+    try:
+        return capacidad_service.calcular_capacidad(db, cod_centro, estado_grupo=estado_grupo, horas_max_dia=horas_max_dia)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/capacidad/ficha/{cod_ficha}", response_model=CapacidadFicha)
+def get_capacidad_ficha(
+    cod_ficha: int,
+    horas_max_dia: Optional[int] = Query(None, ge=1, le=24, description="Horas lectivas máximas por día (Opcional)"),
+    db: Session = Depends(get_read_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Cuántas horas lectivas puede recibir aún una ficha antes de su fecha de fin.
+    """
+    try:
+        grupo = crud_grupos.get_grupo_by_cod_ficha(db, cod_ficha)
+        if grupo is None:
+            raise HTTPException(status_code=404, detail="Grupo no encontrado")
+        resultado = capacidad_service.calcular_capacidad(db, grupo["cod_centro"], cod_ficha=cod_ficha, horas_max_dia=horas_max_dia)
+        if not resultado["fichas"]:
+            raise HTTPException(status_code=404, detail="La ficha no está activa o no tiene fechas registradas")
+        return resultado["fichas"][0]
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Endpoint paramétrico general - debe ir después de los específicos
 @router.get("/{cod_ficha}", response_model=List[ProgramacionOut])
-def get_programaciones_by_ficha(
+async def get_programaciones_by_ficha(
     cod_ficha: int,
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene todas las programaciones de un grupo específico por cod_ficha.
     """
     try:
-        programaciones = crud_programacion.get_programaciones_by_ficha(db, cod_ficha=cod_ficha)
-        return programaciones
+        programaciones = await crud_programacion.get_programaciones_by_ficha_async(db, cod_ficha=cod_ficha)
+        return respuesta_rapida(ProgramacionOut, programaciones)
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -202,6 +300,7 @@ def create_programacion(
         programacion_db = crud_programacion.create_programacion(db, programacion, current_user.id_usuario)
         if programacion_db is None:
             raise HTTPException(status_code=400, detail="Error al crear la programación")
+        capacidad_service.invalidar_capacidad()
         return programacion_db
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -235,6 +334,7 @@ def update_programacion(
         success = crud_programacion.update_programacion(db, id_programacion, programacion)
         if not success:
             raise HTTPException(status_code=404, detail="Programación no encontrada o sin cambios para aplicar")
+        capacidad_service.invalidar_capacidad()
         return {"message": "Programación actualizada correctamente"}
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -258,6 +358,7 @@ def delete_programacion(
         success = crud_programacion.delete_programacion(db, id_programacion)
         if not success:
             raise HTTPException(status_code=404, detail="Programación no encontrada")
+        capacidad_service.invalidar_capacidad()
         return {"message": "Programación eliminada correctamente"}
     except Exception as e:
         if isinstance(e, HTTPException):
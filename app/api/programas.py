@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from app.schemas.programas import ProgramaCreate, ProgramaUpdate, ProgramaOut, ProgramaPage
+from app.schemas.programas import ProgramaCreate, ProgramaUpdate, ProgramaOut, ProgramaPage, ProgramaArbol
 from app.crud import programas as crud_programa
-from core.database import get_db
-from app.api.dependencies import get_current_user
+from core.database import get_db, get_read_db
+from app.api.dependencies import get_current_user, cache_catalogo
+from app.services import versiones as versiones_service
+from app.services.catalogo import catalogo
 from app.schemas.users import UserOut
 from typing import List
 
@@ -23,26 +25,28 @@ def create_programa(
     only_admins(current_user)
     try:
         crud_programa.create_programa(db, programa)
+        versiones_service.invalidar_tablas("programa_formacion")
+        catalogo.invalidar()
         return {"message": "Programa creado correctamente"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/", response_model=ProgramaPage)
+@router.get("/", response_model=ProgramaPage, dependencies=[Depends(cache_catalogo("programa_formacion"))])
 def get_all_programas(
     skip: int = 0, 
     limit: int = 20, 
-    db: Session = Depends(get_db), 
+    db: Session = Depends(get_read_db), 
     current_user: UserOut = Depends(get_current_user)
 ):
     result = crud_programa.get_programas(db, skip=skip, limit=limit)
     return result
 
-@router.get("/search/", response_model=ProgramaPage)
+@router.get("/search/", response_model=ProgramaPage, dependencies=[Depends(cache_catalogo("programa_formacion"))])
 def search_programas(
     query: str,
     skip: int = 0, 
     limit: int = 20, 
-    db: Session = Depends(get_db), 
+    db: Session = Depends(get_read_db), 
     current_user: UserOut = Depends(get_current_user)
 ):
     try:
@@ -51,13 +55,27 @@ def search_programas(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{cod_programa}", response_model=ProgramaOut)
-def get_programa_by_id(cod_programa: int, db: Session = Depends(get_db), current_user: UserOut = Depends(get_current_user)):
+@router.get("/{cod_programa}", response_model=ProgramaOut, dependencies=[Depends(cache_catalogo("programa_formacion"))])
+def get_programa_by_id(cod_programa: int, db: Session = Depends(get_read_db), current_user: UserOut = Depends(get_current_user)):
     programa = crud_programa.get_programa(db, cod_programa=cod_programa)
     if not programa:
         raise HTTPException(status_code=404, detail="Programa no encontrado")
     return programa
 
+@router.get("/{cod_programa}/arbol", response_model=ProgramaArbol, dependencies=[Depends(cache_catalogo("programa_formacion", "competencia", "resultado_aprendizaje", "programa_competencia"))])
+def get_arbol_programa(cod_programa: int, db: Session = Depends(get_read_db), current_user: UserOut = Depends(get_current_user)):
+    """
+    Árbol completo del programa: sus competencias y los resultados de aprendizaje de cada una,
+    resuelto desde el catálogo en memoria en una sola petición.
+    """
+    try:
+        arbol = catalogo.get_arbol_programa(db, cod_programa)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if arbol is None:
+        raise HTTPException(status_code=404, detail="Programa no encontrado")
+    return arbol
+
 @router.put("/{cod_programa}")
 def update_programa(
     cod_programa: int,
@@ -68,6 +86,8 @@ def update_programa(
     only_admins(current_user)
     try:
         success = crud_programa.update_programa(db, cod_programa, programa)
+        versiones_service.invalidar_tablas("programa_formacion")
+        catalogo.invalidar()
         if not success:
             raise HTTPException(status_code=404, detail="Programa no encontrado o sin cambios")
         return {"message": "Programa actualizado correctamente"}
@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.schemas.resultado_aprendizaje import ResultadoAprendizajeOut
-from app.crud import programacion as crud_programacion
+from app.services.catalogo import catalogo
 from core.database import get_db
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, cache_catalogo
 from app.schemas.users import UserOut
 from typing import List
 
 router = APIRouter()
 
-@router.get("/competencia/{cod_competencia}", response_model=List[ResultadoAprendizajeOut])
+@router.get("/competencia/{cod_competencia}", response_model=List[ResultadoAprendizajeOut], dependencies=[Depends(cache_catalogo("resultado_aprendizaje"))])
 def get_resultados_by_competencia(
     cod_competencia: int,
     db: Session = Depends(get_db),
@@ -25,7 +25,7 @@ def get_resultados_by_competencia(
     - Array de objetos con cod_resultado, nombre, cod_competencia y horas
     """
     try:
-        resultados = crud_programacion.get_resultados_by_competencia(db, cod_competencia=cod_competencia)
+        resultados = catalogo.get_resultados_by_competencia(db, cod_competencia)
         return resultados
     except Exception as e:
         if isinstance(e, HTTPException):
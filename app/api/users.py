@@ -1,11 +1,13 @@
 
-from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, logger, status
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, logger, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-from core.database import get_db
+from core.database import get_db, SessionLocal
 from app.schemas.users import UserCreate, UserOut, UserUpdate, UserChangePassword
 from app.crud import users as crud_users
+from app.services import listados as listados_service
 from sqlalchemy.exc import SQLAlchemyError
 from app.api.dependencies import get_current_user
 
@@ -117,6 +119,7 @@ def modify_status(user_id: int, db: Session = Depends(get_db)):
 @router.get("/get-by-centro", response_model=List[UserOut])
 def get_users_by_centro(
     cod_centro: int, 
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$", description="Transmitir el listado por lotes: ndjson o json (Opcional)"),
     db: Session = Depends(get_db),
     current_user: UserOut = Depends(get_current_user)
     ):
@@ -127,6 +130,10 @@ def get_users_by_centro(
                 detail="No tienes permiso para ver los usuarios de este centro"
             )
     try:
+        if stream:
+            # En modo transmisión un centro sin usuarios devuelve una lista vacía
+            contenido = listados_service.generar_listado(stream, UserOut, crud_users.iter_users_by_centro, SessionLocal, cod_centro=cod_centro)
+            return StreamingResponse(contenido, media_type=listados_service.FORMATOS[stream])
         users = crud_users.get_users_by_centro(db, cod_centro)
         if not users:
             raise HTTPException(status_code=404, detail="No se encontraron usuarios para este centro")
@@ -160,6 +167,7 @@ def change_password(
 
 @router.get("/instructores", response_model=List[UserOut])
 def get_instructores(
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$", description="Transmitir el listado por lotes: ndjson o json (Opcional)"),
     db: Session = Depends(get_db),
     current_user: UserOut = Depends(get_current_user)
 ):
@@ -167,6 +175,9 @@ def get_instructores(
     Obtiene una lista de todos los usuarios que tienen el rol de instructor.
     """
     try:
+        if stream:
+            contenido = listados_service.generar_listado(stream, UserOut, crud_users.iter_instructores, SessionLocal)
+            return StreamingResponse(contenido, media_type=listados_service.FORMATOS[stream])
         instructores = crud_users.get_instructores(db)
         return instructores
     except Exception as e:
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.schemas.ambiente import AmbienteCreate, AmbienteUpdate
+from core.database import iter_lotes
 from typing import Optional
 import logging
 
@@ -48,18 +49,29 @@ def get_ambiente_by_id(db: Session, ambiente_id: int):
         logger.error(f"Error al obtener ambiente: {e}")
         raise Exception("Error de base de datos al obtener el ambiente")
 
+_AMBIENTES_BY_CENTRO_QUERY = text("""
+    SELECT * FROM ambiente_formacion
+    WHERE cod_centro = :cod_centro
+""")
+
 def get_ambientes_activos_by_centro(db: Session, cod_centro: int):
     try:
-        query = text("""
-            SELECT * FROM ambiente_formacion
-            WHERE cod_centro = :cod_centro
-        """)
-        result = db.execute(query, {"cod_centro": cod_centro}).mappings().all()
+        result = db.execute(_AMBIENTES_BY_CENTRO_QUERY, {"cod_centro": cod_centro}).mappings().all()
         return result
     except Exception as e:
         logger.error(f"Error al obtener ambientes activos: {e}")
         raise Exception("Error de base de datos al obtener los ambientes activos")
 
+def iter_ambientes_activos_by_centro(db: Session, cod_centro: int, lote: int = 1000):
+    """
+    Versión por lotes de `get_ambientes_activos_by_centro` (cursor del lado del servidor).
+    """
+    try:
+        yield from iter_lotes(db, _AMBIENTES_BY_CENTRO_QUERY, {"cod_centro": cod_centro}, lote)
+    except Exception as e:
+        logger.error(f"Error al obtener ambientes activos: {e}")
+        raise Exception("Error de base de datos al obtener los ambientes activos")
+
 def toggle_estado_ambiente(db: Session, ambiente_id: int) -> bool:
     try:
         query = text("""
@@ -0,0 +1,88 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import date
+from typing import List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _build_fichas_activas_filter(cod_centro: int, hoy: date, cod_ficha: Optional[int] = None, estado_grupo: Optional[str] = None) -> Tuple[str, dict]:
+    """
+    Condiciones comunes para las fichas activas de un centro:
+    con fechas registradas y cuya fecha de fin no ha pasado.
+    """
+    conditions = [
+        "g.cod_centro = :cod_centro",
+        "g.fecha_inicio IS NOT NULL",
+        "g.fecha_fin IS NOT NULL",
+        "g.fecha_fin >= :hoy",
+    ]
+    params = {"cod_centro": cod_centro, "hoy": hoy}
+    if cod_ficha is not None:
+        conditions.append("g.cod_ficha = :cod_ficha")
+        params["cod_ficha"] = cod_ficha
+    if estado_grupo:
+        conditions.append("g.estado_grupo = :estado_grupo")
+        params["estado_grupo"] = estado_grupo
+    return " AND ".join(conditions), params
+
+def get_fichas_activas(db: Session, cod_centro: int, hoy: date, cod_ficha: Optional[int] = None, estado_grupo: Optional[str] = None) -> List[dict]:
+    """
+    Fichas activas del centro con las horas lectivas de su programa.
+    """
+    try:
+        where, params = _build_fichas_activas_filter(cod_centro, hoy, cod_ficha, estado_grupo)
+        query = text(f"""
+            SELECT g.cod_ficha, g.cod_programa, g.la_version, g.fecha_inicio, g.fecha_fin,
+                   pf.nombre AS nombre_programa,
+                   COALESCE(pf.horas_lectivas, 0) AS horas_lectivas
+            FROM grupo g
+            LEFT JOIN programa_formacion pf ON g.cod_programa = pf.cod_programa AND g.la_version = pf.la_version
+            WHERE {where}
+            ORDER BY g.cod_ficha
+        """)
+        return db.execute(query, params).mappings().all()
+    except Exception as e:
+        logger.error(f"Error al obtener las fichas activas del centro {cod_centro}: {e}")
+        raise Exception("Error de base de datos al obtener las fichas activas")
+
+def get_horas_programadas(db: Session, cod_centro: int, hoy: date, cod_ficha: Optional[int] = None, estado_grupo: Optional[str] = None) -> List[dict]:
+    """
+    Horas programadas por ficha y competencia para las fichas activas del centro,
+    separando las ya ejecutadas (antes de hoy) del total.
+    """
+    try:
+        where, params = _build_fichas_activas_filter(cod_centro, hoy, cod_ficha, estado_grupo)
+        query = text(f"""
+            SELECT p.cod_ficha, p.cod_competencia,
+                   COALESCE(SUM(p.horas_programadas), 0) AS horas_programadas,
+                   COALESCE(SUM(CASE WHEN p.fecha_programada < :hoy THEN p.horas_programadas ELSE 0 END), 0) AS horas_ejecutadas
+            FROM programacion p
+            INNER JOIN grupo g ON p.cod_ficha = g.cod_ficha
+            WHERE {where}
+            GROUP BY p.cod_ficha, p.cod_competencia
+        """)
+        return db.execute(query, params).mappings().all()
+    except Exception as e:
+        logger.error(f"Error al obtener las horas programadas del centro {cod_centro}: {e}")
+        raise Exception("Error de base de datos al obtener las horas programadas")
+
+def get_competencias_fichas_activas(db: Session, cod_centro: int, hoy: date, cod_ficha: Optional[int] = None, estado_grupo: Optional[str] = None) -> List[dict]:
+    """
+    Competencias (con sus horas) de los programas de las fichas activas del centro.
+    """
+    try:
+        where, params = _build_fichas_activas_filter(cod_centro, hoy, cod_ficha, estado_grupo)
+        query = text(f"""
+            SELECT DISTINCT pc.cod_programa, c.cod_competencia, c.nombre AS nombre_competencia,
+                   COALESCE(c.horas, 0) AS horas_competencia
+            FROM programa_competencia pc
+            INNER JOIN competencia c ON pc.cod_competencia = c.cod_competencia
+            WHERE pc.cod_programa IN (
+                SELECT g.cod_programa FROM grupo g WHERE {where}
+            )
+        """)
+        return db.execute(query, params).mappings().all()
+    except Exception as e:
+        logger.error(f"Error al obtener las competencias de las fichas activas del centro {cod_centro}: {e}")
+        raise Exception("Error de base de datos al obtener las competencias de las fichas")
@@ -1,13 +1,84 @@
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
+from collections import Counter
+from typing import Callable
 import logging
+import random
+import time
 import pandas as pd
 from app.schemas.centro_formacion import CentroFormacionCreate, CentroFormacionOut
 from app.schemas import grupos as schemas
+from core.config import settings
+from core.logging_config import MuestreoFilas
 
 logger = logging.getLogger(__name__)
 
+# Errores de MySQL por los que se reintenta un lote: 1213 (deadlock, MySQL revierte
+# toda la transacción) y 1205 (tiempo de espera de lock agotado)
+ERRORES_REINTENTABLES = (1213, 1205)
+
+
+def _es_reintentable(e: SQLAlchemyError) -> bool:
+    argumentos = getattr(getattr(e, "orig", None), "args", ())
+    return bool(argumentos) and argumentos[0] in ERRORES_REINTENTABLES
+
+
+def _upsert_por_lotes(db: Session, df: pd.DataFrame, entidad: str, etapa: str,
+                      ejecutar_fila: Callable[[pd.Series], str], *campos_log: str):
+    """
+    Ejecuta `ejecutar_fila(row)` para cada fila de `df` con un commit cada
+    IMPORT_CHUNK_SIZE filas; `ejecutar_fila` devuelve el contador que incrementa
+    ("insertados" o "actualizados").
+
+    Los errores de una fila se registran y la carga sigue, como antes. Un deadlock o
+    una espera de lock agotada hace rollback del lote y lo reintenta completo (los
+    upserts son idempotentes) con espera exponencial, hasta IMPORT_DEADLOCK_RETRIES
+    veces; los lotes ya confirmados no se repiten.
+    """
+    contadores = Counter()
+    errores = []
+    lote = max(1, settings.IMPORT_CHUNK_SIZE)
+    muestreo = MuestreoFilas(logger, etapa)
+
+    for inicio in range(0, len(df), lote):
+        bloque = df.iloc[inicio:inicio + lote]
+        for intento in range(settings.IMPORT_DEADLOCK_RETRIES + 1):
+            contadores_lote = Counter()
+            errores_lote = []
+            try:
+                for fila, (idx, row) in enumerate(bloque.iterrows(), start=inicio):
+                    muestreo.registrar(fila, row, *campos_log)
+                    try:
+                        contadores_lote[ejecutar_fila(row)] += 1
+                    except SQLAlchemyError as e:
+                        if _es_reintentable(e):
+                            raise
+                        errores_lote.append(f"Error al insertar {entidad} (índice {idx}): {e}")
+                        logger.error(f"Error al insertar {entidad}: {e}")
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                if not _es_reintentable(e):
+                    raise
+                if intento == settings.IMPORT_DEADLOCK_RETRIES:
+                    errores_lote = [f"Error al insertar {entidad} (filas {inicio}-{inicio + len(bloque) - 1}): {e}"]
+                    contadores_lote = Counter()
+                    logger.error(f"Lote de {entidad} descartado tras {intento + 1} intentos: {e}")
+                    break
+                espera = 0.1 * 2 ** intento * (1 + random.random())
+                logger.warning(
+                    f"Deadlock o espera de lock en lote de {entidad}; se reintenta",
+                    extra={"etapa": etapa, "fila_inicial": inicio, "intento": intento + 1, "espera_s": round(espera, 2)},
+                )
+                time.sleep(espera)
+                continue
+            break
+        contadores.update(contadores_lote)
+        errores.extend(errores_lote)
+
+    return contadores, errores
+
 def upsert_regional(db: Session, regional: schemas.RegionalCreate):
     """
     Inserta o actualiza una regional en la base de datos.
@@ -50,10 +121,6 @@ def upsert_programas_formacion_bulk(db: Session, df_programas: pd.DataFrame):
     """
     Inserta o actualiza programas de formación en la base de datos de forma masiva.
     """
-    programas_insertados = 0
-    programas_actualizados = 0
-    errores = []
-
     insert_programa_sql = text("""
         INSERT INTO programa_formacion (
             cod_programa, la_version, nombre, horas_lectivas, horas_productivas
@@ -63,19 +130,14 @@ def upsert_programas_formacion_bulk(db: Session, df_programas: pd.DataFrame):
         ON DUPLICATE KEY UPDATE nombre = VALUES(nombre)
     """)
 
-    for idx, row in df_programas.iterrows():
-        try:
-            db.execute(insert_programa_sql, row.to_dict())
-            programas_insertados += 1  # Contamos como inserción exitosa
-        except SQLAlchemyError as e:
-            msg = f"Error al insertar programa (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al insertar programa: {e}")
+    def ejecutar_fila(row):
+        db.execute(insert_programa_sql, row.to_dict())
+        return "insertados"  # Contamos como inserción exitosa
 
-    db.commit()
+    contadores, errores = _upsert_por_lotes(db, df_programas, "programa", "programas", ejecutar_fila, "cod_programa", "la_version")
     return {
-        "programas_insertados": programas_insertados,
-        "programas_actualizados": programas_actualizados,
+        "programas_insertados": contadores["insertados"],
+        "programas_actualizados": contadores["actualizados"],
         "errores": errores
     }
 
@@ -83,10 +145,6 @@ def upsert_grupos_bulk(db: Session, df: pd.DataFrame):
     """
     Inserta o actualiza grupos en la base de datos de forma masiva.
     """
-    grupos_insertados = 0
-    grupos_actualizados = 0
-    errores = []
-
     insert_grupo_sql = text("""
         INSERT INTO grupo (
             cod_ficha, cod_centro, cod_programa, la_version, estado_grupo,
@@ -118,22 +176,18 @@ def upsert_grupos_bulk(db: Session, df: pd.DataFrame):
             hora_fin = VALUES(hora_fin)
     """)
 
-    for idx, row in df.iterrows():
-        try:
-            result = db.execute(insert_grupo_sql, row.to_dict())
-            if result.rowcount == 1:
-                grupos_insertados += 1
-            elif result.rowcount == 2:
-                grupos_actualizados += 1
-        except SQLAlchemyError as e:
-            msg = f"Error al insertar grupo (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al insertar grupo: {e}")
+    def ejecutar_fila(row):
+        result = db.execute(insert_grupo_sql, row.to_dict())
+        if result.rowcount == 1:
+            return "insertados"
+        if result.rowcount == 2:
+            return "actualizados"
+        return "sin_cambios"
 
-    db.commit()
+    contadores, errores = _upsert_por_lotes(db, df, "grupo", "grupos", ejecutar_fila, "cod_ficha")
     return {
-        "grupos_insertados": grupos_insertados,
-        "grupos_actualizados": grupos_actualizados,
+        "grupos_insertados": contadores["insertados"],
+        "grupos_actualizados": contadores["actualizados"],
         "errores": errores
     }
 
@@ -141,10 +195,6 @@ def upsert_datos_grupo_bulk(db: Session, df_datos_grupo: pd.DataFrame):
     """
     Inserta o actualiza datos de grupo en la base de datos de forma masiva.
     """
-    datos_insertados = 0
-    datos_actualizados = 0
-    errores = []
-
     insert_datos_sql = text("""
         INSERT INTO datos_grupo (
             cod_ficha, num_aprendices_masculinos, num_aprendices_femenino,
@@ -161,29 +211,23 @@ def upsert_datos_grupo_bulk(db: Session, df_datos_grupo: pd.DataFrame):
             num_total_aprendices_activos = VALUES(num_total_aprendices_activos)
     """)
 
-    for idx, row in df_datos_grupo.iterrows():
-        try:
-            # Filtrar solo las columnas necesarias y con valores no nulos
-            data_dict = {
-                'cod_ficha': row['cod_ficha'],
-                'num_aprendices_masculinos': row.get('num_aprendices_masculinos'),
-                'num_aprendices_femenino': row.get('num_aprendices_femenino'),
-                'num_aprendices_no_binario': row.get('num_aprendices_no_binario'),
-                'num_total_aprendices': row.get('num_total_aprendices'),
-                'num_total_aprendices_activos': row.get('num_total_aprendices_activos')
-            }
-            
-            db.execute(insert_datos_sql, data_dict)
-            datos_insertados += 1  # Contamos como inserción exitosa
-        except SQLAlchemyError as e:
-            msg = f"Error al insertar datos de grupo (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al insertar datos de grupo: {e}")
-
-    db.commit()
+    def ejecutar_fila(row):
+        # Filtrar solo las columnas necesarias y con valores no nulos
+        data_dict = {
+            'cod_ficha': row['cod_ficha'],
+            'num_aprendices_masculinos': row.get('num_aprendices_masculinos'),
+            'num_aprendices_femenino': row.get('num_aprendices_femenino'),
+            'num_aprendices_no_binario': row.get('num_aprendices_no_binario'),
+            'num_total_aprendices': row.get('num_total_aprendices'),
+            'num_total_aprendices_activos': row.get('num_total_aprendices_activos')
+        }
+        db.execute(insert_datos_sql, data_dict)
+        return "insertados"  # Contamos como inserción exitosa
+
+    contadores, errores = _upsert_por_lotes(db, df_datos_grupo, "datos de grupo", "datos_grupo", ejecutar_fila, "cod_ficha")
     return {
-        "datos_insertados": datos_insertados,
-        "datos_actualizados": datos_actualizados,
+        "datos_insertados": contadores["insertados"],
+        "datos_actualizados": contadores["actualizados"],
         "errores": errores
     }
 
@@ -282,7 +326,9 @@ def update_programas_duracion_bulk(db: Session, df_programas: pd.DataFrame):
         WHERE cod_programa = :cod_programa AND la_version = :la_version
     """)
 
-    for idx, row in df_programas.iterrows():
+    muestreo = MuestreoFilas(logger, "programas_duracion")
+    for fila, (idx, row) in enumerate(df_programas.iterrows()):
+        muestreo.registrar(fila, row, "cod_programa", "la_version")
         try:
             # Filtrar solo los campos necesarios
             data_dict = {
@@ -331,7 +377,9 @@ def update_datos_grupo_bulk(db: Session, df_datos_grupo: pd.DataFrame):
         WHERE cod_ficha = :cod_ficha
     """)
 
-    for idx, row in df_datos_grupo.iterrows():
+    muestreo = MuestreoFilas(logger, "datos_grupo_df14")
+    for fila, (idx, row) in enumerate(df_datos_grupo.iterrows()):
+        muestreo.registrar(fila, row, "cod_ficha")
         try:
             # Preparar los datos para la actualización
             data_dict = {
@@ -380,7 +428,9 @@ def upsert_competencia_bulk(db: Session, df_competencias: pd.DataFrame):
             horas = VALUES(horas)
     """)
     
-    for idx, row in df_competencias.iterrows():
+    muestreo = MuestreoFilas(logger, "competencias")
+    for fila, (idx, row) in enumerate(df_competencias.iterrows()):
+        muestreo.registrar(fila, row, "cod_competencia")
         try:
             data_dict = {
                 'cod_competencia': row.get('cod_competencia'),
@@ -416,7 +466,9 @@ def upsert_resultado_aprendizaje_bulk(db: Session, df_resultados: pd.DataFrame):
             cod_competencia = VALUES(cod_competencia)
     """)
     
-    for idx, row in df_resultados.iterrows():
+    muestreo = MuestreoFilas(logger, "resultados")
+    for fila, (idx, row) in enumerate(df_resultados.iterrows()):
+        muestreo.registrar(fila, row, "cod_resultado")
         try:
             data_dict = {
                 'cod_resultado': row.get('cod_resultado'),
@@ -444,44 +496,36 @@ def upsert_programa_competencia_bulk(db: Session, df_programa_competencia: pd.Da
     relaciones_insertadas = 0
     errores = []
     
-    print(f"CRUD: Iniciando inserción de {len(df_programa_competencia)} relaciones programa-competencia")
-    
     # Usar INSERT IGNORE para evitar duplicados, sin especificar cod_prog_competencia (AUTO_INCREMENT)
     upsert_sql = text("""
         INSERT IGNORE INTO programa_competencia (cod_programa, cod_competencia)
         VALUES (:cod_programa, :cod_competencia)
     """)
     
-    for idx, row in df_programa_competencia.iterrows():
+    muestreo = MuestreoFilas(logger, "programa_competencia")
+    for fila, (idx, row) in enumerate(df_programa_competencia.iterrows()):
+        muestreo.registrar(fila, row, "cod_programa", "cod_competencia")
         try:
             data_dict = {
                 'cod_programa': row.get('cod_programa'),
                 'cod_competencia': row.get('cod_competencia')
             }
             
-            print(f"CRUD: Insertando relación {idx+1}: programa={data_dict['cod_programa']}, competencia={data_dict['cod_competencia']}")
-            
             result = db.execute(upsert_sql, data_dict)
             if result.rowcount > 0:  # Si se insertó una nueva fila
                 relaciones_insertadas += 1
-                print(f"CRUD: Relación insertada exitosamente (rowcount: {result.rowcount})")
-            else:
-                print(f"CRUD: Relación ya existía, no se insertó (rowcount: {result.rowcount})")
-                
         except SQLAlchemyError as e:
             msg = f"Error al insertar programa-competencia programa:{row.get('cod_programa')} competencia:{row.get('cod_competencia')} (índice {idx}): {e}"
             errores.append(msg)
             logger.error(f"Error al insertar programa-competencia: {e}")
-            print(f"CRUD: ERROR - {msg}")
 
     try:
         db.commit()
-        print(f"CRUD: Commit exitoso. Total relaciones insertadas: {relaciones_insertadas}")
     except Exception as e:
         db.rollback()
         error_msg = f"Error en commit: {e}"
         errores.append(error_msg)
-        print(f"CRUD: ERROR en commit - {error_msg}")
+        logger.error(f"Error en commit de programa-competencia: {e}")
     
     return {
         "relaciones_insertadas": relaciones_insertadas,
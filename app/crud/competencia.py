@@ -2,31 +2,27 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from app.schemas.competencia import CompetenciaCreate, CompetenciaUpdate
+from core.database import iter_lotes
 from typing import List
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_competencias_by_programa(db: Session, cod_programa: int, la_version: int = None):
+def get_grafo_catalogo(db: Session) -> dict:
     """
-    Obtiene todas las competencias asociadas a un programa de formación específico.
-    Nota: Las competencias están asociadas al programa, no a una versión específica.
+    Lee completas las tablas del catálogo de competencias para cargarlo en memoria
+    (app/services/catalogo.py); las búsquedas por programa o competencia se resuelven allí.
     """
     try:
-        query = text("""
-            SELECT DISTINCT c.cod_competencia, c.nombre, c.horas
-            FROM competencia c
-            INNER JOIN programa_competencia pc ON c.cod_competencia = pc.cod_competencia
-            WHERE pc.cod_programa = :cod_programa
-            ORDER BY c.cod_competencia
-        """)
-        result = db.execute(query, {
-            "cod_programa": cod_programa
-        }).mappings().all()
-        return result
+        return {
+            "competencias": db.execute(text("SELECT cod_competencia, nombre, horas FROM competencia")).mappings().all(),
+            "resultados": db.execute(text("SELECT cod_resultado, nombre, cod_competencia FROM resultado_aprendizaje")).mappings().all(),
+            "relaciones": db.execute(text("SELECT DISTINCT cod_programa, cod_competencia FROM programa_competencia")).all(),
+            "programas": db.execute(text("SELECT cod_programa, la_version, nombre FROM programa_formacion")).mappings().all(),
+        }
     except SQLAlchemyError as e:
-        logger.error(f"Error al obtener competencias por programa: {e}")
-        raise Exception("Error de base de datos al obtener competencias del programa")
+        logger.error(f"Error al cargar el catálogo de competencias: {e}")
+        raise Exception("Error de base de datos al cargar el catálogo de competencias")
 
 def create_competencia(db: Session, competencia: CompetenciaCreate):
     """
@@ -61,22 +57,33 @@ def get_competencia_by_id(db: Session, cod_competencia: int):
         logger.error(f"Error al obtener competencia por ID: {e}")
         raise Exception("Error de base de datos al obtener la competencia")
 
+_ALL_COMPETENCIAS_QUERY = text("""
+    SELECT cod_competencia, nombre, horas
+    FROM competencia
+    ORDER BY cod_competencia
+""")
+
 def get_all_competencias(db: Session):
     """
     Obtener todas las competencias.
     """
     try:
-        query = text("""
-            SELECT cod_competencia, nombre, horas
-            FROM competencia
-            ORDER BY cod_competencia
-        """)
-        result = db.execute(query).mappings().all()
+        result = db.execute(_ALL_COMPETENCIAS_QUERY).mappings().all()
         return result
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener todas las competencias: {e}")
         raise Exception("Error de base de datos al obtener las competencias")
 
+def iter_all_competencias(db: Session, lote: int = 1000):
+    """
+    Versión por lotes de `get_all_competencias` (cursor del lado del servidor).
+    """
+    try:
+        yield from iter_lotes(db, _ALL_COMPETENCIAS_QUERY, lote=lote)
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener todas las competencias: {e}")
+        raise Exception("Error de base de datos al obtener las competencias")
+
 def update_competencia(db: Session, cod_competencia: int, competencia_update: CompetenciaUpdate) -> bool:
     """
     Actualizar una competencia existente.
@@ -120,22 +127,3 @@ def delete_competencia(db: Session, cod_competencia: int) -> bool:
         db.rollback()
         logger.error(f"Error al eliminar competencia: {e}")
         raise Exception("Error de base de datos al eliminar la competencia")
-
-def get_programas_by_competencia(db: Session, cod_competencia: int):
-    """
-    Obtener todos los programas que incluyen una competencia específica.
-    Nota: Retorna todas las versiones de los programas que incluyen esta competencia.
-    """
-    try:
-        query = text("""
-            SELECT DISTINCT pf.cod_programa, pf.la_version, pf.nombre as nombre_programa
-            FROM programa_formacion pf
-            INNER JOIN programa_competencia pc ON pf.cod_programa = pc.cod_programa
-            WHERE pc.cod_competencia = :cod_competencia
-            ORDER BY pf.cod_programa, pf.la_version
-        """)
-        result = db.execute(query, {"cod_competencia": cod_competencia}).mappings().all()
-        return result
-    except SQLAlchemyError as e:
-        logger.error(f"Error al obtener programas por competencia: {e}")
-        raise Exception("Error de base de datos al obtener programas de la competencia") 
\ No newline at end of file
@@ -1,6 +1,7 @@
 from ast import List
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.grupos import GrupoUpdate
 from typing import Optional, List
 import logging 
@@ -124,6 +125,87 @@ def update_grupo(db: Session, cod_ficha: int, grupo: GrupoUpdate) -> bool:
         logger.error(f"Error al actualizar el grupo: {e}")
         raise Exception("Error de base de datos al actualizar el grupo")
 
+def get_fechas_grupos_by_centro(db: Session, cod_centro: int, estado_grupo: Optional[str] = None) -> List[dict]:
+    """
+    Obtiene cod_ficha, fecha_inicio y fecha_fin de los grupos de un centro que tienen
+    ambas fechas registradas (insumo para el cálculo de días de clase).
+    """
+    try:
+        query = """
+            SELECT cod_ficha, fecha_inicio, fecha_fin
+            FROM grupo
+            WHERE cod_centro = :cod_centro
+              AND fecha_inicio IS NOT NULL
+              AND fecha_fin IS NOT NULL
+        """
+        params = {"cod_centro": cod_centro}
+        if estado_grupo:
+            query += " AND estado_grupo = :estado_grupo"
+            params["estado_grupo"] = estado_grupo
+        query += " ORDER BY cod_ficha"
+        result = db.execute(text(query), params).mappings().all()
+        return [dict(row) for row in result]
+    except Exception as e:
+        logger.error(f"Error al obtener las fechas de los grupos del centro {cod_centro}: {e}")
+        raise Exception("Error de base de datos al obtener las fechas de los grupos")
+
+_SEARCH_GRUPOS_COLUMNS = """
+    SELECT 
+        g.cod_ficha,
+        g.estado_grupo,
+        g.jornada,
+        g.fecha_inicio,
+        g.fecha_fin,
+        g.etapa,
+        g.responsable,
+        pf.nombre as nombre_programa,
+        af.nombre_ambiente
+    FROM grupo g
+    LEFT JOIN programa_formacion pf ON g.cod_programa = pf.cod_programa AND g.la_version = pf.la_version
+    LEFT JOIN ambiente_formacion af ON g.id_ambiente = af.id_ambiente
+"""
+
+def _build_search_grupos_query(search_text: str = "", limit: int = 20):
+    """
+    Construye la consulta de búsqueda para select/autocompletar.
+    Compartida por la versión síncrona y la asíncrona.
+    """
+    # Si no hay texto de búsqueda, obtener todos los grupos activos
+    if not search_text.strip():
+        query = text(_SEARCH_GRUPOS_COLUMNS + """
+            WHERE g.estado_grupo NOT IN ('CANCELADO', 'CERRADO')
+            ORDER BY g.cod_ficha DESC
+            LIMIT :limit
+        """)
+        return query, {"limit": limit}
+
+    # Detectar si es búsqueda numérica (código de ficha) o texto (nombre programa)
+    if search_text.strip().isdigit():
+        # Para códigos numéricos: buscar solo códigos que EMPIECEN con el número
+        query = text(_SEARCH_GRUPOS_COLUMNS + """
+            WHERE CAST(g.cod_ficha AS CHAR) LIKE :search_pattern
+            AND g.estado_grupo NOT IN ('CANCELADO', 'CERRADO')
+            ORDER BY g.cod_ficha ASC
+            LIMIT :limit
+        """)
+        return query, {"search_pattern": f"{search_text}%", "limit": limit}
+
+    # Para texto: buscar en nombre de programa, responsable y nombre de ambiente con coincidencia parcial
+    query = text(_SEARCH_GRUPOS_COLUMNS + """
+        WHERE (UPPER(pf.nombre) LIKE UPPER(:search_pattern) 
+               OR UPPER(g.responsable) LIKE UPPER(:search_pattern)
+               OR UPPER(af.nombre_ambiente) LIKE UPPER(:search_pattern))
+        AND g.estado_grupo NOT IN ('CANCELADO', 'CERRADO')
+        ORDER BY 
+            CASE WHEN UPPER(pf.nombre) LIKE UPPER(:exact_pattern) THEN 1 
+                 WHEN UPPER(g.responsable) LIKE UPPER(:exact_pattern) THEN 2 
+                 WHEN UPPER(af.nombre_ambiente) LIKE UPPER(:exact_pattern) THEN 3
+                 ELSE 4 END,
+            g.cod_ficha DESC
+        LIMIT :limit
+    """)
+    return query, {"search_pattern": f"%{search_text}%", "exact_pattern": f"{search_text}%", "limit": limit}
+
 def search_grupos_for_select(db: Session, search_text: str = "", limit: int = 20) -> List[dict]:
     """
     Busca grupos para usar en un select/autocompletar.
@@ -132,94 +214,20 @@ def search_grupos_for_select(db: Session, search_text: str = "", limit: int = 20
     Incluye información enriquecida con nombres de programa y ambiente.
     """
     try:
-        # Si no hay texto de búsqueda, obtener todos los grupos activos
-        if not search_text.strip():
-            query = text("""
-                SELECT 
-                    g.cod_ficha,
-                    g.estado_grupo,
-                    g.jornada,
-                    g.fecha_inicio,
-                    g.fecha_fin,
-                    g.etapa,
-                    g.responsable,
-                    pf.nombre as nombre_programa,
-                    af.nombre_ambiente
-                FROM grupo g
-                LEFT JOIN programa_formacion pf ON g.cod_programa = pf.cod_programa AND g.la_version = pf.la_version
-                LEFT JOIN ambiente_formacion af ON g.id_ambiente = af.id_ambiente
-                WHERE g.estado_grupo NOT IN ('CANCELADO', 'CERRADO')
-                ORDER BY g.cod_ficha DESC
-                LIMIT :limit
-            """)
-            result = db.execute(query, {"limit": limit}).mappings().all()
-        else:
-            # Detectar si es búsqueda numérica (código de ficha) o texto (nombre programa)
-            is_numeric_search = search_text.strip().isdigit()
-            
-            if is_numeric_search:
-                # Para códigos numéricos: buscar solo códigos que EMPIECEN con el número
-                search_pattern = f"{search_text}%"
-                query = text("""
-                    SELECT 
-                        g.cod_ficha,
-                        g.estado_grupo,
-                        g.jornada,
-                        g.fecha_inicio,
-                        g.fecha_fin,
-                        g.etapa,
-                        g.responsable,
-                        pf.nombre as nombre_programa,
-                        af.nombre_ambiente
-                    FROM grupo g
-                    LEFT JOIN programa_formacion pf ON g.cod_programa = pf.cod_programa AND g.la_version = pf.la_version
-                    LEFT JOIN ambiente_formacion af ON g.id_ambiente = af.id_ambiente
-                    WHERE CAST(g.cod_ficha AS CHAR) LIKE :search_pattern
-                    AND g.estado_grupo NOT IN ('CANCELADO', 'CERRADO')
-                    ORDER BY g.cod_ficha ASC
-                    LIMIT :limit
-                """)
-                result = db.execute(query, {
-                    "search_pattern": search_pattern, 
-                    "limit": limit
-                }).mappings().all()
-            else:
-                # Para texto: buscar en nombre de programa, responsable y nombre de ambiente con coincidencia parcial
-                search_pattern = f"%{search_text}%"
-                query = text("""
-                    SELECT 
-                        g.cod_ficha,
-                        g.estado_grupo,
-                        g.jornada,
-                        g.fecha_inicio,
-                        g.fecha_fin,
-                        g.etapa,
-                        g.responsable,
-                        pf.nombre as nombre_programa,
-                        af.nombre_ambiente
-                    FROM grupo g
-                    LEFT JOIN programa_formacion pf ON g.cod_programa = pf.cod_programa AND g.la_version = pf.la_version
-                    LEFT JOIN ambiente_formacion af ON g.id_ambiente = af.id_ambiente
-                    WHERE (UPPER(pf.nombre) LIKE UPPER(:search_pattern) 
-                           OR UPPER(g.responsable) LIKE UPPER(:search_pattern)
-                           OR UPPER(af.nombre_ambiente) LIKE UPPER(:search_pattern))
-                    AND g.estado_grupo NOT IN ('CANCELADO', 'CERRADO')
-                    ORDER BY 
-                        CASE WHEN UPPER(pf.nombre) LIKE UPPER(:exact_pattern) THEN 1 
-                             WHEN UPPER(g.responsable) LIKE UPPER(:exact_pattern) THEN 2 
-                             WHEN UPPER(af.nombre_ambiente) LIKE UPPER(:exact_pattern) THEN 3
-                             ELSE 4 END,
-                        g.cod_ficha DESC
-                    LIMIT :limit
-                """)
-                exact_pattern = f"{search_text}%"
-                result = db.execute(query, {
-                    "search_pattern": search_pattern,
-                    "exact_pattern": exact_pattern,
-                    "limit": limit
-                }).mappings().all()
-        
-        return result
+        query, params = _build_search_grupos_query(search_text, limit)
+        return db.execute(query, params).mappings().all()
+    except Exception as e:
+        logger.error(f"Error al buscar grupos: {e}")
+        raise Exception("Error de base de datos al buscar grupos")
+
+async def search_grupos_for_select_async(db: AsyncSession, search_text: str = "", limit: int = 20) -> List[dict]:
+    """
+    Versión asíncrona de `search_grupos_for_select`.
+    """
+    try:
+        query, params = _build_search_grupos_query(search_text, limit)
+        result = await db.execute(query, params)
+        return result.mappings().all()
     except Exception as e:
         logger.error(f"Error al buscar grupos: {e}")
         raise Exception("Error de base de datos al buscar grupos")
@@ -285,7 +293,7 @@ def advanced_search_grupos(db: Session, search_term: str, cod_centro: int, skip:
 # --- Funciones para el Dashboard con Filtros ---
 
 def _build_dynamic_where_clause(
-    cod_centro: int,
+    cod_centro: Optional[int],
     estado_grupo: Optional[str] = None,
     nombre_nivel: Optional[str] = None,
     etapa: Optional[str] = None,
@@ -295,9 +303,13 @@ def _build_dynamic_where_clause(
     año: Optional[int] = None
 ) -> tuple[str, dict]:
     """Función auxiliar para construir cláusulas WHERE dinámicas y seguras."""
-    conditions = ["g.cod_centro = :cod_centro"]
-    params = {"cod_centro": cod_centro}
-    
+    conditions = []
+    params = {}
+
+    if cod_centro is not None:
+        conditions.append("g.cod_centro = :cod_centro")
+        params["cod_centro"] = cod_centro
+
     if estado_grupo is not None:
         conditions.append("g.estado_grupo = :estado_grupo")
         params["estado_grupo"] = estado_grupo
@@ -326,7 +338,44 @@ def _build_dynamic_where_clause(
         conditions.append("YEAR(g.fecha_inicio) = :año")
         params["año"] = año
             
-    return "WHERE " + " AND ".join(conditions), params
+    return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+def _build_dashboard_kpis_query(cod_centro: int, estado_grupo: Optional[str] = None, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None):
+    where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+    query_str = f"""
+        SELECT
+            COUNT(g.cod_ficha) AS total_grupo,
+            CAST(COALESCE(SUM(dg.formacion), 0) AS INTEGER) AS total_aprendices_formacion
+        FROM grupo g
+        LEFT JOIN datos_grupo dg ON g.cod_ficha = dg.cod_ficha
+        {where_clause}
+    """
+    return text(query_str), params
+
+# Distribuciones del dashboard: columna de agrupación y alias con el que la espera el esquema
+DISTRIBUCIONES = {
+    "municipio": ("g.nombre_municipio", "municipio"),
+    "jornada": ("g.jornada", "jornada"),
+    "modalidad": ("g.modalidad", "modalidad"),
+    "etapa": ("g.etapa", "etapa"),
+    "nivel": ("g.nombre_nivel", "nivel"),
+}
+
+def _build_distribucion_query(distribucion: str, cod_centro: int, estado_grupo: Optional[str] = None, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None):
+    columna, alias = DISTRIBUCIONES[distribucion]
+    where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+    query_str = f"""
+        SELECT 
+            {columna} AS {alias}, 
+            COUNT(g.cod_ficha) AS cantidad,
+            CAST(COALESCE(SUM(dg.formacion), 0) AS INTEGER) AS total_aprendices_formacion
+        FROM grupo g
+        LEFT JOIN datos_grupo dg ON g.cod_ficha = dg.cod_ficha
+        {where_clause}
+        GROUP BY {columna} 
+        ORDER BY cantidad DESC
+    """
+    return text(query_str), params
 
 def get_dashboard_kpis(db: Session, cod_centro: int, estado_grupo: Optional[str] = None, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> dict:
     """
@@ -334,114 +383,86 @@ def get_dashboard_kpis(db: Session, cod_centro: int, estado_grupo: Optional[str]
     basado en filtros obligatorios y un año opcional.
     """
     try:
-        where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
-
-        query_str = f"""
-            SELECT
-                COUNT(g.cod_ficha) AS total_grupo,
-                CAST(COALESCE(SUM(dg.formacion), 0) AS INTEGER) AS total_aprendices_formacion
-            FROM grupo g
-            LEFT JOIN datos_grupo dg ON g.cod_ficha = dg.cod_ficha
-            {where_clause}
-        """
-
-        result = db.execute(text(query_str), params).mappings().one()
+        query, params = _build_dashboard_kpis_query(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        result = db.execute(query, params).mappings().one()
         return result
     except Exception as e:
         logger.error(f"Error al calcular KPIs del dashboard: {e}")
         raise Exception("Error de base de datos al calcular KPIs")
 
-def get_grupos_por_municipio_filtrado(db: Session, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+async def get_dashboard_kpis_async(db: AsyncSession, cod_centro: int, estado_grupo: Optional[str] = None, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> dict:
+    """
+    Versión asíncrona de `get_dashboard_kpis`.
+    """
     try:
-        where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
-        query_str = f"""
-            SELECT 
-                g.nombre_municipio AS municipio, 
-                COUNT(g.cod_ficha) AS cantidad,
-                CAST(COALESCE(SUM(dg.formacion), 0) AS INTEGER) AS total_aprendices_formacion
-            FROM grupo g
-            LEFT JOIN datos_grupo dg ON g.cod_ficha = dg.cod_ficha
-            {where_clause}
-            GROUP BY g.nombre_municipio 
-            ORDER BY cantidad DESC
-        """
-        return db.execute(text(query_str), params).mappings().all()
+        query, params = _build_dashboard_kpis_query(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        result = await db.execute(query, params)
+        return result.mappings().one()
     except Exception as e:
-        logger.error(f"Error al obtener grupos filtrados por municipio: {e}")
-        raise Exception("Error de base de datos al agrupar por municipio")
+        logger.error(f"Error al calcular KPIs del dashboard: {e}")
+        raise Exception("Error de base de datos al calcular KPIs")
 
-def get_grupos_por_jornada_filtrado(db: Session, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+def get_distribucion_filtrada(db: Session, distribucion: str, cod_centro: int, estado_grupo: Optional[str] = None, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+    """
+    Cantidad de grupos y aprendices en formación agrupados por una de las columnas de DISTRIBUCIONES.
+    """
     try:
-        where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
-        query_str = f"""
-            SELECT 
-                g.jornada, 
-                COUNT(g.cod_ficha) AS cantidad,
-                CAST(COALESCE(SUM(dg.formacion), 0) AS INTEGER) AS total_aprendices_formacion
-            FROM grupo g
-            LEFT JOIN datos_grupo dg ON g.cod_ficha = dg.cod_ficha
-            {where_clause}
-            GROUP BY g.jornada 
-            ORDER BY cantidad DESC
-        """
-        return db.execute(text(query_str), params).mappings().all()
+        query, params = _build_distribucion_query(distribucion, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return db.execute(query, params).mappings().all()
     except Exception as e:
-        logger.error(f"Error al obtener grupos filtrados por jornada: {e}")
-        raise Exception("Error de base de datos al agrupar por jornada")
+        logger.error(f"Error al obtener grupos filtrados por {distribucion}: {e}")
+        raise Exception(f"Error de base de datos al agrupar por {distribucion}")
 
-def get_grupos_por_modalidad_filtrado(db: Session, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+async def get_distribucion_filtrada_async(db: AsyncSession, distribucion: str, cod_centro: int, estado_grupo: Optional[str] = None, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+    """
+    Versión asíncrona de `get_distribucion_filtrada`.
+    """
     try:
-        where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
-        query_str = f"""
-            SELECT 
-                g.modalidad, 
-                COUNT(g.cod_ficha) AS cantidad,
-                CAST(COALESCE(SUM(dg.formacion), 0) AS INTEGER) AS total_aprendices_formacion
-            FROM grupo g
-            LEFT JOIN datos_grupo dg ON g.cod_ficha = dg.cod_ficha
-            {where_clause}
-            GROUP BY g.modalidad 
-            ORDER BY cantidad DESC
-        """
-        return db.execute(text(query_str), params).mappings().all()
+        query, params = _build_distribucion_query(distribucion, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        result = await db.execute(query, params)
+        return result.mappings().all()
     except Exception as e:
-        logger.error(f"Error al obtener grupos filtrados por modalidad: {e}")
-        raise Exception("Error de base de datos al agrupar por modalidad")
+        logger.error(f"Error al obtener grupos filtrados por {distribucion}: {e}")
+        raise Exception(f"Error de base de datos al agrupar por {distribucion}")
 
-def get_grupos_por_etapa_filtrado(db: Session, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
-    try:
-        where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
-        query_str = f"""
-            SELECT 
-                g.etapa, 
-                COUNT(g.cod_ficha) AS cantidad,
-                CAST(COALESCE(SUM(dg.formacion), 0) AS INTEGER) AS total_aprendices_formacion
-            FROM grupo g
-            LEFT JOIN datos_grupo dg ON g.cod_ficha = dg.cod_ficha
-            {where_clause}
-            GROUP BY g.etapa 
-            ORDER BY cantidad DESC
-        """
-        return db.execute(text(query_str), params).mappings().all()
-    except Exception as e:
-        logger.error(f"Error al obtener grupos filtrados por etapa: {e}")
-        raise Exception("Error de base de datos al agrupar por etapa")
+# --- Exportación completa (grupo + datos_grupo) ---
+
+# Columnas exportadas, en el orden del archivo
+COLUMNAS_EXPORTACION = [
+    "cod_ficha", "cod_centro", "cod_programa", "la_version", "estado_grupo", "nombre_nivel", "jornada",
+    "fecha_inicio", "fecha_fin", "etapa", "modalidad", "responsable", "nombre_empresa", "nombre_municipio",
+    "nombre_programa_especial", "hora_inicio", "hora_fin", "id_ambiente",
+    "num_aprendices_masculinos", "num_aprendices_femenino", "num_aprendices_no_binario", "num_total_aprendices",
+    "num_total_aprendices_activos", "cupo_total", "en_transito", "induccion", "formacion", "condicionado",
+    "aplazado", "retiro_voluntario", "cancelado", "cancelamiento_vit_comp", "desercion_vit_comp",
+    "por_certificar", "certificados", "traslados", "otro",
+]
 
-def get_grupos_por_nivel_filtrado(db: Session, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+_COLUMNAS_DATOS_GRUPO = set(COLUMNAS_EXPORTACION[COLUMNAS_EXPORTACION.index("num_aprendices_masculinos"):])
+
+def _build_exportacion_query(cod_centro: Optional[int] = None, estado_grupo: Optional[str] = None, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None):
+    where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+    columnas = ", ".join(f"{'dg' if c in _COLUMNAS_DATOS_GRUPO else 'g'}.{c}" for c in COLUMNAS_EXPORTACION)
+    query_str = f"""
+        SELECT {columnas}
+        FROM grupo g
+        LEFT JOIN datos_grupo dg ON g.cod_ficha = dg.cod_ficha
+        {where_clause}
+        ORDER BY g.cod_ficha
+    """
+    return text(query_str), params
+
+def iter_grupos_exportacion(db: Session, lote: int = 10000, **filtros):
+    """
+    Recorre los grupos filtrados con sus datos (DF-14) en lotes de `lote` filas.
+    Usa un cursor del lado del servidor (stream_results): MySQL envía las filas a
+    medida que se consumen, sin COUNT ni OFFSET y sin cargar todo el resultado en memoria.
+    """
     try:
-        where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
-        query_str = f"""
-            SELECT 
-                g.nombre_nivel AS nivel, 
-                COUNT(g.cod_ficha) AS cantidad,
-                CAST(COALESCE(SUM(dg.formacion), 0) AS INTEGER) AS total_aprendices_formacion
-            FROM grupo g
-            LEFT JOIN datos_grupo dg ON g.cod_ficha = dg.cod_ficha
-            {where_clause}
-            GROUP BY g.nombre_nivel 
-            ORDER BY cantidad DESC
-        """
-        return db.execute(text(query_str), params).mappings().all()
+        query, params = _build_exportacion_query(**filtros)
+        result = db.execute(query, params, execution_options={"stream_results": True, "yield_per": lote})
+        for filas in result.partitions(lote):
+            yield filas
     except Exception as e:
-        logger.error(f"Error al obtener grupos filtrados por nivel: {e}")
-        raise Exception("Error de base de datos al agrupar por nivel")
\ No newline at end of file
+        logger.error(f"Error al exportar grupos: {e}")
+        raise Exception("Error de base de datos al exportar los grupos")
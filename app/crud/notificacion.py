@@ -1,25 +1,32 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Dict
+from datetime import datetime
 import logging
 from app.schemas import notificacion as schemas
+from core.broker import notification_broker
 
 logger = logging.getLogger(__name__)
 
-def create_notification(db: Session, notificacion: schemas.NotificacionCreate) -> Optional[bool]:
+def create_notifications_bulk(db: Session, notificaciones: List[schemas.NotificacionCreate], commit: bool = True) -> Optional[int]:
     """
-    Crea una nueva notificación en la base de datos.
+    Crea varias notificaciones con un solo INSERT por lotes (executemany) y un único commit.
+    Después del commit se publican en el broker para los usuarios conectados por SSE.
     
     Args:
         db: Sesión de base de datos
-        notificacion: Objeto con los datos de la notificación a crear
+        notificaciones: Lista de notificaciones a crear
+        commit: Si es False, el llamador se encarga de confirmar la transacción
+            y de llamar a `publish_notifications` después del commit
     
     Returns:
-        True si fue exitoso, None si hubo error
+        Número de notificaciones creadas, None si hubo error
     """
+    if not notificaciones:
+        return 0
     try:
-        notificacion_data = notificacion.model_dump()
         query = text("""
             INSERT INTO notificacion (
                 id_usuario, mensaje, leida
@@ -27,43 +34,159 @@ def create_notification(db: Session, notificacion: schemas.NotificacionCreate) -
                 :id_usuario, :mensaje, :leida
             )
         """)
-        db.execute(query, notificacion_data)
-        db.commit()
-        return True
+        db.execute(query, [notificacion.model_dump() for notificacion in notificaciones])
+        if commit:
+            db.commit()
+            publish_notifications(notificaciones)
+        return len(notificaciones)
     except SQLAlchemyError as e:
         db.rollback()
-        logger.error(f"Error al crear notificación: {e}")
+        logger.error(f"Error al crear {len(notificaciones)} notificaciones: {e}")
         return None
 
-def get_notifications_by_user_id(db: Session, user_id: int) -> Optional[List]:
+def publish_notifications(notificaciones: List[schemas.NotificacionCreate]) -> None:
+    """
+    Envía las notificaciones ya guardadas a los clientes suscritos al canal SSE.
+    """
+    fecha_creacion = datetime.now().isoformat()
+    for notificacion in notificaciones:
+        notification_broker.publish(notificacion.id_usuario, {
+            **notificacion.model_dump(),
+            "fecha_creacion": fecha_creacion
+        })
+
+def create_notification(db: Session, notificacion: schemas.NotificacionCreate) -> Optional[bool]:
     """
-    Obtiene todas las notificaciones de un usuario específico ordenadas por fecha descendente.
+    Crea una nueva notificación en la base de datos.
+    
+    Args:
+        db: Sesión de base de datos
+        notificacion: Objeto con los datos de la notificación a crear
+    
+    Returns:
+        True si fue exitoso, None si hubo error
+    """
+    return True if create_notifications_bulk(db, [notificacion]) else None
+
+def create_notifications_for_centro_admins(db: Session, mensajes_por_centro: Dict[int, str]) -> Optional[int]:
+    """
+    Notifica a los administradores activos de cada centro con el mensaje correspondiente.
+    Usa una sola consulta para buscar los destinatarios y un solo INSERT por lotes.
+    
+    Args:
+        db: Sesión de base de datos
+        mensajes_por_centro: Diccionario {cod_centro: mensaje}
+    
+    Returns:
+        Número de notificaciones creadas, None si hubo error
+    """
+    if not mensajes_por_centro:
+        return 0
+    try:
+        query = text("""
+            SELECT id_usuario, cod_centro
+            FROM usuario
+            WHERE id_rol = 2 AND estado = 1 AND cod_centro IN :centros
+        """).bindparams(bindparam("centros", expanding=True))
+        admins = db.execute(query, {"centros": list(mensajes_por_centro.keys())}).mappings().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener administradores de los centros {list(mensajes_por_centro.keys())}: {e}")
+        return None
+
+    notificaciones = [
+        schemas.NotificacionCreate(
+            id_usuario=admin["id_usuario"],
+            mensaje=mensajes_por_centro[admin["cod_centro"]],
+            leida=False
+        )
+        for admin in admins
+    ]
+    return create_notifications_bulk(db, notificaciones)
+
+def _build_notifications_query(user_id: int, skip: int = 0, limit: int = 50, solo_no_leidas: bool = False):
+    filtro_leida = "AND leida = FALSE" if solo_no_leidas else ""
+    query = text(f"""
+        SELECT 
+            id_notificacion,
+            id_usuario,
+            mensaje,
+            leida,
+            fecha_creacion
+        FROM notificacion
+        WHERE id_usuario = :user_id {filtro_leida}
+        ORDER BY fecha_creacion DESC
+        LIMIT :limit OFFSET :skip
+    """)
+    return query, {"user_id": user_id, "limit": limit, "skip": skip}
+
+_COUNT_UNREAD_QUERY = text("""
+    SELECT COUNT(*) 
+    FROM notificacion 
+    WHERE id_usuario = :user_id AND leida = FALSE
+""")
+
+def get_notifications_by_user_id(db: Session, user_id: int, skip: int = 0, limit: int = 50, solo_no_leidas: bool = False) -> Optional[List]:
+    """
+    Obtiene una página de notificaciones de un usuario específico ordenadas por fecha descendente.
     
     Args:
         db: Sesión de base de datos
         user_id: ID del usuario
+        skip: Número de notificaciones a omitir
+        limit: Número máximo de notificaciones a devolver
+        solo_no_leidas: Si es True, solo retorna las notificaciones sin leer
     
     Returns:
         Lista de notificaciones o None si hubo error
     """
     try:
-        query = text("""
-            SELECT 
-                id_notificacion,
-                id_usuario,
-                mensaje,
-                leida,
-                fecha_creacion
-            FROM notificacion
-            WHERE id_usuario = :user_id
-            ORDER BY fecha_creacion DESC
-        """)
-        result = db.execute(query, {"user_id": user_id}).mappings().all()
-        return result
+        query, params = _build_notifications_query(user_id, skip, limit, solo_no_leidas)
+        return db.execute(query, params).mappings().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener notificaciones del usuario {user_id}: {e}")
+        return None
+
+async def get_notifications_by_user_id_async(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 50, solo_no_leidas: bool = False) -> Optional[List]:
+    """
+    Versión asíncrona de `get_notifications_by_user_id`.
+    """
+    try:
+        query, params = _build_notifications_query(user_id, skip, limit, solo_no_leidas)
+        result = await db.execute(query, params)
+        return result.mappings().all()
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener notificaciones del usuario {user_id}: {e}")
         return None
 
+def count_unread_notifications(db: Session, user_id: int) -> Optional[int]:
+    """
+    Cuenta las notificaciones sin leer de un usuario.
+    La consulta se resuelve con el índice (id_usuario, leida) sin leer las filas.
+    
+    Args:
+        db: Sesión de base de datos
+        user_id: ID del usuario
+    
+    Returns:
+        Número de notificaciones sin leer o None si hubo error
+    """
+    try:
+        return db.execute(_COUNT_UNREAD_QUERY, {"user_id": user_id}).scalar() or 0
+    except SQLAlchemyError as e:
+        logger.error(f"Error al contar notificaciones sin leer del usuario {user_id}: {e}")
+        return None
+
+async def count_unread_notifications_async(db: AsyncSession, user_id: int) -> Optional[int]:
+    """
+    Versión asíncrona de `count_unread_notifications`.
+    """
+    try:
+        result = await db.execute(_COUNT_UNREAD_QUERY, {"user_id": user_id})
+        return result.scalar() or 0
+    except SQLAlchemyError as e:
+        logger.error(f"Error al contar notificaciones sin leer del usuario {user_id}: {e}")
+        return None
+
 def mark_notification_as_read(db: Session, notificacion_id: int, user_id: int) -> bool:
     """
     Marca una notificación como leída, verificando que pertenezca al usuario.
@@ -109,3 +232,41 @@ def mark_notification_as_read(db: Session, notificacion_id: int, user_id: int) -
         db.rollback()
         logger.error(f"Error al marcar notificación como leída: {e}")
         return False
+
+def mark_notifications_as_read(db: Session, user_id: int, notificacion_ids: Optional[List[int]] = None) -> Optional[int]:
+    """
+    Marca como leídas varias notificaciones del usuario con un solo UPDATE.
+    Si no se indican IDs, marca todas las notificaciones sin leer del usuario.
+    
+    Args:
+        db: Sesión de base de datos
+        user_id: ID del usuario (solo se modifican sus notificaciones)
+        notificacion_ids: IDs de las notificaciones a marcar (opcional)
+    
+    Returns:
+        Número de notificaciones actualizadas o None si hubo error
+    """
+    try:
+        params = {"user_id": user_id}
+        filtro_ids = ""
+        if notificacion_ids is not None:
+            if not notificacion_ids:
+                return 0
+            filtro_ids = "AND id_notificacion IN :ids"
+            params["ids"] = notificacion_ids
+
+        query = text(f"""
+            UPDATE notificacion 
+            SET leida = TRUE 
+            WHERE id_usuario = :user_id AND leida = FALSE {filtro_ids}
+        """)
+        if notificacion_ids is not None:
+            query = query.bindparams(bindparam("ids", expanding=True))
+
+        result = db.execute(query, params)
+        db.commit()
+        return result.rowcount
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error al marcar notificaciones como leídas del usuario {user_id}: {e}")
+        return None
@@ -1,14 +1,28 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 from app.schemas.programacion import ProgramacionCreate, ProgramacionUpdate
 from app.crud import notificacion as crud_notificacion
 from app.schemas.notificacion import NotificacionCreate
+from core.database import iter_lotes
 from typing import Optional, List
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Programación con los nombres de instructor, competencia y resultado de aprendizaje
+PROGRAMACION_SELECT = """
+    SELECT p.*, 
+           u.nombre_completo as nombre_instructor,
+           c.nombre as nombre_competencia,
+           r.nombre as nombre_resultado
+    FROM programacion p
+    LEFT JOIN usuario u ON p.id_instructor = u.id_usuario
+    LEFT JOIN competencia c ON p.cod_competencia = c.cod_competencia
+    LEFT JOIN resultado_aprendizaje r ON p.cod_resultado = r.cod_resultado
+"""
+
 def create_programacion(db: Session, programacion: ProgramacionCreate, id_user: int) -> Optional[dict]:
     """
     Crea una nueva programación.
@@ -90,8 +104,8 @@ def create_programacion(db: Session, programacion: ProgramacionCreate, id_user:
                     leida=False
                 )
                 
-                # Guardar la notificación
-                crud_notificacion.create_notification(db=db, notificacion=nueva_notificacion)
+                # Guardar la notificación con el API por lotes
+                crud_notificacion.create_notifications_bulk(db=db, notificaciones=[nueva_notificacion])
                 
         except Exception as notif_error:
             # Log del error pero no fallar la creación de programación
@@ -112,15 +126,8 @@ def get_programacion_by_id(db: Session, id_programacion: int) -> Optional[dict]:
     Obtiene una programación específica por su ID con información completa.
     """
     try:
-        query = text("""
-            SELECT p.*, 
-                   u.nombre_completo as nombre_instructor,
-                   c.nombre as nombre_competencia,
-                   r.nombre as nombre_resultado
-            FROM programacion p
-            LEFT JOIN usuario u ON p.id_instructor = u.id_usuario
-            LEFT JOIN competencia c ON p.cod_competencia = c.cod_competencia
-            LEFT JOIN resultado_aprendizaje r ON p.cod_resultado = r.cod_resultado
+        query = text(f"""
+            {PROGRAMACION_SELECT}
             WHERE p.id_programacion = :id_programacion
         """)
         result = db.execute(query, {"id_programacion": id_programacion}).mappings().first()
@@ -129,25 +136,56 @@ def get_programacion_by_id(db: Session, id_programacion: int) -> Optional[dict]:
         logger.error(f"Error al obtener la programación {id_programacion}: {e}")
         raise Exception("Error de base de datos al obtener la programación")
 
+def _build_programaciones_query(cod_ficha: Optional[int] = None, id_instructor: Optional[int] = None, skip: int = 0, limit: Optional[int] = None):
+    """
+    Construye la consulta de listado de programaciones (con nombres de instructor,
+    competencia y resultado). Compartida por la versión síncrona y la asíncrona.
+    """
+    params = {}
+    if cod_ficha is not None:
+        where = "WHERE p.cod_ficha = :cod_ficha"
+        order = "ORDER BY p.fecha_programada, p.hora_inicio"
+        params["cod_ficha"] = cod_ficha
+    elif id_instructor is not None:
+        where = "WHERE p.id_instructor = :id_instructor"
+        order = "ORDER BY p.fecha_programada, p.hora_inicio"
+        params["id_instructor"] = id_instructor
+    else:
+        where = ""
+        order = "ORDER BY p.fecha_programada DESC, p.hora_inicio"
+
+    paginacion = ""
+    if limit is not None:
+        paginacion = "LIMIT :limit OFFSET :skip"
+        params.update({"limit": limit, "skip": skip})
+
+    query = text(f"""
+        {PROGRAMACION_SELECT}
+        {where}
+        {order}
+        {paginacion}
+    """)
+    return query, params
+
 def get_programaciones_by_ficha(db: Session, cod_ficha: int) -> List[dict]:
     """
     Obtiene todas las programaciones de un grupo específico.
     """
     try:
-        query = text("""
-            SELECT p.*, 
-                   u.nombre_completo as nombre_instructor,
-                   c.nombre as nombre_competencia,
-                   r.nombre as nombre_resultado
-            FROM programacion p
-            LEFT JOIN usuario u ON p.id_instructor = u.id_usuario
-            LEFT JOIN competencia c ON p.cod_competencia = c.cod_competencia
-            LEFT JOIN resultado_aprendizaje r ON p.cod_resultado = r.cod_resultado
-            WHERE p.cod_ficha = :cod_ficha
-            ORDER BY p.fecha_programada, p.hora_inicio
-        """)
-        result = db.execute(query, {"cod_ficha": cod_ficha}).mappings().all()
-        return result
+        query, params = _build_programaciones_query(cod_ficha=cod_ficha)
+        return db.execute(query, params).mappings().all()
+    except Exception as e:
+        logger.error(f"Error al obtener las programaciones del grupo {cod_ficha}: {e}")
+        raise Exception("Error de base de datos al obtener las programaciones del grupo")
+
+async def get_programaciones_by_ficha_async(db: AsyncSession, cod_ficha: int) -> List[dict]:
+    """
+    Versión asíncrona de `get_programaciones_by_ficha`.
+    """
+    try:
+        query, params = _build_programaciones_query(cod_ficha=cod_ficha)
+        result = await db.execute(query, params)
+        return result.mappings().all()
     except Exception as e:
         logger.error(f"Error al obtener las programaciones del grupo {cod_ficha}: {e}")
         raise Exception("Error de base de datos al obtener las programaciones del grupo")
@@ -157,20 +195,20 @@ def get_programaciones_by_instructor(db: Session, id_instructor: int) -> List[di
     Obtiene todas las programaciones de un instructor específico.
     """
     try:
-        query = text("""
-            SELECT p.*, 
-                   u.nombre_completo as nombre_instructor,
-                   c.nombre as nombre_competencia,
-                   r.nombre as nombre_resultado
-            FROM programacion p
-            LEFT JOIN usuario u ON p.id_instructor = u.id_usuario
-            LEFT JOIN competencia c ON p.cod_competencia = c.cod_competencia
-            LEFT JOIN resultado_aprendizaje r ON p.cod_resultado = r.cod_resultado
-            WHERE p.id_instructor = :id_instructor
-            ORDER BY p.fecha_programada, p.hora_inicio
-        """)
-        result = db.execute(query, {"id_instructor": id_instructor}).mappings().all()
-        return result
+        query, params = _build_programaciones_query(id_instructor=id_instructor)
+        return db.execute(query, params).mappings().all()
+    except Exception as e:
+        logger.error(f"Error al obtener las programaciones del instructor {id_instructor}: {e}")
+        raise Exception("Error de base de datos al obtener las programaciones del instructor")
+
+async def get_programaciones_by_instructor_async(db: AsyncSession, id_instructor: int) -> List[dict]:
+    """
+    Versión asíncrona de `get_programaciones_by_instructor`.
+    """
+    try:
+        query, params = _build_programaciones_query(id_instructor=id_instructor)
+        result = await db.execute(query, params)
+        return result.mappings().all()
     except Exception as e:
         logger.error(f"Error al obtener las programaciones del instructor {id_instructor}: {e}")
         raise Exception("Error de base de datos al obtener las programaciones del instructor")
@@ -268,56 +306,95 @@ def get_all_programaciones(db: Session, skip: int = 0, limit: int = 100) -> List
     Obtiene todas las programaciones con paginación.
     """
     try:
-        query = text("""
-            SELECT p.*, 
-                   u.nombre_completo as nombre_instructor,
-                   c.nombre as nombre_competencia,
-                   r.nombre as nombre_resultado
-            FROM programacion p
-            LEFT JOIN usuario u ON p.id_instructor = u.id_usuario
-            LEFT JOIN competencia c ON p.cod_competencia = c.cod_competencia
-            LEFT JOIN resultado_aprendizaje r ON p.cod_resultado = r.cod_resultado
-            ORDER BY p.fecha_programada DESC, p.hora_inicio
-            LIMIT :limit OFFSET :skip
-        """)
-        result = db.execute(query, {"skip": skip, "limit": limit}).mappings().all()
-        return result
+        query, params = _build_programaciones_query(skip=skip, limit=limit)
+        return db.execute(query, params).mappings().all()
     except Exception as e:
         logger.error(f"Error al obtener todas las programaciones: {e}")
         raise Exception("Error de base de datos al obtener las programaciones")
 
-def get_competencias_by_programa(db: Session, cod_programa: int, la_version: int = None) -> List[dict]:
+def iter_all_programaciones(db: Session, lote: int = 1000):
     """
-    Obtiene las competencias asociadas a un programa de formación específico.
-    Nota: Las competencias están asociadas al programa, no a una versión específica.
+    Todas las programaciones (sin paginación) por lotes, con un cursor del lado del
+    servidor, para transmitir el listado completo sin cargarlo en memoria.
     """
     try:
-        query = text("""
-            SELECT DISTINCT c.cod_competencia, c.nombre, c.horas
-            FROM competencia c
-            INNER JOIN programa_competencia pc ON c.cod_competencia = pc.cod_competencia
-            WHERE pc.cod_programa = :cod_programa
-            ORDER BY c.nombre
-        """)
-        result = db.execute(query, {"cod_programa": cod_programa}).mappings().all()
-        return result
+        query, params = _build_programaciones_query()
+        yield from iter_lotes(db, query, params, lote)
     except Exception as e:
-        logger.error(f"Error al obtener competencias del programa {cod_programa}: {e}")
-        raise Exception("Error de base de datos al obtener las competencias del programa")
+        logger.error(f"Error al obtener todas las programaciones: {e}")
+        raise Exception("Error de base de datos al obtener las programaciones")
 
-def get_resultados_by_competencia(db: Session, cod_competencia: int) -> List[dict]:
+async def get_all_programaciones_async(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[dict]:
     """
-    Obtiene los resultados de aprendizaje para una competencia específica.
+    Versión asíncrona de `get_all_programaciones`.
     """
     try:
-        query = text("""
-            SELECT cod_resultado, nombre, cod_competencia, 0 as horas
-            FROM resultado_aprendizaje
-            WHERE cod_competencia = :cod_competencia
-            ORDER BY nombre
-        """)
-        result = db.execute(query, {"cod_competencia": cod_competencia}).mappings().all()
-        return result
+        query, params = _build_programaciones_query(skip=skip, limit=limit)
+        result = await db.execute(query, params)
+        return result.mappings().all()
+    except Exception as e:
+        logger.error(f"Error al obtener todas las programaciones: {e}")
+        raise Exception("Error de base de datos al obtener las programaciones")
+
+# --- Exportación de programaciones ---
+
+# Columnas del reporte, en el orden del archivo
+COLUMNAS_EXPORTACION = [
+    "id_programacion", "fecha_programada", "hora_inicio", "hora_fin", "horas_programadas",
+    "cod_ficha", "cod_centro", "id_instructor", "nombre_instructor",
+    "cod_competencia", "nombre_competencia", "cod_resultado", "nombre_resultado",
+]
+
+def _build_exportacion_query(cod_regional: Optional[int] = None, cod_centro: Optional[int] = None, id_instructor: Optional[int] = None, cod_ficha: Optional[int] = None, fecha_desde=None, fecha_hasta=None):
+    conditions = []
+    params = {}
+    if cod_regional is not None:
+        conditions.append("cf.cod_regional = :cod_regional")
+        params["cod_regional"] = cod_regional
+    if cod_centro is not None:
+        conditions.append("g.cod_centro = :cod_centro")
+        params["cod_centro"] = cod_centro
+    if id_instructor is not None:
+        conditions.append("p.id_instructor = :id_instructor")
+        params["id_instructor"] = id_instructor
+    if cod_ficha is not None:
+        conditions.append("p.cod_ficha = :cod_ficha")
+        params["cod_ficha"] = cod_ficha
+    if fecha_desde is not None:
+        conditions.append("p.fecha_programada >= :fecha_desde")
+        params["fecha_desde"] = fecha_desde
+    if fecha_hasta is not None:
+        conditions.append("p.fecha_programada <= :fecha_hasta")
+        params["fecha_hasta"] = fecha_hasta
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    # El JOIN con centro_formacion solo hace falta para filtrar por regional
+    join_regional = "LEFT JOIN centro_formacion cf ON g.cod_centro = cf.cod_centro" if cod_regional is not None else ""
+    query = text(f"""
+        SELECT p.id_programacion, p.fecha_programada, p.hora_inicio, p.hora_fin, p.horas_programadas,
+               p.cod_ficha, g.cod_centro, p.id_instructor, u.nombre_completo AS nombre_instructor,
+               p.cod_competencia, c.nombre AS nombre_competencia, p.cod_resultado, r.nombre AS nombre_resultado
+        FROM programacion p
+        LEFT JOIN grupo g ON p.cod_ficha = g.cod_ficha
+        {join_regional}
+        LEFT JOIN usuario u ON p.id_instructor = u.id_usuario
+        LEFT JOIN competencia c ON p.cod_competencia = c.cod_competencia
+        LEFT JOIN resultado_aprendizaje r ON p.cod_resultado = r.cod_resultado
+        {where_clause}
+        ORDER BY p.fecha_programada, p.hora_inicio, p.id_programacion
+    """)
+    return query, params
+
+def iter_programaciones_exportacion(db: Session, lote: int = 5000, **filtros):
+    """
+    Recorre las programaciones filtradas en lotes de `lote` filas con un cursor del
+    lado del servidor (stream_results), sin cargar todo el resultado en memoria.
+    """
+    try:
+        query, params = _build_exportacion_query(**filtros)
+        result = db.execute(query, params, execution_options={"stream_results": True, "yield_per": lote})
+        for filas in result.partitions(lote):
+            yield filas
     except Exception as e:
-        logger.error(f"Error al obtener resultados de la competencia {cod_competencia}: {e}")
-        raise Exception("Error de base de datos al obtener los resultados de aprendizaje") 
\ No newline at end of file
+        logger.error(f"Error al exportar programaciones: {e}")
+        raise Exception("Error de base de datos al exportar las programaciones")
@@ -1,10 +1,12 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import logging
 from app.schemas.users import UserCreate, UserUpdate
 from core.security import get_hashed_password, verify_password, verify_reset_password_token
+from core.database import iter_lotes
 
 logger = logging.getLogger(__name__)
 
@@ -50,21 +52,30 @@ def get_user_by_email(db: Session, email: str):
         raise Exception("Error de base de datos al obtener el usuario")
 
 
+_USER_BY_ID_QUERY = text("""
+    SELECT u.id_usuario, u.nombre_completo, u.identificacion, u.id_rol, r.nombre AS nombre_rol,
+           u.correo, u.tipo_contrato, u.telefono, u.estado, u.cod_centro, u.password_changed_at
+    FROM usuario u
+    INNER JOIN rol r ON u.id_rol = r.id_rol
+    WHERE u.id_usuario = :id
+""")
+
 def get_user_by_id(db: Session, id_user: int):
     try:
-        query = text("""
-            SELECT u.id_usuario, u.nombre_completo, u.identificacion, u.id_rol, r.nombre AS nombre_rol,
-                   u.correo, u.tipo_contrato, u.telefono, u.estado, u.cod_centro, u.password_changed_at
-            FROM usuario u
-            INNER JOIN rol r ON u.id_rol = r.id_rol
-            WHERE u.id_usuario = :id
-        """)
-        result = db.execute(query, {"id": id_user}).mappings().first()
+        result = db.execute(_USER_BY_ID_QUERY, {"id": id_user}).mappings().first()
         return result
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener usuario por id: {e}")
         raise Exception("Error de base de datos al obtener el usuario")
 
+async def get_user_by_id_async(db: AsyncSession, id_user: int):
+    try:
+        result = await db.execute(_USER_BY_ID_QUERY, {"id": id_user})
+        return result.mappings().first()
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener usuario por id: {e}")
+        raise Exception("Error de base de datos al obtener el usuario")
+
 
 def update_user(db: Session, user_id: int, user_update: UserUpdate) -> bool:
     try:
@@ -98,21 +109,33 @@ def modify_status_user(db: Session, user_id: int):
         logger.error(f"Error al modificar el estado de usuario: {e}")
         raise Exception("Error de base de datos al modificar estado del usuario")
     
+_USERS_BY_CENTRO_QUERY = text("""
+    SELECT u.id_usuario, u.nombre_completo, u.identificacion, u.id_rol, r.nombre AS nombre_rol,
+           u.correo, u.tipo_contrato, u.telefono, u.estado, u.cod_centro
+    FROM usuario u
+    INNER JOIN rol r ON u.id_rol = r.id_rol
+    WHERE u.cod_centro = :cod_centro
+""")
+
 def get_users_by_centro(db: Session, cod_centro: int):
     try:
-        query = text("""
-            SELECT u.id_usuario, u.nombre_completo, u.identificacion, u.id_rol, r.nombre AS nombre_rol,
-                   u.correo, u.tipo_contrato, u.telefono, u.estado, u.cod_centro
-            FROM usuario u
-            INNER JOIN rol r ON u.id_rol = r.id_rol
-            WHERE u.cod_centro = :cod_centro
-        """)
-        result = db.execute(query, {"cod_centro": cod_centro}).mappings().all()
+        result = db.execute(_USERS_BY_CENTRO_QUERY, {"cod_centro": cod_centro}).mappings().all()
         return result
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener usuarios por cod_centro: {e}")
         raise Exception("Error de base de datos al obtener los usuarios")
 
+def iter_users_by_centro(db: Session, cod_centro: int, lote: int = 1000):
+    """
+    Igual que `get_users_by_centro` pero entrega las filas por lotes con un cursor
+    del lado del servidor, para transmitir la respuesta sin cargarla completa.
+    """
+    try:
+        yield from iter_lotes(db, _USERS_BY_CENTRO_QUERY, {"cod_centro": cod_centro}, lote)
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener usuarios por cod_centro: {e}")
+        raise Exception("Error de base de datos al obtener los usuarios")
+
 def change_password(db: Session, user_id: int, current_password: str, new_password: str) -> bool:
     try:
         # Obtener el usuario por su ID junto con su contraseña hasheada
@@ -215,21 +238,32 @@ def reset_password(db: Session, token: str, new_password: str) -> Optional[bool]
         logger.error(f"Error inesperado al restablecer contraseña: {e}")
         return None
 
+_INSTRUCTORES_QUERY = text("""
+    SELECT u.id_usuario, u.nombre_completo, u.identificacion, u.id_rol, r.nombre AS nombre_rol,
+           u.correo, u.tipo_contrato, u.telefono, u.estado, u.cod_centro
+    FROM usuario u
+    INNER JOIN rol r ON u.id_rol = r.id_rol
+    WHERE u.id_rol = 3 AND u.estado = 1
+    ORDER BY u.nombre_completo
+""")
+
 def get_instructores(db: Session):
     """
     Obtiene todos los usuarios que tienen el rol de instructor (id_rol = 3).
     """
     try:
-        query = text("""
-            SELECT u.id_usuario, u.nombre_completo, u.identificacion, u.id_rol, r.nombre AS nombre_rol,
-                   u.correo, u.tipo_contrato, u.telefono, u.estado, u.cod_centro
-            FROM usuario u
-            INNER JOIN rol r ON u.id_rol = r.id_rol
-            WHERE u.id_rol = 3 AND u.estado = 1
-            ORDER BY u.nombre_completo
-        """)
-        result = db.execute(query).mappings().all()
+        result = db.execute(_INSTRUCTORES_QUERY).mappings().all()
         return result
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener instructores: {e}")
         raise Exception("Error de base de datos al obtener los instructores")
+
+def iter_instructores(db: Session, lote: int = 1000):
+    """
+    Versión por lotes de `get_instructores` (cursor del lado del servidor).
+    """
+    try:
+        yield from iter_lotes(db, _INSTRUCTORES_QUERY, lote=lote)
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener instructores: {e}")
+        raise Exception("Error de base de datos al obtener los instructores")
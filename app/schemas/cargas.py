@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Literal, Optional
+
+TipoArchivo = Literal["pe04", "df14", "evaluaciones"]
+
+class CargaInicio(BaseModel):
+    archivo: TipoArchivo
+    nombre: Optional[str] = Field(default=None, max_length=255)
+    tamano_total: Optional[int] = Field(default=None, ge=1)
+
+class CargaCompletar(BaseModel):
+    # Número de partes esperadas; si se omite, las partes deben ser consecutivas desde 1
+    partes: Optional[int] = Field(default=None, ge=1)
+    sha256: Optional[str] = Field(default=None, pattern="^[0-9a-fA-F]{64}$")
+
+class ParteOut(BaseModel):
+    numero: int
+    bytes: int
+    sha256: str
+
+class CargaEstado(BaseModel):
+    id_carga: str
+    archivo: TipoArchivo
+    nombre: Optional[str] = None
+    tamano_total: Optional[int] = None
+    tamano_parte_max: int
+    bytes_recibidos: int
+    partes: Dict[int, int]
+    creada: str
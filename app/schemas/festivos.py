@@ -15,3 +15,24 @@ class FestivosResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class DiasHabilesResponse(BaseModel):
+    fecha_inicio: date
+    fecha_fin: date
+    dias_habiles: int
+
+class SumarDiasResponse(BaseModel):
+    fecha: date
+    dias: int
+    fecha_resultado: date
+
+class DiasClaseFicha(BaseModel):
+    cod_ficha: int
+    fecha_inicio: date
+    fecha_fin: date
+    dias_clase: int
+    dias_transcurridos: int
+    dias_restantes: int
+
+    class Config:
+        from_attributes = True
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 
 class NotificacionBase(BaseModel):
@@ -18,3 +18,12 @@ class Notificacion(NotificacionBase):
 
     class Config:
         from_attributes = True
+
+
+class NotificacionesNoLeidas(BaseModel):
+    total: int
+
+
+class MarcarNotificacionesLeidas(BaseModel):
+    # Si no se envían IDs se marcan todas las notificaciones sin leer del usuario
+    ids: Optional[List[int]] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, field_validator
-from typing import Optional
+from typing import Optional, List
 from datetime import date, time, timedelta
 
 class ProgramacionBase(BaseModel):
@@ -78,4 +78,46 @@ class ValidarCruceRequest(BaseModel):
 
 class ValidarCruceResponse(BaseModel):
     conflicto: bool
-    mensaje: Optional[str] = None 
\ No newline at end of file
+    mensaje: Optional[str] = None
+    # True si la fecha es domingo o festivo (no bloquea, solo advierte)
+    dia_no_lectivo: bool = False 
+# Esquemas para la capacidad de horas lectivas
+class CapacidadCompetencia(BaseModel):
+    cod_competencia: int
+    nombre_competencia: Optional[str] = None
+    horas_competencia: int
+    horas_programadas: int
+    horas_ejecutadas: int
+    horas_pendientes: int
+
+class CapacidadFicha(BaseModel):
+    cod_ficha: int
+    cod_programa: Optional[int] = None
+    la_version: Optional[int] = None
+    nombre_programa: Optional[str] = None
+    fecha_inicio: date
+    fecha_fin: date
+    horas_lectivas: int
+    horas_programadas: int
+    horas_ejecutadas: int
+    horas_por_programar: int
+    dias_lectivos_restantes: int
+    horas_disponibles_calendario: int
+    horas_asignables: int
+    horas_diarias_requeridas: Optional[float] = None
+    porcentaje_programado: float
+    en_riesgo: bool
+    competencias: List[CapacidadCompetencia] = []
+
+class CapacidadResumen(BaseModel):
+    total_fichas: int
+    horas_lectivas: int
+    horas_programadas: int
+    horas_ejecutadas: int
+    horas_por_programar: int
+    fichas_en_riesgo: int
+    porcentaje_programado: float
+
+class CapacidadCentro(BaseModel):
+    resumen: CapacidadResumen
+    fichas: List[CapacidadFicha]
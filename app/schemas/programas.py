@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
+from app.schemas.competencia import CompetenciaOut
+from app.schemas.resultado_aprendizaje import ResultadoAprendizajeOut
 
 class ProgramaBase(BaseModel):
     cod_programa: int
@@ -29,4 +31,14 @@ class ProgramaOut(ProgramaBase):
 
 class ProgramaPage(BaseModel):
     total_items: int
-    items: List[ProgramaOut]
\ No newline at end of file
+    items: List[ProgramaOut]
+
+# --- Árbol de competencias del programa (catálogo en memoria) ---
+class CompetenciaArbol(CompetenciaOut):
+    resultados: List[ResultadoAprendizajeOut] = []
+
+class ProgramaArbol(BaseModel):
+    cod_programa: int
+    nombre_programa: str
+    versiones: List[int]
+    competencias: List[CompetenciaArbol]
@@ -0,0 +1,143 @@
+"""
+Calendario académico en memoria: festivos + domingos como días no lectivos.
+
+Los festivos se cargan una sola vez desde la base de datos en un arreglo ordenado
+de NumPy (datetime64[D]) y en un `np.busdaycalendar` con semana lectiva de lunes
+a sábado. Todas las operaciones (días hábiles entre fechas, sumar N días de clase,
+días de clase por ficha) son vectorizadas y no consultan la base de datos.
+
+El calendario se recarga automáticamente cuando vence su TTL o cuando se llama a
+`invalidar()` (por ejemplo, después de modificar la tabla festivos).
+"""
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from typing import List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.crud import festivos as crud_festivos
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lunes a sábado son días lectivos; el domingo no
+SEMANA_LECTIVA = "1111110"
+
+
+class CalendarioFestivos:
+    def __init__(self, ttl_seconds: int = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._festivos: np.ndarray = np.array([], dtype="datetime64[D]")
+        self._calendario: Optional[np.busdaycalendar] = None
+        self._cargado_en: Optional[float] = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Carga y recarga
+    # ------------------------------------------------------------------
+    def invalidar(self) -> None:
+        """Marca el calendario como vencido; se recarga en el próximo uso."""
+        with self._lock:
+            self._cargado_en = None
+
+    def _vigente(self) -> bool:
+        return self._cargado_en is not None and (time.monotonic() - self._cargado_en) < self.ttl_seconds
+
+    def _asegurar_cargado(self, db: Session) -> np.busdaycalendar:
+        if self._vigente():
+            return self._calendario
+        with self._lock:
+            if self._vigente():
+                return self._calendario
+            festivos = np.unique(np.array(crud_festivos.get_festivos(db), dtype="datetime64[D]"))
+            self._festivos = festivos
+            self._calendario = np.busdaycalendar(weekmask=SEMANA_LECTIVA, holidays=festivos)
+            self._cargado_en = time.monotonic()
+            logger.info(f"Calendario de festivos cargado: {len(festivos)} festivos")
+            return self._calendario
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def get_festivos(self, db: Session, year: Optional[int] = None) -> List[date]:
+        """Festivos registrados (todos o de un año) usando búsqueda binaria sobre el arreglo ordenado."""
+        self._asegurar_cargado(db)
+        festivos = self._festivos
+        if year is not None:
+            inicio = np.searchsorted(festivos, np.datetime64(f"{year:04d}-01-01"), side="left")
+            fin = np.searchsorted(festivos, np.datetime64(f"{year + 1:04d}-01-01"), side="left")
+            festivos = festivos[inicio:fin]
+        return festivos.tolist()
+
+    @staticmethod
+    def get_domingos(start_date: date, end_date: date) -> List[date]:
+        """Todos los domingos entre dos fechas (inclusive)."""
+        inicio = np.datetime64(start_date, "D")
+        fin = np.datetime64(end_date, "D")
+        # np.busday_offset con máscara de solo domingos da el primer domingo >= inicio
+        primero = np.busday_offset(inicio, 0, roll="forward", weekmask="0000001")
+        return np.arange(primero, fin + 1, 7, dtype="datetime64[D]").tolist()
+
+    def es_dia_lectivo(self, db: Session, fecha: date) -> bool:
+        """True si la fecha no es domingo ni festivo."""
+        return bool(np.is_busday(np.datetime64(fecha, "D"), busdaycal=self._asegurar_cargado(db)))
+
+    def contar_dias_habiles(self, db: Session, fecha_inicio: date, fecha_fin: date) -> int:
+        """Número de días lectivos entre dos fechas, ambas inclusive."""
+        calendario = self._asegurar_cargado(db)
+        inicio = np.datetime64(fecha_inicio, "D")
+        fin = np.datetime64(fecha_fin, "D") + 1
+        return int(np.busday_count(inicio, fin, busdaycal=calendario))
+
+    def contar_dias_habiles_lote(self, db: Session, inicios: Sequence[date], fines: Sequence[date]) -> np.ndarray:
+        """Versión vectorizada de `contar_dias_habiles` para muchos rangos a la vez."""
+        calendario = self._asegurar_cargado(db)
+        inicios_arr = np.array(inicios, dtype="datetime64[D]")
+        fines_arr = np.array(fines, dtype="datetime64[D]") + 1
+        # Un rango invertido cuenta negativo en NumPy; se reporta como 0 días
+        return np.maximum(np.busday_count(inicios_arr, fines_arr, busdaycal=calendario), 0)
+
+    def sumar_dias_habiles(self, db: Session, fecha: date, dias: int) -> date:
+        """
+        Fecha resultante de avanzar (o retroceder, si `dias` es negativo) N días lectivos.
+        Si la fecha de partida no es lectiva se toma el siguiente (o anterior) día lectivo.
+        """
+        calendario = self._asegurar_cargado(db)
+        roll = "forward" if dias >= 0 else "backward"
+        resultado = np.busday_offset(np.datetime64(fecha, "D"), dias, roll=roll, busdaycal=calendario)
+        return resultado.astype(date)
+
+    def dias_clase_por_fichas(self, db: Session, grupos: Sequence[dict], hoy: Optional[date] = None) -> List[dict]:
+        """
+        Días de clase totales, transcurridos y restantes para cada ficha.
+        Espera filas con cod_ficha, fecha_inicio y fecha_fin (no nulas).
+        """
+        if not grupos:
+            return []
+        hoy = hoy or date.today()
+        inicios = [g["fecha_inicio"] for g in grupos]
+        fines = [g["fecha_fin"] for g in grupos]
+        ayer = np.datetime64(hoy, "D") - 1
+        cortes = np.minimum(np.array(fines, dtype="datetime64[D]"), ayer)
+
+        totales = self.contar_dias_habiles_lote(db, inicios, fines)
+        transcurridos = self.contar_dias_habiles_lote(db, inicios, cortes.tolist())
+
+        return [
+            {
+                "cod_ficha": g["cod_ficha"],
+                "fecha_inicio": g["fecha_inicio"],
+                "fecha_fin": g["fecha_fin"],
+                "dias_clase": int(total),
+                "dias_transcurridos": int(pasados),
+                "dias_restantes": int(total - pasados),
+            }
+            for g, total, pasados in zip(grupos, totales, transcurridos)
+        ]
+
+
+# Instancia global del calendario
+calendario = CalendarioFestivos(ttl_seconds=settings.calendario_ttl_seconds)
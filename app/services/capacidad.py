@@ -0,0 +1,146 @@
+"""
+Capacidad de horas lectivas por ficha y por competencia.
+
+Responde "¿cuántas horas lectivas puede recibir aún la ficha X antes de su fecha
+de fin?" para todas las fichas activas de un centro en una sola pasada: tres
+consultas agregadas (fichas, horas programadas, competencias) y el resto se
+calcula con pandas/NumPy, incluidos los días lectivos restantes que se obtienen
+del calendario de festivos en memoria.
+
+El resultado por centro se guarda en caché (TTL) y se invalida cuando se crea,
+modifica o elimina una programación.
+"""
+import logging
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.crud import capacidad as crud_capacidad
+from app.services.calendario import calendario
+from app.utils.helpers import TTLCache
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_cache = TTLCache(ttl_seconds=settings.capacidad_cache_ttl_seconds)
+
+COLUMNAS_FICHA = [
+    "cod_ficha", "cod_programa", "la_version", "nombre_programa", "fecha_inicio", "fecha_fin",
+    "horas_lectivas", "horas_programadas", "horas_ejecutadas", "horas_por_programar",
+    "dias_lectivos_restantes", "horas_disponibles_calendario", "horas_asignables",
+    "horas_diarias_requeridas", "porcentaje_programado", "en_riesgo",
+]
+
+
+def invalidar_capacidad() -> None:
+    """Descarta los cálculos en caché (llamar después de escribir en programacion)."""
+    _cache.clear()
+
+
+def _resumen(fichas: pd.DataFrame) -> dict:
+    horas_lectivas = int(fichas["horas_lectivas"].sum()) if not fichas.empty else 0
+    horas_programadas = int(fichas["horas_programadas"].sum()) if not fichas.empty else 0
+    return {
+        "total_fichas": int(len(fichas)),
+        "horas_lectivas": horas_lectivas,
+        "horas_programadas": horas_programadas,
+        "horas_ejecutadas": int(fichas["horas_ejecutadas"].sum()) if not fichas.empty else 0,
+        "horas_por_programar": int(fichas["horas_por_programar"].sum()) if not fichas.empty else 0,
+        "fichas_en_riesgo": int(fichas["en_riesgo"].sum()) if not fichas.empty else 0,
+        "porcentaje_programado": round(horas_programadas * 100 / horas_lectivas, 2) if horas_lectivas else 0.0,
+    }
+
+
+def calcular_capacidad(
+    db: Session,
+    cod_centro: int,
+    cod_ficha: Optional[int] = None,
+    estado_grupo: Optional[str] = None,
+    horas_max_dia: Optional[int] = None,
+    hoy: Optional[date] = None,
+) -> dict:
+    """
+    Calcula horas programadas y restantes por ficha y por competencia.
+
+    Args:
+        cod_centro: Centro de formación
+        cod_ficha: Limita el cálculo a una ficha (opcional)
+        estado_grupo: Filtra las fichas por estado (opcional)
+        horas_max_dia: Horas lectivas máximas que una ficha puede recibir por día
+        hoy: Fecha de corte (por defecto la fecha actual)
+
+    Returns:
+        Dict con "resumen" del centro y la lista de "fichas" (cada una con sus "competencias")
+    """
+    hoy = hoy or date.today()
+    horas_max_dia = horas_max_dia or settings.capacidad_horas_max_dia
+
+    cache_key = (cod_centro, cod_ficha, estado_grupo, horas_max_dia, hoy)
+    cached = _cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    fichas = pd.DataFrame(crud_capacidad.get_fichas_activas(db, cod_centro, hoy, cod_ficha, estado_grupo))
+    if fichas.empty:
+        resultado = {"resumen": _resumen(pd.DataFrame()), "fichas": []}
+        _cache.set(cache_key, resultado)
+        return resultado
+
+    horas = pd.DataFrame(
+        crud_capacidad.get_horas_programadas(db, cod_centro, hoy, cod_ficha, estado_grupo),
+        columns=["cod_ficha", "cod_competencia", "horas_programadas", "horas_ejecutadas"],
+    )
+    competencias = pd.DataFrame(
+        crud_capacidad.get_competencias_fichas_activas(db, cod_centro, hoy, cod_ficha, estado_grupo),
+        columns=["cod_programa", "cod_competencia", "nombre_competencia", "horas_competencia"],
+    )
+    # MySQL devuelve SUM() como Decimal
+    horas[["horas_programadas", "horas_ejecutadas"]] = horas[["horas_programadas", "horas_ejecutadas"]].astype("int64")
+    competencias["horas_competencia"] = competencias["horas_competencia"].astype("int64")
+
+    # --- Por ficha ---
+    por_ficha = horas.groupby("cod_ficha", as_index=False)[["horas_programadas", "horas_ejecutadas"]].sum()
+    fichas = fichas.merge(por_ficha, on="cod_ficha", how="left")
+    fichas[["horas_programadas", "horas_ejecutadas"]] = fichas[["horas_programadas", "horas_ejecutadas"]].fillna(0).astype("int64")
+    fichas["horas_lectivas"] = fichas["horas_lectivas"].astype("int64")
+
+    inicios = np.maximum(np.array(fichas["fecha_inicio"].tolist(), dtype="datetime64[D]"), np.datetime64(hoy, "D"))
+    dias_restantes = calendario.contar_dias_habiles_lote(db, inicios.tolist(), fichas["fecha_fin"].tolist())
+    horas_futuras = fichas["horas_programadas"] - fichas["horas_ejecutadas"]
+
+    fichas["horas_por_programar"] = (fichas["horas_lectivas"] - fichas["horas_programadas"]).clip(lower=0)
+    fichas["dias_lectivos_restantes"] = dias_restantes
+    fichas["horas_disponibles_calendario"] = (dias_restantes * horas_max_dia - horas_futuras).clip(lower=0)
+    fichas["horas_asignables"] = np.minimum(fichas["horas_por_programar"], fichas["horas_disponibles_calendario"])
+    fichas["horas_diarias_requeridas"] = (fichas["horas_por_programar"] / fichas["dias_lectivos_restantes"].where(fichas["dias_lectivos_restantes"] > 0)).round(2)
+    fichas["porcentaje_programado"] = (fichas["horas_programadas"] * 100 / fichas["horas_lectivas"].where(fichas["horas_lectivas"] > 0)).round(2).fillna(0.0)
+    fichas["en_riesgo"] = fichas["horas_por_programar"] > fichas["horas_disponibles_calendario"]
+
+    # --- Por competencia (cada ficha contra las competencias de su programa) ---
+    por_competencia = fichas[["cod_ficha", "cod_programa"]].merge(competencias, on="cod_programa", how="inner")
+    por_competencia = por_competencia.merge(horas, on=["cod_ficha", "cod_competencia"], how="left")
+    por_competencia[["horas_programadas", "horas_ejecutadas"]] = por_competencia[["horas_programadas", "horas_ejecutadas"]].fillna(0).astype("int64")
+    por_competencia["horas_pendientes"] = (por_competencia["horas_competencia"] - por_competencia["horas_programadas"]).clip(lower=0)
+    por_competencia = por_competencia.sort_values(["cod_ficha", "nombre_competencia"])
+
+    columnas_competencia = ["cod_competencia", "nombre_competencia", "horas_competencia", "horas_programadas", "horas_ejecutadas", "horas_pendientes"]
+    competencias_por_ficha = {
+        cod: grupo[columnas_competencia].to_dict("records")
+        for cod, grupo in por_competencia.groupby("cod_ficha", sort=False)
+    }
+
+    registros = fichas[COLUMNAS_FICHA].astype(object).where(fichas[COLUMNAS_FICHA].notna(), None).to_dict("records")
+    for registro in registros:
+        registro["competencias"] = competencias_por_ficha.get(registro["cod_ficha"], [])
+
+    resultado = {"resumen": _resumen(fichas), "fichas": registros}
+    _cache.set(cache_key, resultado)
+    return resultado
+
+
+def get_resumen_capacidad(db: Session, cod_centro: int, estado_grupo: Optional[str] = None) -> dict:
+    """Métrica de capacidad para el dashboard (comparte la caché del cálculo completo)."""
+    return calcular_capacidad(db, cod_centro, estado_grupo=estado_grupo)["resumen"]
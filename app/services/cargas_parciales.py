@@ -0,0 +1,328 @@
+"""
+Cargas de archivos por partes, reanudables.
+
+Un PE-04 regional de 40 MB en un solo multipart se pierde completo si la conexión se
+corta. Con este protocolo el cliente sube el archivo en partes numeradas y, si una
+falla, repite solo esa parte:
+
+1. `iniciar` crea la carga y devuelve su id.
+2. `guardar_parte` escribe cada parte en disco (repetir una parte la reemplaza).
+3. `estado` dice qué partes ya se recibieron, para reanudar.
+4. `ensamblar` une las partes en un solo archivo, que el pipeline de importación
+   lee con `mapear` (mmap) en lugar de cargar todo el contenido en un `BytesIO`.
+
+Todo el estado vive en el directorio de la carga (UPLOAD_SPOOL_DIR), así que
+cualquier worker que vea ese directorio puede atender cualquier parte. Las cargas
+sin actividad por más de UPLOAD_TTL_SECONDS se borran.
+"""
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_META = "carga.json"
+_ENSAMBLADO = "archivo"
+_BLOQUEO = "completando.lock"
+MAX_PARTES = 10000
+# Tamaño de bloque al copiar a disco un archivo subido en un solo multipart
+BLOQUE = 1024 * 1024
+
+
+class CargaNoEncontrada(Exception):
+    """La carga no existe o ya venció."""
+
+
+class CargaInvalida(Exception):
+    """Parte o ensamblado que no cumple el protocolo (faltan partes, tamaño, checksum)."""
+
+
+class CargaDemasiadoGrande(Exception):
+    """La parte o el archivo supera el tamaño máximo configurado."""
+
+
+class CargaEnProceso(Exception):
+    """Otra petición, quizá en otro worker, está completando la carga."""
+
+
+def _directorio(id_carga: str) -> str:
+    return os.path.join(settings.UPLOAD_SPOOL_DIR, id_carga)
+
+
+def _ruta_parte(id_carga: str, numero: int) -> str:
+    return os.path.join(_directorio(id_carga), f"parte-{numero:05d}")
+
+
+def _leer_meta(id_carga: str) -> dict:
+    try:
+        with open(os.path.join(_directorio(id_carga), _META), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise CargaNoEncontrada(f"Carga {id_carga} no encontrada o vencida")
+
+
+def _tocar(id_carga: str) -> None:
+    # La vigencia se cuenta desde la última actividad, no desde la creación
+    os.utime(os.path.join(_directorio(id_carga), _META))
+
+
+def _partes(id_carga: str) -> Dict[int, int]:
+    partes = {}
+    for nombre in os.listdir(_directorio(id_carga)):
+        if nombre.startswith("parte-") and nombre[6:].isdigit():
+            partes[int(nombre[6:])] = os.path.getsize(os.path.join(_directorio(id_carga), nombre))
+    return dict(sorted(partes.items()))
+
+
+def purgar_vencidas() -> int:
+    """Borra las cargas sin actividad en UPLOAD_TTL_SECONDS; devuelve cuántas borró."""
+    if not os.path.isdir(settings.UPLOAD_SPOOL_DIR):
+        return 0
+    limite = time.time() - settings.UPLOAD_TTL_SECONDS
+    borradas = 0
+    for id_carga in os.listdir(settings.UPLOAD_SPOOL_DIR):
+        meta = os.path.join(_directorio(id_carga), _META)
+        try:
+            vencida = os.path.getmtime(meta) < limite
+        except FileNotFoundError:
+            # Sin carga.json (un `iniciar` interrumpido): cuenta la fecha del directorio
+            try:
+                vencida = os.path.getmtime(_directorio(id_carga)) < limite
+            except FileNotFoundError:
+                continue
+        if vencida:
+            shutil.rmtree(_directorio(id_carga), ignore_errors=True)
+            borradas += 1
+    return borradas
+
+
+def iniciar(archivo: str, nombre: Optional[str] = None, tamano_total: Optional[int] = None) -> dict:
+    if tamano_total is not None and tamano_total > settings.UPLOAD_MAX_BYTES:
+        raise CargaDemasiadoGrande(f"El archivo supera el máximo de {settings.UPLOAD_MAX_BYTES} bytes")
+    purgar_vencidas()
+    id_carga = uuid.uuid4().hex
+    meta = {
+        "id_carga": id_carga,
+        "archivo": archivo,
+        "nombre": nombre,
+        "tamano_total": tamano_total,
+        "creada": datetime.now().isoformat(timespec="seconds"),
+    }
+    # El directorio se arma aparte y se renombra ya con su carga.json: otro `iniciar`
+    # que purgue a la vez nunca ve la carga a medio crear
+    os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix=f".{id_carga}.", dir=settings.UPLOAD_SPOOL_DIR)
+    try:
+        with open(os.path.join(temporal, _META), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temporal, _directorio(id_carga))
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+    logger.info("Carga por partes iniciada", extra={"id_carga": id_carga, "archivo": archivo, "tamano_total": tamano_total})
+    return estado(id_carga)
+
+
+def estado(id_carga: str) -> dict:
+    meta = _leer_meta(id_carga)
+    partes = _partes(id_carga)
+    return {
+        **meta,
+        "tamano_parte_max": settings.UPLOAD_PART_MAX_BYTES,
+        "bytes_recibidos": sum(partes.values()),
+        "partes": partes,
+    }
+
+
+async def guardar_parte(id_carga: str, numero: int, flujo: AsyncIterator[bytes]) -> dict:
+    """
+    Escribe la parte `numero` desde `flujo` (el cuerpo de la petición, por bloques).
+    Se escribe en un temporal y se renombra al terminar: una parte cortada a la mitad
+    nunca queda como recibida. Se corta en cuanto la carga completa superaría
+    UPLOAD_MAX_BYTES (o el `tamano_total` anunciado), no solo al ensamblar.
+    """
+    if not 1 <= numero <= MAX_PARTES:
+        raise CargaInvalida(f"El número de parte debe estar entre 1 y {MAX_PARTES}")
+    meta = _leer_meta(id_carga)
+    recibidas = _partes(id_carga)
+    # La parte que se reemplaza no cuenta: sus bytes se descartan al renombrar
+    previos = sum(recibidas.values()) - recibidas.get(numero, 0)
+    limite = min(settings.UPLOAD_MAX_BYTES, meta["tamano_total"] or settings.UPLOAD_MAX_BYTES)
+    destino = _ruta_parte(id_carga, numero)
+    temporal = f"{destino}.{uuid.uuid4().hex[:8]}.tmp"
+    huella = hashlib.sha256()
+    tamano = 0
+    try:
+        with open(temporal, "wb") as f:
+            async for bloque in flujo:
+                tamano += len(bloque)
+                if tamano > settings.UPLOAD_PART_MAX_BYTES:
+                    raise CargaDemasiadoGrande(f"La parte supera el máximo de {settings.UPLOAD_PART_MAX_BYTES} bytes")
+                if previos + tamano > limite:
+                    raise CargaDemasiadoGrande(f"La carga supera el máximo de {limite} bytes")
+                huella.update(bloque)
+                f.write(bloque)
+        if tamano == 0:
+            raise CargaInvalida("La parte está vacía")
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    _tocar(id_carga)
+    return {"numero": numero, "bytes": tamano, "sha256": huella.hexdigest()}
+
+
+def ensamblar(id_carga: str, partes: Optional[int] = None, sha256: Optional[str] = None) -> dict:
+    """
+    Une las partes en orden en un solo archivo y devuelve su ruta y tamaño.
+    Las partes deben ser 1..N sin huecos (N = `partes` si el cliente lo indica).
+    Si la carga ya se ensambló (un reintento de completar) devuelve ese archivo.
+    """
+    meta = _leer_meta(id_carga)
+    ruta = os.path.join(_directorio(id_carga), _ENSAMBLADO)
+    if os.path.exists(ruta):
+        return {"archivo": meta["archivo"], "ruta": ruta, "bytes": os.path.getsize(ruta)}
+    recibidas = _partes(id_carga)
+    if not recibidas:
+        raise CargaInvalida("La carga no tiene partes")
+    total = partes or max(recibidas)
+    faltantes = [n for n in range(1, total + 1) if n not in recibidas]
+    sobrantes = [n for n in recibidas if n > total]
+    if faltantes or sobrantes:
+        raise CargaInvalida(f"Partes faltantes: {faltantes[:50]}; partes de más: {sobrantes[:50]}")
+    tamano = sum(recibidas.values())
+    if tamano > settings.UPLOAD_MAX_BYTES:
+        raise CargaDemasiadoGrande(f"El archivo supera el máximo de {settings.UPLOAD_MAX_BYTES} bytes")
+    if meta["tamano_total"] is not None and tamano != meta["tamano_total"]:
+        raise CargaInvalida(f"Se recibieron {tamano} bytes y se anunciaron {meta['tamano_total']}")
+
+    temporal = f"{ruta}.{uuid.uuid4().hex[:8]}.tmp"
+    huella = hashlib.sha256()
+    with open(temporal, "wb") as salida:
+        for numero in range(1, total + 1):
+            with open(_ruta_parte(id_carga, numero), "rb") as parte:
+                while bloque := parte.read(1024 * 1024):
+                    huella.update(bloque)
+                    salida.write(bloque)
+    if sha256 is not None and huella.hexdigest() != sha256.lower():
+        os.remove(temporal)
+        raise CargaInvalida("El sha256 del archivo ensamblado no coincide con el enviado")
+    os.replace(temporal, ruta)
+    # Las partes ya están en el archivo ensamblado: no ocupar el doble de disco
+    for numero in range(1, total + 1):
+        os.remove(_ruta_parte(id_carga, numero))
+    _tocar(id_carga)
+    return {"archivo": meta["archivo"], "ruta": ruta, "bytes": tamano}
+
+
+async def guardar_temporal(subido) -> dict:
+    """
+    Copia un `UploadFile` a un archivo temporal por bloques de BLOQUE bytes, sin
+    tenerlo completo en memoria, y calcula su sha256 por el camino. Quien lo procese
+    debe borrar la ruta devuelta.
+    """
+    descriptor, ruta = tempfile.mkstemp(prefix="carga_", suffix=".xlsx")
+    huella = hashlib.sha256()
+    tamano = 0
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            while bloque := await subido.read(BLOQUE):
+                tamano += len(bloque)
+                if tamano > settings.UPLOAD_MAX_BYTES:
+                    raise CargaDemasiadoGrande(f"El archivo supera el máximo de {settings.UPLOAD_MAX_BYTES} bytes")
+                huella.update(bloque)
+                f.write(bloque)
+        if tamano == 0:
+            raise CargaInvalida("El archivo está vacío")
+    except BaseException:
+        os.remove(ruta)
+        raise
+    return {"ruta": ruta, "bytes": tamano, "sha256": huella.hexdigest()}
+
+
+class ArchivoMapeado(io.RawIOBase):
+    """
+    Archivo de solo lectura sobre un mmap. zipfile (y por lo tanto openpyxl) pide
+    `seekable()`, que mmap no tiene antes de Python 3.13.
+    """
+
+    def __init__(self, vista: mmap.mmap):
+        super().__init__()
+        self._vista = vista
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, posicion: int, desde: int = io.SEEK_SET) -> int:
+        self._vista.seek(posicion, desde)
+        return self._vista.tell()
+
+    def tell(self) -> int:
+        return self._vista.tell()
+
+    def read(self, tamano: int = -1) -> bytes:
+        return self._vista.read(tamano if tamano is not None and tamano >= 0 else None)
+
+    def readinto(self, destino) -> int:
+        datos = self._vista.read(len(destino))
+        destino[:len(datos)] = datos
+        return len(datos)
+
+
+@contextmanager
+def mapear(ruta: str) -> Iterator[ArchivoMapeado]:
+    """
+    Abre el archivo como mmap de solo lectura: pandas y openpyxl lo leen
+    como un archivo, y las páginas se cargan del disco a medida que se usan en lugar
+    de copiar todo el contenido a memoria.
+    """
+    with open(ruta, "rb") as f:
+        vista = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield ArchivoMapeado(vista)
+        finally:
+            vista.close()
+
+
+@contextmanager
+def bloquear(id_carga: str) -> Iterator[None]:
+    """
+    Reserva la carga para ensamblarla y procesarla. El registro de idempotencia es por
+    proceso; este archivo de bloqueo (creado con O_EXCL) evita que dos workers
+    completen la misma carga a la vez. Si ya está tomado lanza `CargaEnProceso`.
+    """
+    ruta = os.path.join(_directorio(id_carga), _BLOQUEO)
+    try:
+        descriptor = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        raise CargaEnProceso(f"La carga {id_carga} ya se está completando")
+    except FileNotFoundError:
+        raise CargaNoEncontrada(f"Carga {id_carga} no encontrada o vencida")
+    os.close(descriptor)
+    try:
+        yield
+    finally:
+        # Si la carga terminó bien, `descartar` ya borró el directorio con el bloqueo
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def descartar(id_carga: str) -> None:
+    shutil.rmtree(_directorio(id_carga), ignore_errors=True)
@@ -0,0 +1,149 @@
+"""
+Catálogo de competencias en memoria: programa <-> competencia <-> resultado de aprendizaje.
+
+El formulario de programación consulta competencias del programa y resultados de la
+competencia en cada cambio de los selects. En lugar de un JOIN por petición, las
+cuatro tablas del catálogo se leen una sola vez y se arman índices por programa y por
+competencia, ya ordenados como los devuelven los endpoints.
+
+El grafo es inmutable: una recarga construye uno nuevo y lo reemplaza, así que las
+lecturas no toman ningún lock. Se recarga cuando vence su TTL o cuando se llama a
+`invalidar()` (carga de evaluaciones y escrituras de competencias).
+"""
+import logging
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.crud import competencia as crud_competencia
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _clave_nombre(nombre: Optional[str]) -> str:
+    # Orden como el ORDER BY nombre de MySQL (collation *_ci): sin tildes ni mayúsculas
+    descompuesto = unicodedata.normalize("NFKD", nombre or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+@dataclass(frozen=True)
+class _Grafo:
+    competencias: Dict[int, dict]
+    # cod_programa -> competencias ordenadas por código y por nombre
+    por_programa_codigo: Dict[int, Tuple[dict, ...]]
+    por_programa_nombre: Dict[int, Tuple[dict, ...]]
+    # cod_competencia -> resultados (por nombre) y programas (por código y versión)
+    resultados: Dict[int, Tuple[dict, ...]]
+    programas_de_competencia: Dict[int, Tuple[dict, ...]]
+    # cod_programa -> versiones del programa (la más reciente primero)
+    programas: Dict[int, Tuple[dict, ...]]
+
+
+def _construir(filas: dict) -> _Grafo:
+    competencias = {c["cod_competencia"]: dict(c) for c in filas["competencias"]}
+
+    resultados = defaultdict(list)
+    for r in filas["resultados"]:
+        resultados[r["cod_competencia"]].append({**r, "horas": 0})
+
+    programas = defaultdict(list)
+    for p in filas["programas"]:
+        programas[p["cod_programa"]].append({"cod_programa": p["cod_programa"], "la_version": p["la_version"], "nombre_programa": p["nombre"]})
+
+    por_programa = defaultdict(list)
+    programas_de_competencia = defaultdict(list)
+    for cod_programa, cod_competencia in filas["relaciones"]:
+        if cod_competencia in competencias:
+            por_programa[cod_programa].append(competencias[cod_competencia])
+        programas_de_competencia[cod_competencia].extend(programas.get(cod_programa, ()))
+
+    return _Grafo(
+        competencias=competencias,
+        por_programa_codigo={k: tuple(sorted(v, key=lambda c: c["cod_competencia"])) for k, v in por_programa.items()},
+        por_programa_nombre={k: tuple(sorted(v, key=lambda c: _clave_nombre(c["nombre"]))) for k, v in por_programa.items()},
+        resultados={k: tuple(sorted(v, key=lambda r: _clave_nombre(r["nombre"]))) for k, v in resultados.items()},
+        programas_de_competencia={
+            k: tuple(sorted(v, key=lambda p: (p["cod_programa"], p["la_version"]))) for k, v in programas_de_competencia.items()
+        },
+        programas={k: tuple(sorted(v, key=lambda p: p["la_version"], reverse=True)) for k, v in programas.items()},
+    )
+
+
+class CatalogoCompetencias:
+    def __init__(self, ttl_seconds: int = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._grafo: Optional[_Grafo] = None
+        self._cargado_en: Optional[float] = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Carga y recarga
+    # ------------------------------------------------------------------
+    def invalidar(self) -> None:
+        """Marca el catálogo como vencido; se recarga en el próximo uso."""
+        with self._lock:
+            self._cargado_en = None
+
+    def _vigente(self) -> bool:
+        return self._cargado_en is not None and (time.monotonic() - self._cargado_en) < self.ttl_seconds
+
+    def _asegurar_cargado(self, db: Session) -> _Grafo:
+        if self._vigente():
+            return self._grafo
+        with self._lock:
+            if self._vigente():
+                return self._grafo
+            inicio = time.perf_counter()
+            self._grafo = _construir(crud_competencia.get_grafo_catalogo(db))
+            self._cargado_en = time.monotonic()
+            logger.info(
+                "Catálogo de competencias cargado",
+                extra={"competencias": len(self._grafo.competencias), "programas": len(self._grafo.por_programa_codigo),
+                       "duracion_ms": round((time.perf_counter() - inicio) * 1000, 2)},
+            )
+            return self._grafo
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def get_competencia(self, db: Session, cod_competencia: int) -> Optional[dict]:
+        return self._asegurar_cargado(db).competencias.get(cod_competencia)
+
+    def get_competencias_by_programa(self, db: Session, cod_programa: int, orden: str = "codigo") -> List[dict]:
+        """Competencias asociadas al programa (a todas sus versiones), por código o por nombre."""
+        grafo = self._asegurar_cargado(db)
+        indice = grafo.por_programa_nombre if orden == "nombre" else grafo.por_programa_codigo
+        return list(indice.get(cod_programa, ()))
+
+    def get_resultados_by_competencia(self, db: Session, cod_competencia: int) -> List[dict]:
+        return list(self._asegurar_cargado(db).resultados.get(cod_competencia, ()))
+
+    def get_programas_by_competencia(self, db: Session, cod_competencia: int) -> List[dict]:
+        """Todas las versiones de los programas que incluyen la competencia."""
+        return list(self._asegurar_cargado(db).programas_de_competencia.get(cod_competencia, ()))
+
+    def get_arbol_programa(self, db: Session, cod_programa: int) -> Optional[dict]:
+        """Programa con sus competencias y, dentro de cada una, sus resultados de aprendizaje."""
+        grafo = self._asegurar_cargado(db)
+        versiones = grafo.programas.get(cod_programa)
+        if not versiones:
+            return None
+        return {
+            "cod_programa": cod_programa,
+            "nombre_programa": versiones[0]["nombre_programa"],
+            "versiones": [v["la_version"] for v in versiones],
+            "competencias": [
+                {**c, "resultados": list(grafo.resultados.get(c["cod_competencia"], ()))}
+                for c in grafo.por_programa_codigo.get(cod_programa, ())
+            ],
+        }
+
+
+# Instancia global del catálogo
+catalogo = CatalogoCompetencias(ttl_seconds=settings.catalogo_ttl_seconds)
@@ -0,0 +1,158 @@
+"""
+Exportación columnar (Parquet) de grupo + datos_grupo para análisis.
+
+Las filas se leen con un cursor del lado del servidor y se escriben en el archivo
+por lotes: cada lote es un row group comprimido, así que la memoria usada depende
+del tamaño del lote (EXPORT_ROW_GROUP_SIZE) y no del número de grupos.
+
+Cada combinación de filtros se guarda en disco y se reutiliza mientras los datos no
+cambien: las cargas PE-04/DF-14 y la edición de grupos llaman a
+`invalidar_exportaciones`. Como la invalidación es por proceso, el archivo además
+vence a los EXPORT_CACHE_TTL_SECONDS.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date, time as dtime, timedelta
+from typing import Dict, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy.orm import Session
+
+from app.crud import grupos as crud_grupo
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_TEXTO = pa.string()
+_ENTERO = pa.int32()
+
+# Tipos de cada columna de COLUMNAS_EXPORTACION; el resto son enteros de datos_grupo
+_TIPOS = {
+    "cod_ficha": pa.int64(), "cod_programa": pa.int64(), "estado_grupo": _TEXTO, "nombre_nivel": _TEXTO,
+    "jornada": _TEXTO, "fecha_inicio": pa.date32(), "fecha_fin": pa.date32(), "etapa": _TEXTO,
+    "modalidad": _TEXTO, "responsable": _TEXTO, "nombre_empresa": _TEXTO, "nombre_municipio": _TEXTO,
+    "nombre_programa_especial": _TEXTO, "hora_inicio": pa.time32("s"), "hora_fin": pa.time32("s"),
+}
+
+ESQUEMA = pa.schema([(columna, _TIPOS.get(columna, _ENTERO)) for columna in crud_grupo.COLUMNAS_EXPORTACION])
+
+_lock = threading.Lock()
+_locks_clave: Dict[tuple, threading.Lock] = defaultdict(threading.Lock)
+_archivos: Dict[tuple, dict] = {}
+_version = 0
+
+
+def invalidar_exportaciones() -> None:
+    """Marca como vencidas las exportaciones guardadas (llamar después de escribir en grupo o datos_grupo)."""
+    global _version
+    with _lock:
+        _version += 1
+
+
+def _segundos(valor) -> Optional[int]:
+    # MySQL entrega las columnas TIME como timedelta
+    if valor is None:
+        return None
+    if isinstance(valor, timedelta):
+        return int(valor.total_seconds()) % 86400
+    if isinstance(valor, dtime):
+        return valor.hour * 3600 + valor.minute * 60 + valor.second
+    horas, minutos, segundos = (int(float(p)) for p in str(valor).split(":"))
+    return horas * 3600 + minutos * 60 + segundos
+
+
+def _fecha(valor) -> Optional[date]:
+    if valor is None or isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+def _columna_arrow(valores, tipo: pa.DataType) -> pa.Array:
+    if pa.types.is_time(tipo):
+        return pa.array([_segundos(v) for v in valores], pa.int32()).cast(tipo)
+    if pa.types.is_date(tipo):
+        return pa.array([_fecha(v) for v in valores], tipo)
+    return pa.array(valores, tipo)
+
+
+def _lote_arrow(filas) -> pa.RecordBatch:
+    columnas = list(zip(*filas))
+    return pa.RecordBatch.from_arrays(
+        [_columna_arrow(valores, campo.type) for valores, campo in zip(columnas, ESQUEMA)],
+        schema=ESQUEMA,
+    )
+
+
+def _escribir_parquet(db: Session, ruta: str, filtros: dict) -> int:
+    temporal = f"{ruta}.{threading.get_ident()}.tmp"
+    filas_escritas = 0
+    try:
+        with pq.ParquetWriter(temporal, ESQUEMA, compression=settings.EXPORT_PARQUET_COMPRESSION) as writer:
+            for filas in crud_grupo.iter_grupos_exportacion(db, lote=settings.EXPORT_ROW_GROUP_SIZE, **filtros):
+                writer.write_batch(_lote_arrow(filas))
+                filas_escritas += len(filas)
+        os.replace(temporal, ruta)
+    except Exception:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return filas_escritas
+
+
+def _descartar(entrada: Optional[dict]) -> None:
+    if entrada is not None and os.path.exists(entrada["ruta"]):
+        os.remove(entrada["ruta"])
+
+
+def exportar_grupos_parquet(db: Session, **filtros) -> str:
+    """
+    Devuelve la ruta de un archivo Parquet con los grupos que cumplen los filtros
+    (los mismos del dashboard; sin cod_centro exporta todos los centros).
+    Si ya existe uno vigente para esos filtros se reutiliza sin consultar la BD.
+    """
+    clave = tuple(sorted((k, v) for k, v in filtros.items() if v is not None))
+    # Una sola exportación a la vez por combinación de filtros; las demás esperan y reutilizan el archivo
+    with _locks_clave[clave]:
+        with _lock:
+            version = _version
+            entrada = _archivos.get(clave)
+        vigente = (
+            entrada is not None and entrada["version"] == version
+            and time.monotonic() - entrada["creado"] < settings.EXPORT_CACHE_TTL_SECONDS
+            and os.path.exists(entrada["ruta"])
+        )
+        if vigente:
+            return entrada["ruta"]
+
+        os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+        huella = hashlib.sha1(repr(clave).encode()).hexdigest()[:16]
+        ruta = os.path.join(settings.EXPORT_DIR, f"grupos_{huella}_{version}_{int(time.time())}.parquet")
+        inicio = time.perf_counter()
+        filas = _escribir_parquet(db, ruta, filtros)
+        logger.info(
+            "Exportación de grupos generada",
+            extra={"filtros": dict(clave), "filas": filas, "bytes": os.path.getsize(ruta),
+                   "duracion_ms": round((time.perf_counter() - inicio) * 1000, 2)},
+        )
+
+        nueva = {"ruta": ruta, "version": version, "creado": time.monotonic(), "anterior": None}
+        with _lock:
+            _archivos[clave] = nueva
+            # El archivo reemplazado se borra en la siguiente regeneración: una descarga
+            # que ya recibió su ruta todavía puede estar leyéndolo
+            if entrada is not None:
+                _descartar(entrada["anterior"])
+                nueva["anterior"] = {"ruta": entrada["ruta"]}
+            descartadas = []
+            if len(_archivos) > settings.EXPORT_MAX_ARCHIVOS:
+                mas_antigua = min((k for k in _archivos if k != clave), key=lambda k: _archivos[k]["creado"])
+                descartadas.append(_archivos.pop(mas_antigua))
+        for vieja in descartadas:
+            _descartar(vieja)
+            _descartar(vieja["anterior"])
+        return ruta
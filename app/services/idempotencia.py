@@ -0,0 +1,96 @@
+"""
+Claves de idempotencia para las cargas de archivos (`/files/*`).
+
+Cuando el proxy corta una carga grande por tiempo, el frontend la reintenta y el
+mismo archivo se procesaba dos veces a la vez contra MySQL. Si el cliente envía el
+encabezado `Idempotency-Key`, la carga se registra con esa clave:
+
+- Un reintento mientras la primera sigue en curso espera a esa misma ejecución en
+  lugar de lanzar otra.
+- Un reintento después de terminada recibe el resultado guardado (durante
+  IDEMPOTENCY_TTL_SECONDS).
+- La misma clave con un archivo distinto es un error del cliente (`ConflictoIdempotencia`).
+
+La ejecución corre como tarea propia del event loop, así que sigue aunque el cliente
+que la inició se desconecte. Si termina con una excepción la clave se libera y el
+siguiente reintento vuelve a procesar. El registro es por proceso: con varios workers
+la deduplicación solo aplica a los reintentos que llegan al mismo.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ConflictoIdempotencia(Exception):
+    """La clave ya se usó con otro contenido."""
+
+
+@dataclass
+class _Entrada:
+    huella: str
+    tarea: asyncio.Future
+    creada: float = field(default_factory=time.monotonic)
+    terminada: Optional[float] = None
+
+
+class RegistroIdempotencia:
+    def __init__(self, ttl_seconds: int = 86400, max_items: int = 500):
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._entradas: "OrderedDict[str, _Entrada]" = OrderedDict()
+
+    def _al_terminar(self, clave: str, entrada: _Entrada, tarea: asyncio.Future) -> None:
+        if tarea.cancelled() or tarea.exception() is not None:
+            # No se guarda un fallo: el reintento debe poder procesar de nuevo
+            if self._entradas.get(clave) is entrada:
+                del self._entradas[clave]
+            return
+        entrada.terminada = time.monotonic()
+
+    def _purgar(self) -> None:
+        ahora = time.monotonic()
+        for clave, entrada in list(self._entradas.items()):
+            if entrada.terminada is not None and ahora - entrada.terminada >= self.ttl_seconds:
+                del self._entradas[clave]
+        # Por encima del máximo se descartan primero los resultados más antiguos;
+        # las ejecuciones en curso nunca se descartan
+        sobrantes = len(self._entradas) - self.max_items
+        for clave, entrada in list(self._entradas.items()):
+            if sobrantes <= 0:
+                break
+            if entrada.terminada is not None:
+                del self._entradas[clave]
+                sobrantes -= 1
+
+    async def ejecutar(self, clave: str, huella: str, iniciar: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Devuelve (resultado, repetida). `iniciar` solo se llama si la clave no tiene una
+        ejecución en curso ni un resultado guardado; `huella` identifica el contenido.
+        """
+        self._purgar()
+        entrada = self._entradas.get(clave)
+        if entrada is not None:
+            if entrada.huella != huella:
+                raise ConflictoIdempotencia(f"La clave de idempotencia '{clave}' ya se usó con otro archivo")
+            logger.info("Petición repetida con clave de idempotencia", extra={"clave": clave, "en_curso": entrada.terminada is None})
+            return await asyncio.shield(entrada.tarea), True
+
+        entrada = _Entrada(huella=huella, tarea=asyncio.ensure_future(iniciar()))
+        self._entradas[clave] = entrada
+        entrada.tarea.add_done_callback(lambda tarea: self._al_terminar(clave, entrada, tarea))
+        # shield: si el cliente se desconecta se cancela la espera, no el procesamiento
+        return await asyncio.shield(entrada.tarea), False
+
+
+# Instancia global del registro
+registro = RegistroIdempotencia(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    max_items=settings.IDEMPOTENCY_MAX_ITEMS,
+)
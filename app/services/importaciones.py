@@ -0,0 +1,220 @@
+"""
+Turnos por centro para las cargas de archivos.
+
+Dos coordinadores que cargan a la vez el PE-04 del mismo centro ejecutan miles de
+`INSERT ... ON DUPLICATE KEY UPDATE` sobre las mismas filas de `grupo` y se bloquean
+entre sí (esperas de lock y deadlocks). Una carga reserva primero los centros que
+contiene y las demás cargas de esos centros esperan en cola, en orden de llegada.
+
+- Dentro del proceso cada centro tiene una cola; solo la primera carga de la cola
+  avanza. Los centros se reservan siempre en orden ascendente, así que dos cargas
+  con varios centros en común no pueden quedar esperándose mutuamente.
+- Con MySQL, además, se toma `GET_LOCK` por centro en una conexión dedicada, para
+  que la exclusión también aplique entre workers y réplicas de la API.
+- Si la carga no consigue su turno en IMPORT_LOCK_TIMEOUT_SECONDS se lanza
+  `ImportacionOcupada`.
+- La espera bloquea el hilo del threadpool que atiende la carga (el archivo se lee
+  ahí antes de saber qué centros contiene). Para no agotar el threadpool de la API,
+  a lo sumo IMPORT_MAX_WAITING cargas esperan a la vez, en la cola o en GET_LOCK;
+  la siguiente que tendría que esperar recibe `ImportacionOcupada` de inmediato.
+
+`estado()` muestra las cargas en curso y en espera (endpoint `/files/importaciones`).
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ImportacionOcupada(Exception):
+    """La carga no obtuvo su turno dentro del tiempo máximo de espera."""
+
+
+@dataclass(eq=False)
+class Importacion:
+    archivo: str
+    centros: Tuple[int, ...]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    recibida: datetime = field(default_factory=datetime.now)
+    iniciada: Optional[datetime] = None
+    esperando: bool = False
+
+    def resumen(self) -> dict:
+        return {
+            "id": self.id,
+            "archivo": self.archivo,
+            "centros": list(self.centros),
+            "recibida": self.recibida.isoformat(timespec="seconds"),
+            "iniciada": self.iniciada.isoformat(timespec="seconds") if self.iniciada else None,
+        }
+
+
+def _nombre_lock(cod_centro: int) -> str:
+    # GET_LOCK admite nombres de hasta 64 caracteres
+    return f"gestion_formacion:importacion:centro:{cod_centro}"
+
+
+class PlanificadorImportaciones:
+    def __init__(self, espera_maxima: float = 600, lock_distribuido: bool = True, max_en_espera: int = 8):
+        self.espera_maxima = espera_maxima
+        self.lock_distribuido = lock_distribuido
+        self.max_en_espera = max_en_espera
+        self._condicion = threading.Condition()
+        self._colas: Dict[int, Deque[Importacion]] = defaultdict(deque)
+        self._en_curso: Dict[int, Importacion] = {}
+        self._esperando = 0
+
+    # ------------------------------------------------------------------
+    # Cupo de cargas en espera
+    # ------------------------------------------------------------------
+    def _empezar_espera(self, importacion: Importacion) -> None:
+        with self._condicion:
+            if importacion.esperando:
+                return
+            if self._esperando >= self.max_en_espera:
+                raise ImportacionOcupada(
+                    f"Hay {self._esperando} cargas esperando turno (máximo {self.max_en_espera}); intente de nuevo en unos minutos"
+                )
+            importacion.esperando = True
+            self._esperando += 1
+
+    def _terminar_espera(self, importacion: Importacion) -> None:
+        with self._condicion:
+            if importacion.esperando:
+                importacion.esperando = False
+                self._esperando -= 1
+
+    # ------------------------------------------------------------------
+    # Turnos dentro del proceso
+    # ------------------------------------------------------------------
+    def _tomar_turno(self, importacion: Importacion, cod_centro: int, limite: float) -> None:
+        with self._condicion:
+            if cod_centro in self._en_curso or self._colas.get(cod_centro):
+                self._empezar_espera(importacion)
+            cola = self._colas[cod_centro]
+            cola.append(importacion)
+            while cod_centro in self._en_curso or cola[0] is not importacion:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    cola.remove(importacion)
+                    if not cola:
+                        del self._colas[cod_centro]
+                    # Si era la primera de la cola, la siguiente puede pasar a ocupar su lugar
+                    self._condicion.notify_all()
+                    raise ImportacionOcupada(
+                        f"El centro {cod_centro} tiene otra carga en curso; se esperó {self.espera_maxima:g} s sin obtener turno"
+                    )
+                self._condicion.wait(restante)
+            cola.popleft()
+            if not cola:
+                del self._colas[cod_centro]
+            self._en_curso[cod_centro] = importacion
+
+    def _liberar_turno(self, cod_centro: int) -> None:
+        with self._condicion:
+            self._en_curso.pop(cod_centro, None)
+            self._condicion.notify_all()
+
+    # ------------------------------------------------------------------
+    # GET_LOCK entre procesos (solo MySQL)
+    # ------------------------------------------------------------------
+    def _conexion_lock(self, db: Session):
+        bind = db.get_bind()
+        if not self.lock_distribuido or bind.dialect.name != "mysql":
+            return None
+        # Los locks de GET_LOCK son de la conexión, y la sesión devuelve la suya al pool
+        # en cada commit: se usa una conexión aparte durante toda la carga
+        return bind.connect()
+
+    def _tomar_lock(self, conexion, importacion: Importacion, cod_centro: int, limite: float) -> None:
+        consulta = text("SELECT GET_LOCK(:nombre, :espera)")
+        obtenido = conexion.execute(consulta, {"nombre": _nombre_lock(cod_centro), "espera": 0}).scalar()
+        if obtenido != 1:
+            # Otra instancia tiene el centro: esperar también ocupa cupo de espera
+            self._empezar_espera(importacion)
+            espera = max(0, int(limite - time.monotonic()))
+            obtenido = conexion.execute(consulta, {"nombre": _nombre_lock(cod_centro), "espera": espera}).scalar()
+        if obtenido != 1:
+            raise ImportacionOcupada(f"El centro {cod_centro} tiene una carga en curso en otra instancia de la API")
+
+    def _liberar_locks(self, conexion, centros: Iterable[int]) -> None:
+        try:
+            for cod_centro in centros:
+                conexion.execute(text("SELECT RELEASE_LOCK(:nombre)"), {"nombre": _nombre_lock(cod_centro)})
+            conexion.close()
+        except Exception as e:
+            # Una conexión que pudo quedar con locks tomados no debe volver al pool
+            logger.error(f"Error liberando locks de importación: {e}")
+            conexion.invalidate()
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+    @contextmanager
+    def reservar(self, db: Session, archivo: str, centros: Iterable[int]) -> Iterator[Importacion]:
+        """
+        Espera el turno de todos los `centros` y los mantiene reservados mientras dura
+        el bloque `with`. Lanza `ImportacionOcupada` si la espera supera el máximo.
+        """
+        importacion = Importacion(archivo=archivo, centros=tuple(sorted({int(c) for c in centros})))
+        limite = time.monotonic() + self.espera_maxima
+        tomados: List[int] = []
+        bloqueados: List[int] = []
+        conexion = None
+        try:
+            for cod_centro in importacion.centros:
+                self._tomar_turno(importacion, cod_centro, limite)
+                tomados.append(cod_centro)
+            conexion = self._conexion_lock(db)
+            if conexion is not None:
+                for cod_centro in importacion.centros:
+                    self._tomar_lock(conexion, importacion, cod_centro, limite)
+                    bloqueados.append(cod_centro)
+            self._terminar_espera(importacion)
+            importacion.iniciada = datetime.now()
+            logger.info(
+                "Importación iniciada",
+                extra={"importacion": importacion.id, "archivo": archivo, "centros": list(importacion.centros),
+                       "espera_s": round((importacion.iniciada - importacion.recibida).total_seconds(), 2)},
+            )
+            yield importacion
+        finally:
+            self._terminar_espera(importacion)
+            if conexion is not None:
+                self._liberar_locks(conexion, bloqueados)
+            for cod_centro in tomados:
+                self._liberar_turno(cod_centro)
+
+    def estado(self) -> dict:
+        """Cargas en curso y en espera, con la posición de cada una en la cola de cada centro."""
+        with self._condicion:
+            en_curso = {id(i): i for i in self._en_curso.values()}
+            en_espera: Dict[int, dict] = {}
+            for cod_centro, cola in self._colas.items():
+                for posicion, importacion in enumerate(cola, start=1):
+                    item = en_espera.setdefault(id(importacion), {**importacion.resumen(), "posiciones": {}})
+                    item["posiciones"][cod_centro] = posicion
+        return {
+            "en_curso": [i.resumen() for i in en_curso.values()],
+            "en_espera": sorted(en_espera.values(), key=lambda i: i["recibida"]),
+        }
+
+
+# Instancia global del planificador
+planificador = PlanificadorImportaciones(
+    espera_maxima=settings.IMPORT_LOCK_TIMEOUT_SECONDS,
+    lock_distribuido=settings.IMPORT_DISTRIBUTED_LOCK,
+    max_en_espera=settings.IMPORT_MAX_WAITING,
+)
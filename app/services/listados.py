@@ -0,0 +1,62 @@
+"""
+Modo de transmisión para los listados grandes (catálogos, usuarios, programaciones).
+
+En lugar de `.mappings().all()` y una lista completa que FastAPI vuelve a validar y
+serializar, las filas llegan por lotes desde un cursor del lado del servidor y cada
+lote se valida con el mismo esquema de respuesta y se envía de inmediato:
+
+- `ndjson`: un objeto JSON por línea (application/x-ndjson).
+- `json`: el mismo arreglo JSON que la respuesta normal, enviado por partes.
+
+La memoria del worker queda limitada al tamaño del lote (LOTE filas).
+"""
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, Type
+
+from pydantic import BaseModel, TypeAdapter
+
+from app.utils.helpers import adelantar_primero
+from core.database import iter_con_sesion
+
+LOTE = 1000
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+@lru_cache(maxsize=None)
+def _adapter(modelo: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(modelo)
+
+
+def _ndjson(adapter: TypeAdapter, lotes: Iterable[list]) -> Iterator[bytes]:
+    for filas in lotes:
+        yield b"".join(adapter.dump_json(adapter.validate_python(dict(fila))) + b"\n" for fila in filas)
+
+
+def _json_array(adapter: TypeAdapter, lotes: Iterable[list]) -> Iterator[bytes]:
+    yield b"["
+    separador = b""
+    for filas in lotes:
+        if filas:
+            yield separador + b",".join(adapter.dump_json(adapter.validate_python(dict(fila))) for fila in filas)
+            separador = b","
+    yield b"]"
+
+
+def generar_listado(formato: str, modelo: Type[BaseModel], consulta: Callable[..., Iterable[list]], session_factory=None, **params) -> Iterator[bytes]:
+    """
+    Devuelve el generador con el cuerpo de la respuesta para una `StreamingResponse`.
+
+    `consulta(db, lote=..., **params)` entrega las filas por lotes (por ejemplo
+    `crud_users.iter_instructores`); se ejecuta con una sesión propia de
+    `session_factory` (por defecto la de lectura). El primer lote se lee aquí para que
+    un error de base de datos llegue como error HTTP y no como una respuesta cortada.
+    """
+    adapter = _adapter(modelo)
+    lotes = adelantar_primero(iter_con_sesion(consulta, session_factory, lote=LOTE, **params))
+    if formato == "ndjson":
+        return _ndjson(adapter, lotes)
+    return _json_array(adapter, lotes)
@@ -0,0 +1,92 @@
+"""
+Reportes descargables (CSV y XLSX) generados por lotes.
+
+Las filas llegan de un cursor del lado del servidor en lotes de `LOTE` filas y se
+escriben a medida que llegan, así que la memoria no depende del tamaño del reporte:
+
+- CSV: cada lote se convierte en un bloque de bytes que se envía de inmediato.
+- XLSX: openpyxl en modo write-only escribe las filas en un archivo temporal (un
+  .xlsx es un ZIP y no se puede enviar antes de cerrarlo); al terminar se envía el
+  archivo por bloques y se borra.
+
+Los generadores abren su propia sesión de lectura porque la respuesta se transmite
+después de que terminan las dependencias de FastAPI (y con ellas la sesión de `get_read_db`).
+"""
+import csv
+import io
+import logging
+import os
+import tempfile
+from datetime import date, datetime, time
+from typing import Callable, Iterable, Iterator, List, Sequence
+
+from openpyxl import Workbook
+
+from app.utils.helpers import adelantar_primero, hora_desde_timedelta
+from core.database import iter_con_sesion
+
+logger = logging.getLogger(__name__)
+
+LOTE = 5000
+_BLOQUE_ARCHIVO = 256 * 1024
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _texto(valor) -> str:
+    valor = hora_desde_timedelta(valor)
+    if valor is None:
+        return ""
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    return valor
+
+
+def _csv(columnas: List[str], lotes: Iterable[Sequence]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel abra el archivo como UTF-8 (tildes y eñes)
+    buffer.write("\ufeff")
+    writer.writerow(columnas)
+    for filas in lotes:
+        writer.writerows([_texto(v) for v in fila] for fila in filas)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _xlsx(columnas: List[str], lotes: Iterable[Sequence], titulo: str) -> Iterator[bytes]:
+    descriptor, ruta = tempfile.mkstemp(suffix=".xlsx")
+    os.close(descriptor)
+    try:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(titulo[:31])
+        ws.append(columnas)
+        for filas in lotes:
+            for fila in filas:
+                ws.append([hora_desde_timedelta(v) for v in fila])
+        wb.save(ruta)
+        with open(ruta, "rb") as f:
+            while bloque := f.read(_BLOQUE_ARCHIVO):
+                yield bloque
+    finally:
+        os.remove(ruta)
+
+
+def generar_reporte(formato: str, columnas: List[str], consulta: Callable, titulo: str, **filtros) -> Iterator[bytes]:
+    """
+    Devuelve el generador con el contenido del reporte para una `StreamingResponse`.
+
+    `consulta(db, lote=..., **filtros)` debe entregar las filas en lotes (por ejemplo
+    `iter_grupos_exportacion`). El primer lote se lee aquí, antes de responder, para
+    que un error de base de datos llegue como error HTTP y no como un archivo cortado.
+    """
+    lotes = adelantar_primero(iter_con_sesion(consulta, lote=LOTE, **filtros))
+    if formato == "xlsx":
+        return _xlsx(columnas, lotes, titulo)
+    return _csv(columnas, lotes)
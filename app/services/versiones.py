@@ -0,0 +1,58 @@
+"""
+Versiones por tabla para el caché HTTP (ETag / Last-Modified) de los catálogos.
+
+Programas, competencias, resultados de aprendizaje, festivos y centros solo cambian
+con las cargas de archivos y algunas escrituras de administración. Cada tabla tiene
+un contador que esas escrituras incrementan con `invalidar_tablas`; el ETag de un
+endpoint se arma con los contadores de las tablas que lee, así que se puede
+responder 304 sin consultar la base de datos.
+
+Los contadores son por proceso. Para que un worker que no vio una escritura hecha en
+otro no valide para siempre una copia vieja, el ETag incluye un identificador del
+proceso y una ventana de HTTP_CACHE_TTL_SECONDS: como máximo al cambiar de ventana
+el cliente vuelve a descargar el catálogo.
+"""
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Tuple
+
+from core.config import settings
+
+TABLAS = (
+    "programa_formacion",
+    "competencia",
+    "resultado_aprendizaje",
+    "programa_competencia",
+    "festivos",
+    "centro_formacion",
+)
+
+_PROCESO = uuid.uuid4().hex[:8]
+_lock = threading.Lock()
+_versiones: Dict[str, int] = dict.fromkeys(TABLAS, 0)
+_modificadas: Dict[str, float] = dict.fromkeys(TABLAS, time.time())
+
+
+def invalidar_tablas(*tablas: str) -> None:
+    """Incrementa la versión de las tablas (llamar después de escribir en ellas)."""
+    ahora = time.time()
+    with _lock:
+        for tabla in tablas:
+            _versiones[tabla] += 1
+            _modificadas[tabla] = ahora
+
+
+def validadores(tablas: Iterable[str]) -> Tuple[str, float]:
+    """
+    (ETag, Last-Modified como timestamp) para una respuesta que lee `tablas`.
+    Se calcula antes de consultar: si una escritura ocurre entre medio, el cliente
+    recibe datos nuevos con el ETag anterior y solo se pierde un 304.
+    """
+    ttl = max(settings.HTTP_CACHE_TTL_SECONDS, 1)
+    ventana = int(time.time() // ttl)
+    with _lock:
+        versiones = ".".join(str(_versiones[tabla]) for tabla in tablas)
+        modificada = max(_modificadas[tabla] for tabla in tablas)
+    etag = f'W/"{_PROCESO}-{ventana}-{versiones}"'
+    return etag, max(modificada, ventana * ttl)
@@ -0,0 +1,69 @@
+import itertools
+import threading
+import time
+from datetime import time as dtime, timedelta
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Caché en memoria con vencimiento por tiempo, segura entre hilos.
+    Pensada para métricas costosas del dashboard que se invalidan al escribir.
+    """
+
+    def __init__(self, ttl_seconds: int = 300, max_items: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._items: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expira, valor = item
+            if time.monotonic() >= expira:
+                del self._items[key]
+                return None
+            return valor
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if len(self._items) >= self.max_items and key not in self._items:
+                # Descarta la entrada que vence primero
+                mas_antigua = min(self._items, key=lambda k: self._items[k][0])
+                del self._items[mas_antigua]
+            self._items[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+def hora_desde_timedelta(valor):
+    """
+    MySQL entrega las columnas TIME como timedelta; las convierte a `datetime.time`
+    (00:00:00 a 23:59:59). Cualquier otro valor se devuelve sin cambios.
+    """
+    if isinstance(valor, timedelta):
+        horas, resto = divmod(int(valor.total_seconds()), 3600)
+        minutos, segundos = divmod(resto, 60)
+        return dtime(horas % 24, minutos, segundos)
+    return valor
+
+
+def adelantar_primero(iterador: Iterator) -> Iterator:
+    """
+    Obtiene de inmediato el primer elemento de `iterador` y devuelve un iterador
+    equivalente. Sirve para que un error al empezar una respuesta transmitida (la
+    consulta, por ejemplo) ocurra antes de enviar los encabezados.
+    """
+    iterador = iter(iterador)
+    for primero in iterador:
+        return itertools.chain([primero], iterador)
+    return iter(())
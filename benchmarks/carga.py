@@ -0,0 +1,199 @@
+"""
+Generador de carga HTTP (httpx + asyncio) que reporta latencias p50/p95/p99.
+
+Dos modos:
+
+1. Contra un servidor ya levantado (cualquier endpoint, con token JWT):
+    python -m benchmarks.carga --base-url http://localhost:8000 --token <JWT> \\
+        --ruta "/grupos/kpis?cod_centro=9501" --ruta "/notificaciones/unread-count" \\
+        --concurrencia 500 --peticiones 5000
+
+2. Comparación síncrono vs. asíncrono de la misma consulta (KPIs del dashboard):
+    python -m benchmarks.carga --comparar --cod-centro 9501 --concurrencia 500 --peticiones 5000
+
+   Levanta un uvicorn local con dos rutas sin autenticación que ejecutan la misma
+   consulta: /sync/kpis (get_db, threadpool de 40 hilos y pool de 10+20 conexiones)
+   y /async/kpis (get_async_db, event loop). Usa DATABASE_URL y ASYNC_DATABASE_URL
+   de la configuración, así que necesita la base de datos real.
+
+   Con `--sqlite FILAS` usa en cambio una base SQLite temporal (aiosqlite para la
+   ruta asíncrona) con FILAS grupos sintéticos del centro. Sirve como prueba de humo
+   sin MySQL; sus latencias no representan las de producción.
+"""
+import argparse
+import asyncio
+import socket
+import os
+import statistics
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+import httpx
+
+
+async def _ejecutar(client: httpx.AsyncClient, ruta: str, concurrencia: int, peticiones: int) -> dict:
+    latencias: List[float] = []
+    errores = 0
+    pendientes = iter(range(peticiones))
+
+    async def trabajador():
+        nonlocal errores
+        for _ in pendientes:
+            inicio = time.perf_counter()
+            try:
+                response = await client.get(ruta)
+                if response.status_code >= 400:
+                    errores += 1
+            except httpx.HTTPError:
+                errores += 1
+                continue
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+    return _resumen(ruta, latencias, errores, duracion)
+
+
+def _resumen(ruta: str, latencias: List[float], errores: int, duracion: float) -> dict:
+    resumen = {"ruta": ruta, "peticiones": len(latencias) + errores, "errores": errores,
+               "duracion_s": round(duracion, 2), "rps": round(len(latencias) / duracion, 1) if duracion else 0.0}
+    if len(latencias) >= 2:
+        cuantiles = statistics.quantiles(latencias, n=100)
+        resumen.update({
+            "p50_ms": round(cuantiles[49] * 1000, 1),
+            "p95_ms": round(cuantiles[94] * 1000, 1),
+            "p99_ms": round(cuantiles[98] * 1000, 1),
+        })
+    return resumen
+
+
+def _imprimir(resultados: List[dict]) -> None:
+    print(f"{'ruta':<45} {'ok':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for r in resultados:
+        print(f"{r['ruta'][:45]:<45} {r['peticiones'] - r['errores']:>7} {r['errores']:>5} {r['rps']:>8} "
+              f"{r.get('p50_ms', '-'):>8} {r.get('p95_ms', '-'):>8} {r.get('p99_ms', '-'):>8}")
+
+
+def _crear_base_sqlite(directorio: str, cod_centro: int, filas: int) -> str:
+    from sqlalchemy import create_engine, text
+
+    from benchmarks.importacion import DDL_SQLITE
+
+    ruta = os.path.join(directorio, "carga.db")
+    engine = create_engine(f"sqlite:///{ruta}")
+    with engine.begin() as conn:
+        for sentencia in DDL_SQLITE.split(";"):
+            if sentencia.strip():
+                conn.exec_driver_sql(sentencia)
+        conn.execute(
+            text("INSERT INTO grupo (cod_ficha, cod_centro, estado_grupo) VALUES (:cod_ficha, :cod_centro, 'En ejecucion')"),
+            [{"cod_ficha": i, "cod_centro": cod_centro} for i in range(1, filas + 1)],
+        )
+        conn.execute(
+            text("INSERT INTO datos_grupo (cod_ficha, formacion) VALUES (:cod_ficha, :formacion)"),
+            [{"cod_ficha": i, "formacion": i % 30} for i in range(1, filas + 1)],
+        )
+    engine.dispose()
+    return ruta
+
+
+def _crear_app_comparacion(cod_centro: int, sqlite: Optional[str] = None):
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import Session, sessionmaker
+
+    from app.crud import grupos as crud_grupo
+    from core.database import _pool_options, get_async_db, get_db
+
+    app = FastAPI()
+
+    if sqlite:
+        # Mismos tamaños de pool que la configuración, sobre la base SQLite temporal
+        opciones = {k: v for k, v in _pool_options.items() if k != "pool_recycle"}
+        SessionSqlite = sessionmaker(bind=create_engine(f"sqlite:///{sqlite}", **opciones))
+        AsyncSessionSqlite = async_sessionmaker(bind=create_async_engine(f"sqlite+aiosqlite:///{sqlite}", **opciones))
+
+        def get_db_sqlite():
+            db = SessionSqlite()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        async def get_async_db_sqlite():
+            async with AsyncSessionSqlite() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = get_db_sqlite
+        app.dependency_overrides[get_async_db] = get_async_db_sqlite
+
+    @app.get("/sync/kpis")
+    def kpis_sync(db: Session = Depends(get_db)):
+        return crud_grupo.get_dashboard_kpis(db, cod_centro=cod_centro)
+
+    @app.get("/async/kpis")
+    async def kpis_async(db: AsyncSession = Depends(get_async_db)):
+        return await crud_grupo.get_dashboard_kpis_async(db, cod_centro=cod_centro)
+
+    return app
+
+
+def _iniciar_servidor(app) -> str:
+    import uvicorn
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           backlog=4096, limit_concurrency=None))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def main(args) -> None:
+    if args.comparar:
+        sqlite = _crear_base_sqlite(tempfile.mkdtemp(), args.cod_centro, args.sqlite) if args.sqlite else None
+        base_url = _iniciar_servidor(_crear_app_comparacion(args.cod_centro, sqlite))
+        rutas = ["/sync/kpis", "/async/kpis"]
+    else:
+        base_url = args.base_url
+        rutas = args.ruta
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    limits = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=timeout) as client:
+        resultados = []
+        for ruta in rutas:
+            # Calentamiento: abre conexiones y llena los pools antes de medir
+            await _ejecutar(client, ruta, min(args.concurrencia, 50), min(args.peticiones, 200))
+            resultados.append(await _ejecutar(client, ruta, args.concurrencia, args.peticiones))
+    _imprimir(resultados)
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", default=None, help="JWT para el encabezado Authorization")
+    parser.add_argument("--ruta", action="append", default=[], help="Ruta a medir (se puede repetir)")
+    parser.add_argument("--comparar", action="store_true", help="Compara /sync/kpis contra /async/kpis en un servidor local")
+    parser.add_argument("--cod-centro", type=int, default=0, help="Centro usado en el modo --comparar")
+    parser.add_argument("--sqlite", type=int, default=0, metavar="FILAS",
+                        help="En --comparar, usar una base SQLite temporal con FILAS grupos en lugar de MySQL")
+    parser.add_argument("--concurrencia", type=int, default=500)
+    parser.add_argument("--peticiones", type=int, default=5000)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args(argv)
+    if not args.comparar and not args.ruta:
+        parser.error("Indique al menos una --ruta o use --comparar")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(_parse_args()))
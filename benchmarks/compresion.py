@@ -0,0 +1,180 @@
+"""
+Benchmark de la compresión de respuestas en un enlace lento simulado.
+
+Levanta los routers de grupos y programación sobre la base SQLite sembrada de
+`benchmarks.escenarios`, con `CompresionMiddleware`, y un proxy TCP local que limita
+el ancho de banda y agrega latencia de ida y vuelta. Para cada ruta pide la misma
+respuesta sin comprimir, con gzip y con brotli, y reporta:
+
+- bytes que cruzaron el enlace (encabezados + cuerpo, contados en el proxy)
+- tamaño del JSON sin comprimir y razón de compresión
+- latencia p50/p95 de la petición completa, vista por el cliente
+
+    python -m benchmarks.compresion
+    python -m benchmarks.compresion --ancho-banda-kbps 1000 --latencia-ms 150 --peticiones 20
+    python -m benchmarks.compresion --umbral 512 --nivel-gzip 9 --calidad-brotli 6 --json compresion.json
+
+Necesita `httpx`, `aiosqlite` y `brotli` (httpx lo usa para decodificar br).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.carga import _iniciar_servidor
+
+CODIFICACIONES = ("identity", "gzip", "br")
+
+
+class EnlaceLento:
+    """
+    Proxy TCP hacia `destino` que simula un enlace lento: cada bloque que pasa espera
+    la mitad de la latencia de ida y vuelta más el tiempo de transmitirlo al ancho de
+    banda configurado (compartido por dirección). Cuenta los bytes de bajada.
+    """
+
+    def __init__(self, destino_host: str, destino_puerto: int, ancho_banda_kbps: int, latencia_ms: float):
+        self.destino = (destino_host, destino_puerto)
+        self.bytes_por_segundo = ancho_banda_kbps * 1000 / 8
+        self.retardo = latencia_ms / 2000
+        self.bytes_bajada = 0
+        self._libre = {"subida": 0.0, "bajada": 0.0}
+
+    async def _transmitir(self, direccion: str, lector, escritor) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while datos := await lector.read(16384):
+                # El enlace se ocupa por turnos: un bloque empieza cuando terminó el anterior
+                inicio = max(loop.time(), self._libre[direccion])
+                self._libre[direccion] = inicio + len(datos) / self.bytes_por_segundo
+                await asyncio.sleep(self._libre[direccion] - loop.time() + self.retardo)
+                if direccion == "bajada":
+                    self.bytes_bajada += len(datos)
+                escritor.write(datos)
+                await escritor.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _atender(self, lector_cliente, escritor_cliente) -> None:
+        lector_servidor, escritor_servidor = await asyncio.open_connection(*self.destino)
+        try:
+            await asyncio.gather(
+                self._transmitir("subida", lector_cliente, escritor_servidor),
+                self._transmitir("bajada", lector_servidor, escritor_cliente),
+            )
+        except asyncio.CancelledError:
+            # Al terminar el benchmark se cancelan las conexiones que siguen abiertas
+            escritor_servidor.close()
+            escritor_cliente.close()
+
+    async def iniciar(self) -> str:
+        self._servidor = await asyncio.start_server(self._atender, "127.0.0.1", 0)
+        puerto = self._servidor.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{puerto}"
+
+    async def cerrar(self) -> None:
+        self._servidor.close()
+        await self._servidor.wait_closed()
+
+
+def _crear_app(fichas: int, instructores: int, semilla: int, umbral: int, nivel_gzip: int, calidad_brotli: int):
+    from benchmarks.escenarios import _crear_app_local
+    from core.compresion import CompresionMiddleware
+
+    app, contexto = _crear_app_local(tempfile.mkdtemp(prefix="compresion_"), fichas, instructores, semilla)
+    app.add_middleware(CompresionMiddleware, minimum_size=umbral, gzip_level=nivel_gzip, brotli_quality=calidad_brotli)
+    return app, contexto
+
+
+def _rutas(contexto) -> List[str]:
+    return [
+        "/programacion/all?limit=1000",
+        "/grupos/?limit=100",
+        f"/grupos/centro/{contexto.cod_centro}?limit=20",
+        "/grupos/search?search=28&limit=100",
+        f"/grupos/distribucion/por-municipio?cod_centro={contexto.cod_centro}",
+        f"/grupos/kpis?cod_centro={contexto.cod_centro}",
+    ]
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def _medir(client: httpx.AsyncClient, enlace: EnlaceLento, ruta: str, codificacion: str, peticiones: int) -> dict:
+    encabezados = {"Accept-Encoding": codificacion}
+    respuesta = await client.get(ruta, headers=encabezados)  # calentamiento
+    respuesta.raise_for_status()
+    latencias, bytes_enlace = [], []
+    for _ in range(peticiones):
+        antes = enlace.bytes_bajada
+        inicio = time.perf_counter()
+        respuesta = await client.get(ruta, headers=encabezados)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        bytes_enlace.append(enlace.bytes_bajada - antes)
+    return {
+        "ruta": ruta,
+        "codificacion": respuesta.headers.get("content-encoding", "identity"),
+        "solicitada": codificacion,
+        "bytes_json": len(respuesta.content),
+        "bytes_enlace": int(statistics.median(bytes_enlace)),
+        "p50_ms": round(_percentil(latencias, 50), 1),
+        "p95_ms": round(_percentil(latencias, 95), 1),
+    }
+
+
+def _imprimir(resultados: List[dict]) -> None:
+    print(f"{'ruta':<48}{'pedida':>9}{'usada':>9}{'json':>10}{'enlace':>10}{'razón':>7}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in resultados:
+        razon = r["bytes_json"] / max(r["bytes_enlace"], 1)
+        print(f"{r['ruta'][:47]:<48}{r['solicitada']:>9}{r['codificacion']:>9}{r['bytes_json']:>10}"
+              f"{r['bytes_enlace']:>10}{razon:>7.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}")
+
+
+async def main(args) -> None:
+    app, contexto = _crear_app(args.fichas, args.instructores, args.semilla, args.umbral, args.nivel_gzip, args.calidad_brotli)
+    servidor = _iniciar_servidor(app)
+    host, puerto = servidor.removeprefix("http://").split(":")
+    enlace = EnlaceLento(host, int(puerto), args.ancho_banda_kbps, args.latencia_ms)
+    base_url = await enlace.iniciar()
+    print(f"Enlace simulado: {args.ancho_banda_kbps} kbit/s, {args.latencia_ms} ms de ida y vuelta\n")
+
+    resultados = []
+    headers = {"Authorization": f"Bearer {contexto.token_coordinador}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=120) as client:
+        for ruta in _rutas(contexto):
+            for codificacion in CODIFICACIONES:
+                resultados.append(await _medir(client, enlace, ruta, codificacion, args.peticiones))
+    await enlace.cerrar()
+    _imprimir(resultados)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2)
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ancho-banda-kbps", type=int, default=2000, help="Ancho de banda del enlace (kbit/s)")
+    parser.add_argument("--latencia-ms", type=float, default=80, help="Latencia de ida y vuelta (ms)")
+    parser.add_argument("--peticiones", type=int, default=10, help="Peticiones medidas por ruta y codificación")
+    parser.add_argument("--umbral", type=int, default=1024, help="COMPRESSION_MIN_SIZE del middleware")
+    parser.add_argument("--nivel-gzip", type=int, default=6)
+    parser.add_argument("--calidad-brotli", type=int, default=4)
+    parser.add_argument("--fichas", type=int, default=300)
+    parser.add_argument("--instructores", type=int, default=30)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(_parse_args()))
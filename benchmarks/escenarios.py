@@ -0,0 +1,522 @@
+"""
+Prueba de carga de las APIs de lectura con perfiles de tráfico que imitan el uso real.
+
+Cada usuario virtual elige un escenario según los pesos del perfil, lo ejecuta y
+espera un tiempo de reflexión (exponencial, con la media del perfil) antes del siguiente:
+
+- dashboard:      el coordinador abre el tablero: /grupos/kpis y las 5 distribuciones a la vez
+- autocompletar:  tecleo en el buscador de fichas, una petición a /grupos/search por tecla
+- calendario:     un instructor abre su calendario y el de una o dos de sus fichas
+- notificaciones: sondeo del contador de la campana y, a veces, de la lista sin leer
+
+Sin --base-url crea una base SQLite temporal con datos sembrados (mismo resultado con
+la misma --semilla) y levanta un uvicorn local con los routers de grupos, programación
+y notificaciones, así que corre sin red ni MySQL. Con --base-url mide un servidor ya
+levantado con los tokens y datos que se indiquen.
+
+    python -m benchmarks.escenarios --usuarios 100 --duracion 60 --json v1.4.json
+    python -m benchmarks.escenarios --usuarios 100 --duracion 60 --comparar-con v1.4.json
+    python -m benchmarks.escenarios --perfil perfil.json --factor-pausa 0
+
+    python -m benchmarks.escenarios --base-url http://localhost:8000 --cod-centro 9501 \\
+        --token-coordinador <JWT> --instructor 15:<JWT> --instructor 22:<JWT> --termino "software"
+
+El perfil (--perfil) es un JSON con los escenarios que se quieren cambiar, por ejemplo
+{"notificaciones": {"peso": 70, "pausa_s": 30}}. El reporte (--json) guarda las
+latencias p50/p95/p99 y el throughput por ruta y por escenario junto con la etiqueta
+de la versión, para compararlo con --comparar-con en la siguiente versión.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.carga import _iniciar_servidor, _imprimir, _resumen
+
+PERFIL_BASE = {
+    "dashboard": {"peso": 15, "pausa_s": 5.0},
+    "autocompletar": {"peso": 20, "pausa_s": 3.0, "tecla_s": 0.15},
+    "calendario": {"peso": 15, "pausa_s": 4.0},
+    "notificaciones": {"peso": 50, "pausa_s": 10.0},
+}
+
+DISTRIBUCIONES = ["por-municipio", "por-jornada", "por-modalidad", "por-etapa", "por-nivel"]
+
+# Tablas que leen los escenarios, en la sintaxis común a SQLite, con los índices de producción
+DDL_SQLITE = """
+CREATE TABLE rol (id_rol INTEGER PRIMARY KEY, nombre TEXT);
+CREATE TABLE centro_formacion (cod_centro INTEGER PRIMARY KEY, nombre_centro TEXT, cod_regional INTEGER);
+CREATE TABLE usuario (
+    id_usuario INTEGER PRIMARY KEY, nombre_completo TEXT, identificacion TEXT, id_rol INTEGER, correo TEXT,
+    pass_hash TEXT, tipo_contrato TEXT, telefono TEXT, estado BOOLEAN, cod_centro INTEGER,
+    password_changed_at TIMESTAMP
+);
+CREATE TABLE programa_formacion (
+    cod_programa INTEGER, la_version INTEGER, nombre TEXT, horas_lectivas INTEGER, horas_productivas INTEGER,
+    PRIMARY KEY (cod_programa, la_version)
+);
+CREATE TABLE ambiente_formacion (
+    id_ambiente INTEGER PRIMARY KEY, nombre_ambiente TEXT, num_max_aprendices INTEGER, municipio TEXT,
+    ubicacion TEXT, cod_centro INTEGER, estado BOOLEAN
+);
+CREATE TABLE grupo (
+    cod_ficha INTEGER PRIMARY KEY, cod_centro INTEGER, cod_programa INTEGER, la_version INTEGER,
+    estado_grupo TEXT, nombre_nivel TEXT, jornada TEXT, fecha_inicio DATE, fecha_fin DATE, etapa TEXT,
+    modalidad TEXT, responsable TEXT, nombre_empresa TEXT, nombre_municipio TEXT,
+    nombre_programa_especial TEXT, hora_inicio TEXT, hora_fin TEXT, id_ambiente INTEGER
+);
+CREATE INDEX idx_grupo_centro ON grupo (cod_centro);
+CREATE TABLE datos_grupo (cod_ficha INTEGER PRIMARY KEY, num_total_aprendices INTEGER, formacion INTEGER);
+CREATE TABLE competencia (cod_competencia INTEGER PRIMARY KEY, nombre TEXT, horas INTEGER);
+CREATE TABLE resultado_aprendizaje (cod_resultado INTEGER PRIMARY KEY, nombre TEXT, cod_competencia INTEGER);
+CREATE TABLE programacion (
+    id_programacion INTEGER PRIMARY KEY AUTOINCREMENT, id_instructor INTEGER, cod_ficha INTEGER,
+    fecha_programada DATE, horas_programadas INTEGER, hora_inicio TEXT, hora_fin TEXT,
+    cod_competencia INTEGER, cod_resultado INTEGER, id_user INTEGER
+);
+CREATE INDEX idx_programacion_instructor ON programacion (id_instructor, fecha_programada);
+CREATE INDEX idx_programacion_ficha ON programacion (cod_ficha, fecha_programada);
+CREATE TABLE notificacion (
+    id_notificacion INTEGER PRIMARY KEY AUTOINCREMENT, id_usuario INTEGER, mensaje TEXT,
+    leida BOOLEAN, fecha_creacion TIMESTAMP
+);
+CREATE INDEX idx_notificacion_usuario_fecha ON notificacion (id_usuario, fecha_creacion);
+CREATE INDEX idx_notificacion_usuario_leida ON notificacion (id_usuario, leida)
+"""
+
+_PROGRAMAS = [
+    "ANALISIS Y DESARROLLO DE SOFTWARE", "GESTION CONTABLE Y DE INFORMACION FINANCIERA",
+    "GESTION ADMINISTRATIVA", "ELECTRICIDAD INDUSTRIAL", "MANTENIMIENTO DE EQUIPOS DE COMPUTO",
+    "COCINA", "ASISTENCIA ADMINISTRATIVA", "PROGRAMACION DE SOFTWARE", "GESTION DE REDES DE DATOS",
+    "SALUD OCUPACIONAL", "PRODUCCION AGROPECUARIA", "DISEÑO GRAFICO", "LOGISTICA EMPRESARIAL",
+    "ENFERMERIA", "MECANICA AUTOMOTRIZ", "GESTION DEL TALENTO HUMANO",
+]
+_NOMBRES = ["ANA", "CARLOS", "DIANA", "JORGE", "LUISA", "MARIO", "PAOLA", "ANDRES", "SOFIA", "JULIAN"]
+_APELLIDOS = ["GOMEZ", "RODRIGUEZ", "MARTINEZ", "LOPEZ", "GARCIA", "PEREZ", "SANCHEZ", "RAMIREZ", "TORRES", "DIAZ"]
+_MUNICIPIOS = ["POPAYAN", "SANTANDER DE QUILICHAO", "PIENDAMO", "TIMBIO", "EL TAMBO", "CAJIBIO"]
+
+
+@dataclass
+class Instructor:
+    id_usuario: int
+    token: str
+    fichas: List[int] = field(default_factory=list)
+
+
+@dataclass
+class Contexto:
+    """Datos con los que los escenarios arman sus peticiones."""
+    cod_centro: int
+    token_coordinador: str
+    instructores: List[Instructor]
+    terminos: List[str]
+    estados: List[str] = field(default_factory=lambda: ["En ejecución", "Terminada"])
+
+
+# ----------------------------------------------------------------------
+# Datos sembrados
+# ----------------------------------------------------------------------
+def sembrar(engine, fichas: int, instructores: int, semilla: int = 1, cod_centro: int = 9501) -> Contexto:
+    """
+    Crea las tablas en una base SQLite vacía y la llena con datos reproducibles:
+    `fichas` grupos (el 80 % en `cod_centro`), sus programaciones, un coordinador
+    y `instructores` instructores con notificaciones leídas y sin leer.
+    """
+    from sqlalchemy import text
+
+    from core.security import create_access_token
+
+    rnd = random.Random(semilla)
+    hoy = date.today()
+    centros = [cod_centro, cod_centro + 1]
+
+    programas = [(228100 + i, 1 + i % 3, nombre) for i, nombre in enumerate(_PROGRAMAS)]
+    ambientes = [
+        {"id_ambiente": i + 1, "nombre_ambiente": f"AMBIENTE {101 + i}", "num_max_aprendices": 30,
+         "municipio": rnd.choice(_MUNICIPIOS), "ubicacion": f"BLOQUE {1 + i // 10}",
+         "cod_centro": centros[i % 2], "estado": True}
+        for i in range(40)
+    ]
+
+    def nombre_persona():
+        return f"{rnd.choice(_NOMBRES)} {rnd.choice(_APELLIDOS)} {rnd.choice(_APELLIDOS)}"
+
+    usuarios = [{"id_usuario": 1, "nombre_completo": "COORDINADOR ACADEMICO", "id_rol": 2, "cod_centro": cod_centro}]
+    usuarios += [{"id_usuario": 100 + i, "nombre_completo": nombre_persona(), "id_rol": 3, "cod_centro": cod_centro}
+                 for i in range(instructores)]
+    for u in usuarios:
+        u.update({"identificacion": str(10000000 + u["id_usuario"]), "correo": f"usuario{u['id_usuario']}@sena.edu.co",
+                  "pass_hash": "x", "tipo_contrato": "PLANTA", "telefono": "3000000000", "estado": True})
+
+    grupos, datos_grupo = [], []
+    for i in range(fichas):
+        cod_programa, version, _ = rnd.choice(programas)
+        fecha_inicio = hoy - timedelta(days=rnd.randint(0, 720))
+        grupos.append({
+            "cod_ficha": 2800000 + i,
+            "cod_centro": cod_centro if rnd.random() < 0.8 else centros[1],
+            "cod_programa": cod_programa, "la_version": version,
+            "estado_grupo": rnd.choice(["En ejecución", "En ejecución", "Terminada", "CANCELADO"]),
+            "nombre_nivel": rnd.choice(["TECNÓLOGO", "TÉCNICO", "OPERARIO", "AUXILIAR"]),
+            "jornada": rnd.choice(["DIURNA", "NOCTURNA", "MIXTA", "MADRUGADA"]),
+            "fecha_inicio": fecha_inicio, "fecha_fin": fecha_inicio + timedelta(days=rnd.randint(180, 800)),
+            "etapa": rnd.choice(["LECTIVA", "PRODUCTIVA"]),
+            "modalidad": rnd.choice(["PRESENCIAL", "VIRTUAL", "A DISTANCIA"]),
+            "responsable": nombre_persona(), "nombre_municipio": rnd.choice(_MUNICIPIOS),
+            "id_ambiente": rnd.choice(ambientes)["id_ambiente"],
+        })
+        datos_grupo.append({"cod_ficha": 2800000 + i, "num_total_aprendices": rnd.randint(10, 35), "formacion": rnd.randint(0, 30)})
+
+    competencias = [{"cod_competencia": 220501000 + i, "nombre": f"COMPETENCIA {i}", "horas": rnd.choice([40, 80, 120])} for i in range(200)]
+    resultados = [{"cod_resultado": c["cod_competencia"] * 10 + j, "nombre": f"RESULTADO {j} DE {c['nombre']}", "cod_competencia": c["cod_competencia"]}
+                  for c in competencias for j in range(3)]
+
+    # Cada instructor tiene entre 3 y 6 fichas y unas 60 sesiones alrededor de hoy
+    fichas_centro = [g["cod_ficha"] for g in grupos if g["cod_centro"] == cod_centro]
+    contexto_instructores, programaciones, notificaciones = [], [], []
+    for u in usuarios[1:]:
+        sus_fichas = rnd.sample(fichas_centro, min(len(fichas_centro), rnd.randint(3, 6)))
+        contexto_instructores.append(Instructor(u["id_usuario"], create_access_token({"sub": str(u["id_usuario"])}), sus_fichas))
+        for _ in range(60):
+            resultado = rnd.choice(resultados)
+            hora = rnd.choice([6, 8, 10, 14, 16, 18])
+            programaciones.append({
+                "id_instructor": u["id_usuario"], "cod_ficha": rnd.choice(sus_fichas),
+                "fecha_programada": hoy + timedelta(days=rnd.randint(-60, 60)), "horas_programadas": 2,
+                "hora_inicio": f"{hora:02d}:00:00", "hora_fin": f"{hora + 2:02d}:00:00",
+                "cod_competencia": resultado["cod_competencia"], "cod_resultado": resultado["cod_resultado"], "id_user": 1,
+            })
+    for u in usuarios:
+        for j in range(200 if u["id_rol"] == 2 else 30):
+            notificaciones.append({
+                "id_usuario": u["id_usuario"], "mensaje": f"Notificación {j} para el usuario {u['id_usuario']}",
+                "leida": rnd.random() < 0.7,
+                "fecha_creacion": datetime.now() - timedelta(minutes=rnd.randint(0, 60 * 24 * 90)),
+            })
+
+    inserts = [
+        ("INSERT INTO rol (id_rol, nombre) VALUES (:id_rol, :nombre)",
+         [{"id_rol": 1, "nombre": "superadmin"}, {"id_rol": 2, "nombre": "admin"}, {"id_rol": 3, "nombre": "instructor"}]),
+        ("INSERT INTO centro_formacion (cod_centro, nombre_centro, cod_regional) VALUES (:cod_centro, :nombre_centro, 19)",
+         [{"cod_centro": c, "nombre_centro": f"CENTRO {c}"} for c in centros]),
+        ("""INSERT INTO usuario (id_usuario, nombre_completo, identificacion, id_rol, correo, pass_hash, tipo_contrato, telefono, estado, cod_centro)
+            VALUES (:id_usuario, :nombre_completo, :identificacion, :id_rol, :correo, :pass_hash, :tipo_contrato, :telefono, :estado, :cod_centro)""",
+         usuarios),
+        ("INSERT INTO programa_formacion (cod_programa, la_version, nombre, horas_lectivas, horas_productivas) VALUES (:cod_programa, :la_version, :nombre, 1760, 880)",
+         [{"cod_programa": p, "la_version": v, "nombre": n} for p, v, n in programas]),
+        ("""INSERT INTO ambiente_formacion (id_ambiente, nombre_ambiente, num_max_aprendices, municipio, ubicacion, cod_centro, estado)
+            VALUES (:id_ambiente, :nombre_ambiente, :num_max_aprendices, :municipio, :ubicacion, :cod_centro, :estado)""",
+         ambientes),
+        ("""INSERT INTO grupo (cod_ficha, cod_centro, cod_programa, la_version, estado_grupo, nombre_nivel, jornada, fecha_inicio,
+                               fecha_fin, etapa, modalidad, responsable, nombre_municipio, id_ambiente)
+            VALUES (:cod_ficha, :cod_centro, :cod_programa, :la_version, :estado_grupo, :nombre_nivel, :jornada, :fecha_inicio,
+                    :fecha_fin, :etapa, :modalidad, :responsable, :nombre_municipio, :id_ambiente)""",
+         grupos),
+        ("INSERT INTO datos_grupo (cod_ficha, num_total_aprendices, formacion) VALUES (:cod_ficha, :num_total_aprendices, :formacion)", datos_grupo),
+        ("INSERT INTO competencia (cod_competencia, nombre, horas) VALUES (:cod_competencia, :nombre, :horas)", competencias),
+        ("INSERT INTO resultado_aprendizaje (cod_resultado, nombre, cod_competencia) VALUES (:cod_resultado, :nombre, :cod_competencia)", resultados),
+        ("""INSERT INTO programacion (id_instructor, cod_ficha, fecha_programada, horas_programadas, hora_inicio, hora_fin, cod_competencia, cod_resultado, id_user)
+            VALUES (:id_instructor, :cod_ficha, :fecha_programada, :horas_programadas, :hora_inicio, :hora_fin, :cod_competencia, :cod_resultado, :id_user)""",
+         programaciones),
+        ("INSERT INTO notificacion (id_usuario, mensaje, leida, fecha_creacion) VALUES (:id_usuario, :mensaje, :leida, :fecha_creacion)", notificaciones),
+    ]
+    with engine.begin() as conn:
+        for sentencia in DDL_SQLITE.split(";"):
+            if sentencia.strip():
+                conn.exec_driver_sql(sentencia)
+        for sql, filas in inserts:
+            conn.execute(text(sql), filas)
+
+    # Lo que se escribe en el buscador: palabras de programas, prefijos de ficha y apellidos de responsables
+    terminos = [p.split()[0].lower() for _, _, p in programas] + [p.split()[-1].lower() for _, _, p in programas]
+    terminos += [str(rnd.choice(fichas_centro))[:6] for _ in range(10)] + [a.lower() for a in _APELLIDOS]
+    return Contexto(cod_centro, create_access_token({"sub": "1"}), contexto_instructores, terminos)
+
+
+def _crear_app_local(directorio: str, fichas: int, instructores: int, semilla: int):
+    from fastapi import FastAPI
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.api import grupos, notificacion, programacion
+    from core.database import get_async_db, get_async_read_db, get_db, get_read_db
+
+    ruta_db = os.path.join(directorio, "escenarios.db")
+    if os.path.exists(ruta_db):
+        os.remove(ruta_db)
+    engine = create_engine(f"sqlite:///{ruta_db}")
+    contexto = sembrar(engine, fichas, instructores, semilla)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{ruta_db}", pool_size=20, max_overflow=20)
+
+    SessionEscenarios = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSessionEscenarios = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    def get_db_escenarios():
+        db = SessionEscenarios()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db_escenarios():
+        async with AsyncSessionEscenarios() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(grupos.router, prefix="/grupos")
+    app.include_router(programacion.router, prefix="/programacion")
+    app.include_router(notificacion.router, prefix="/notificaciones")
+    app.dependency_overrides.update({
+        get_db: get_db_escenarios,
+        get_read_db: get_db_escenarios,
+        get_async_db: get_async_db_escenarios,
+        get_async_read_db: get_async_db_escenarios,
+    })
+    return app, contexto
+
+
+# ----------------------------------------------------------------------
+# Registro de latencias
+# ----------------------------------------------------------------------
+class _Registro:
+    """Latencias por plantilla de ruta y duración de cada escenario completo."""
+
+    def __init__(self):
+        self.desde = 0.0
+        self.rutas: Dict[str, List[float]] = defaultdict(list)
+        self.errores: Dict[str, int] = defaultdict(int)
+        self.escenarios: Dict[str, List[float]] = defaultdict(list)
+
+    def peticion(self, ruta: str, inicio: float, ok: bool) -> None:
+        # Lo que empezó durante el calentamiento no cuenta
+        if inicio < self.desde:
+            return
+        if ok:
+            self.rutas[ruta].append(time.perf_counter() - inicio)
+        else:
+            self.errores[ruta] += 1
+
+    def escenario(self, nombre: str, inicio: float) -> None:
+        if inicio >= self.desde:
+            self.escenarios[nombre].append(time.perf_counter() - inicio)
+
+
+async def _get(client: httpx.AsyncClient, registro: _Registro, plantilla: str, url: str, token: str, params: Optional[dict] = None) -> Optional[httpx.Response]:
+    inicio = time.perf_counter()
+    try:
+        response = await client.get(url, params=params, headers={"Authorization": f"Bearer {token}"})
+    except httpx.HTTPError:
+        registro.peticion(plantilla, inicio, False)
+        return None
+    registro.peticion(plantilla, inicio, response.status_code < 400)
+    return response
+
+
+# ----------------------------------------------------------------------
+# Escenarios
+# ----------------------------------------------------------------------
+async def _dashboard(client, contexto: Contexto, registro: _Registro, rnd: random.Random, perfil: dict, factor: float):
+    # El tablero pide los KPIs y las cinco gráficas al mismo tiempo; a veces con un filtro
+    params = {"cod_centro": contexto.cod_centro}
+    if rnd.random() < 0.3:
+        params["estado_grupo"] = rnd.choice(contexto.estados)
+    token = contexto.token_coordinador
+    await asyncio.gather(
+        _get(client, registro, "/grupos/kpis", "/grupos/kpis", token, params),
+        *(_get(client, registro, f"/grupos/distribucion/{d}", f"/grupos/distribucion/{d}", token, params) for d in DISTRIBUCIONES),
+    )
+
+
+async def _autocompletar(client, contexto: Contexto, registro: _Registro, rnd: random.Random, perfil: dict, factor: float):
+    # Una petición por tecla, sin esperar a que el usuario termine de escribir
+    termino = rnd.choice(contexto.terminos)[:8]
+    for n in range(1, len(termino) + 1):
+        await _get(client, registro, "/grupos/search", "/grupos/search", contexto.token_coordinador, {"search": termino[:n], "limit": 20})
+        await asyncio.sleep(perfil.get("tecla_s", 0.15) * factor)
+
+
+async def _calendario(client, contexto: Contexto, registro: _Registro, rnd: random.Random, perfil: dict, factor: float):
+    instructor = rnd.choice(contexto.instructores)
+    await _get(client, registro, "/programacion/instructor/{id_instructor}", f"/programacion/instructor/{instructor.id_usuario}", instructor.token)
+    for cod_ficha in rnd.sample(instructor.fichas, min(len(instructor.fichas), rnd.randint(1, 2))):
+        await _get(client, registro, "/programacion/{cod_ficha}", f"/programacion/{cod_ficha}", instructor.token)
+
+
+async def _notificaciones(client, contexto: Contexto, registro: _Registro, rnd: random.Random, perfil: dict, factor: float):
+    instructor = rnd.choice(contexto.instructores)
+    response = await _get(client, registro, "/notificaciones/unread-count", "/notificaciones/unread-count", instructor.token)
+    # Si la campana muestra pendientes, a veces el usuario abre la lista
+    if response is not None and response.status_code == 200 and response.json().get("total") and rnd.random() < 0.2:
+        await _get(client, registro, "/notificaciones/", "/notificaciones/", instructor.token, {"limit": 20, "solo_no_leidas": "true"})
+
+
+ESCENARIOS = {
+    "dashboard": _dashboard,
+    "autocompletar": _autocompletar,
+    "calendario": _calendario,
+    "notificaciones": _notificaciones,
+}
+
+
+async def _usuario_virtual(numero: int, client, contexto: Contexto, perfil: dict, registro: _Registro, fin: float, semilla: int, factor: float, rampa_s: float):
+    rnd = random.Random(semilla * 100003 + numero)
+    nombres = [n for n in perfil if perfil[n].get("peso", 0) > 0]
+    pesos = [perfil[n]["peso"] for n in nombres]
+    # Arranque escalonado para no disparar todos los usuarios en el mismo instante
+    await asyncio.sleep(rnd.uniform(0, rampa_s))
+    while time.perf_counter() < fin:
+        nombre = rnd.choices(nombres, pesos)[0]
+        inicio = time.perf_counter()
+        await ESCENARIOS[nombre](client, contexto, registro, rnd, perfil[nombre], factor)
+        registro.escenario(nombre, inicio)
+        pausa = perfil[nombre].get("pausa_s", 0) * factor
+        restante = fin - time.perf_counter()
+        if pausa > 0 and restante > 0:
+            await asyncio.sleep(min(rnd.expovariate(1 / pausa), restante))
+
+
+# ----------------------------------------------------------------------
+# Reporte
+# ----------------------------------------------------------------------
+def _etiqueta_git() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+
+
+def _reporte(registro: _Registro, duracion: float, args, perfil: dict) -> dict:
+    rutas = [_resumen(ruta, latencias, registro.errores.get(ruta, 0), duracion)
+             for ruta, latencias in sorted(registro.rutas.items())]
+    rutas += [_resumen(ruta, [], errores, duracion) for ruta, errores in registro.errores.items() if ruta not in registro.rutas]
+    todas = [latencia for latencias in registro.rutas.values() for latencia in latencias]
+    total = _resumen("TOTAL", todas, sum(registro.errores.values()), duracion)
+    escenarios = [_resumen(nombre, latencias, 0, duracion) for nombre, latencias in sorted(registro.escenarios.items())]
+    return {
+        "etiqueta": args.etiqueta or _etiqueta_git(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "parametros": {k: v for k, v in vars(args).items() if not k.startswith("token") and k != "instructor"},
+        "perfil": perfil,
+        "total": total,
+        "rutas": rutas,
+        "escenarios": escenarios,
+    }
+
+
+def _comparar(anterior: dict, actual: dict) -> None:
+    """Variación de cada ruta respecto a un reporte anterior (negativo = más rápido)."""
+    def variacion(antes, despues):
+        if not antes or despues is None:
+            return "-"
+        return f"{(despues - antes) / antes * 100:+.1f}%"
+
+    previas = {r["ruta"]: r for r in anterior["rutas"] + [anterior["total"]]}
+    print(f"\nComparación con {anterior.get('etiqueta', '?')} ({anterior.get('fecha', '?')})")
+    print(f"{'ruta':<45} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for r in actual["rutas"] + [actual["total"]]:
+        previa = previas.get(r["ruta"])
+        if previa is None:
+            continue
+        print(f"{r['ruta'][:45]:<45} {variacion(previa['rps'], r['rps']):>9} "
+              + " ".join(f"{variacion(previa.get(k), r.get(k)):>9}" for k in ("p50_ms", "p95_ms", "p99_ms")))
+
+
+def _cargar_perfil(ruta: Optional[str]) -> dict:
+    perfil = {nombre: dict(valores) for nombre, valores in PERFIL_BASE.items()}
+    if ruta:
+        with open(ruta, encoding="utf-8") as f:
+            for nombre, valores in json.load(f).items():
+                if nombre not in ESCENARIOS:
+                    raise SystemExit(f"Escenario desconocido en el perfil: {nombre} (válidos: {', '.join(ESCENARIOS)})")
+                perfil[nombre].update(valores)
+    return perfil
+
+
+def _contexto_remoto(args) -> Contexto:
+    instructores = []
+    for valor in args.instructor:
+        id_usuario, _, token = valor.partition(":")
+        instructores.append(Instructor(int(id_usuario), token, [int(f) for f in args.ficha]))
+    return Contexto(args.cod_centro, args.token_coordinador, instructores, args.termino or ["software", "gestion", "2"])
+
+
+async def main(args) -> dict:
+    perfil = _cargar_perfil(args.perfil)
+    if args.base_url:
+        base_url, contexto = args.base_url, _contexto_remoto(args)
+    else:
+        directorio = args.directorio or tempfile.mkdtemp(prefix="benchmark_escenarios_")
+        inicio = time.perf_counter()
+        app, contexto = _crear_app_local(directorio, args.fichas, args.instructores, args.semilla)
+        print(f"Base sembrada en {directorio}: {args.fichas} fichas, {args.instructores} instructores ({time.perf_counter() - inicio:.1f} s)")
+        base_url = _iniciar_servidor(app)
+
+    registro = _Registro()
+    limits = httpx.Limits(max_connections=args.usuarios * len(DISTRIBUCIONES) + args.usuarios)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=httpx.Timeout(args.timeout)) as client:
+        inicio = time.perf_counter()
+        registro.desde = inicio + args.calentamiento
+        fin = registro.desde + args.duracion
+        await asyncio.gather(*(
+            _usuario_virtual(n, client, contexto, perfil, registro, fin, args.semilla, args.factor_pausa, min(args.calentamiento, 10))
+            for n in range(args.usuarios)
+        ))
+        duracion = time.perf_counter() - registro.desde
+
+    reporte = _reporte(registro, duracion, args, perfil)
+    print(f"\n{reporte['etiqueta']}: {args.usuarios} usuarios virtuales durante {duracion:.0f} s\n")
+    _imprimir(reporte["rutas"] + [reporte["total"]])
+    print()
+    _imprimir(reporte["escenarios"])
+
+    if args.comparar_con:
+        with open(args.comparar_con, encoding="utf-8") as f:
+            _comparar(json.load(f), reporte)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+    return reporte
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=50, help="Usuarios virtuales simultáneos")
+    parser.add_argument("--duracion", type=float, default=60.0, help="Segundos de medición")
+    parser.add_argument("--calentamiento", type=float, default=5.0, help="Segundos iniciales que no se miden")
+    parser.add_argument("--perfil", default=None, help="JSON con pesos y pausas por escenario")
+    parser.add_argument("--factor-pausa", type=float, default=1.0, help="Multiplica las pausas del perfil (0 = sin pausas)")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--etiqueta", default=None, help="Versión que se reporta (por defecto git describe)")
+    parser.add_argument("--json", default=None, help="Archivo donde guardar el reporte")
+    parser.add_argument("--comparar-con", default=None, help="Reporte JSON de una versión anterior")
+    local = parser.add_argument_group("base local sembrada (por defecto)")
+    local.add_argument("--fichas", type=int, default=5000)
+    local.add_argument("--instructores", type=int, default=50)
+    local.add_argument("--directorio", default=None, help="Dónde crear la base SQLite (por defecto un temporal)")
+    remoto = parser.add_argument_group("servidor existente")
+    remoto.add_argument("--base-url", default=None)
+    remoto.add_argument("--cod-centro", type=int, default=0)
+    remoto.add_argument("--token-coordinador", default=None, help="JWT de un administrador del centro")
+    remoto.add_argument("--instructor", action="append", default=[], help="ID:JWT de un instructor (se puede repetir)")
+    remoto.add_argument("--ficha", action="append", default=[], help="Ficha que abren los instructores en el calendario")
+    remoto.add_argument("--termino", action="append", default=[], help="Texto que se escribe en el buscador")
+    args = parser.parse_args(argv)
+    if args.base_url and not (args.token_coordinador and args.instructor and args.cod_centro):
+        parser.error("Con --base-url indique --cod-centro, --token-coordinador y al menos un --instructor")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(_parse_args()))
@@ -0,0 +1,357 @@
+"""
+Benchmark de las cargas de archivos (PE-04, DF-14 y evaluaciones).
+
+Genera libros de Excel sintéticos del tamaño pedido con el mismo formato que los
+reales, los envía a los tres endpoints de /files con TestClient y reporta por
+archivo: filas/segundo, pico de memoria (RSS) y duración de cada etapa (las mismas
+etapas que mide `medir_etapa` en la aplicación).
+
+    python -m benchmarks.importacion --filas 20000 --filas-evaluaciones 5000
+    python -m benchmarks.importacion --filas 50000 --json resultados.json
+    python -m benchmarks.importacion --solo-generar --directorio /tmp/libros
+
+Por defecto usa una base SQLite temporal con las tablas que tocan las cargas y un
+adaptador que traduce el SQL propio de MySQL (ON DUPLICATE KEY UPDATE, INSERT IGNORE).
+Con --database-url se ejecuta contra una base MySQL real que ya tenga el esquema.
+Los tiempos de SQLite sirven para comparar versiones del código entre sí, no para
+estimar los de producción.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from openpyxl import Workbook
+
+COLUMNAS_PE04 = [
+    "IDENTIFICADOR_FICHA", "CODIGO_CENTRO", "CODIGO_PROGRAMA", "VERSION_PROGRAMA",
+    "NOMBRE_PROGRAMA_FORMACION", "ESTADO_CURSO", "NIVEL_FORMACION", "NOMBRE_JORNADA",
+    "FECHA_INICIO_FICHA", "FECHA_TERMINACION_FICHA", "ETAPA_FICHA", "MODALIDAD_FORMACION",
+    "NOMBRE_RESPONSABLE", "NOMBRE_EMPRESA", "NOMBRE_MUNICIPIO_CURSO", "NOMBRE_PROGRAMA_ESPECIAL",
+    "CODIGO_REGIONAL", "NOMBRE_REGIONAL", "NOMBRE_CENTRO",
+    "TOTAL_APRENDICES_MASCULINOS", "TOTAL_APRENDICES_FEMENINOS", "TOTAL_APRENDICES_NOBINARIO",
+    "TOTAL_APRENDICES", "TOTAL_APRENDICES_ACTIVOS",
+]
+
+COLUMNAS_DF14 = [
+    "FICHA", "CODIGO_PROGRAMA", "VERSION_PROGRAMA", "DURACION_ETAPA_LECTIVA", "DURACION_ETAPA_PRODUCTIVA",
+    "CUPO", "EN_TRANSITO", "INDUCCION", "FORMACION", "CONDICIONADO", "APLAZADO", "RETIRO_VOLUNTARIO",
+    "CANCELAMIENTO_VIRT_COMP", "DESERCION_VIRT_COMP", "CANCELADO", "POR_CERTIFICAR", "CERTIFICADO",
+    "TRASLADADO", "OTRO",
+]
+
+COLUMNAS_EVALUACIONES = [
+    "Tipo de Documento", "Número de Documento", "Nombre", "Apellidos", "Estado", "Competencia",
+    "Resultado de Aprendizaje", "Juicio de Evaluación", "Fecha y Hora del Juicio Evaluativo",
+    "Funcionario que registro el juicio evaluativo",
+]
+
+# Tablas que tocan las tres cargas, en la sintaxis común a SQLite
+DDL_SQLITE = """
+CREATE TABLE regional (cod_regional INTEGER PRIMARY KEY, nombre TEXT);
+CREATE TABLE centro_formacion (cod_centro INTEGER PRIMARY KEY, nombre_centro TEXT, cod_regional INTEGER);
+CREATE TABLE programa_formacion (
+    cod_programa INTEGER, la_version INTEGER, nombre TEXT, horas_lectivas INTEGER, horas_productivas INTEGER,
+    PRIMARY KEY (cod_programa, la_version)
+);
+CREATE TABLE grupo (
+    cod_ficha INTEGER PRIMARY KEY, cod_centro INTEGER, cod_programa INTEGER, la_version INTEGER,
+    estado_grupo TEXT, nombre_nivel TEXT, jornada TEXT, fecha_inicio DATE, fecha_fin DATE, etapa TEXT,
+    modalidad TEXT, responsable TEXT, nombre_empresa TEXT, nombre_municipio TEXT,
+    nombre_programa_especial TEXT, hora_inicio TEXT, hora_fin TEXT
+);
+CREATE TABLE datos_grupo (
+    cod_ficha INTEGER PRIMARY KEY, num_aprendices_masculinos INTEGER, num_aprendices_femenino INTEGER,
+    num_aprendices_no_binario INTEGER, num_total_aprendices INTEGER, num_total_aprendices_activos INTEGER,
+    cupo_total INTEGER, en_transito INTEGER, induccion INTEGER, formacion INTEGER, condicionado INTEGER,
+    aplazado INTEGER, retiro_voluntario INTEGER, cancelado INTEGER, cancelamiento_vit_comp INTEGER,
+    desercion_vit_comp INTEGER, por_certificar INTEGER, certificados INTEGER, traslados INTEGER, otro INTEGER
+);
+CREATE TABLE competencia (cod_competencia INTEGER PRIMARY KEY, nombre TEXT, horas INTEGER);
+CREATE TABLE resultado_aprendizaje (cod_resultado INTEGER PRIMARY KEY, nombre TEXT, cod_competencia INTEGER);
+CREATE TABLE programa_competencia (
+    cod_prog_competencia INTEGER PRIMARY KEY AUTOINCREMENT, cod_programa INTEGER, cod_competencia INTEGER,
+    UNIQUE (cod_programa, cod_competencia)
+);
+CREATE TABLE usuario (id_usuario INTEGER PRIMARY KEY, id_rol INTEGER, estado BOOLEAN, cod_centro INTEGER);
+CREATE TABLE notificacion (
+    id_notificacion INTEGER PRIMARY KEY AUTOINCREMENT, id_usuario INTEGER, mensaje TEXT,
+    leida BOOLEAN, fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+_RE_DUPLICATE = re.compile(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", re.I)
+_RE_VALUES = re.compile(r"VALUES\((\w+)\)", re.I)
+_RE_IGNORE = re.compile(r"INSERT\s+IGNORE", re.I)
+
+
+def _mysql_a_sqlite(conn, cursor, statement, parameters, context, executemany):
+    # Traduce los upserts de MySQL a la sintaxis de SQLite (3.35+)
+    if _RE_DUPLICATE.search(statement):
+        insert, actualizaciones = _RE_DUPLICATE.split(statement, maxsplit=1)
+        actualizaciones = _RE_VALUES.sub(r"excluded.\1", actualizaciones)
+        statement = f"{insert} ON CONFLICT DO UPDATE SET {actualizaciones}"
+    elif _RE_IGNORE.search(statement):
+        statement = _RE_IGNORE.sub("INSERT OR IGNORE", statement)
+    return statement, parameters
+
+
+# ----------------------------------------------------------------------
+# Generadores de libros
+# ----------------------------------------------------------------------
+def _datos_base(filas: int, semilla: int) -> dict:
+    rnd = random.Random(semilla)
+    programas = [(228100 + i, rnd.randint(1, 3)) for i in range(max(1, filas // 40))]
+    centros = [9100 + i for i in range(max(1, filas // 2000))]
+    return {"rnd": rnd, "programas": programas, "centros": centros}
+
+
+def generar_pe04(filas: int, ruta: str, semilla: int = 1) -> str:
+    """Libro PE-04: 4 filas de encabezado del reporte, la fila de columnas y los datos."""
+    base = _datos_base(filas, semilla)
+    rnd = base["rnd"]
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("PE-04")
+    for i in range(4):
+        ws.append([f"Reporte de fichas de caracterización (fila {i + 1})"])
+    ws.append(COLUMNAS_PE04)
+    inicio = date(2024, 1, 15)
+    for i in range(filas):
+        cod_programa, version = base["programas"][i % len(base["programas"])]
+        cod_centro = base["centros"][i % len(base["centros"])]
+        fecha_inicio = inicio + timedelta(days=rnd.randint(0, 600))
+        fecha_fin = fecha_inicio + timedelta(days=rnd.randint(180, 800))
+        hombres, mujeres = rnd.randint(0, 20), rnd.randint(0, 20)
+        ws.append([
+            str(2800000 + i), str(cod_centro), str(cod_programa), str(version),
+            f"PROGRAMA {cod_programa}", rnd.choice(["En ejecución", "Terminada", "Registrada"]),
+            rnd.choice(["TECNÓLOGO", "TÉCNICO", "OPERARIO"]), rnd.choice(["DIURNA", "NOCTURNA", "MIXTA"]),
+            fecha_inicio.strftime("%d/%m/%Y"), fecha_fin.strftime("%d/%m/%Y"),
+            rnd.choice(["LECTIVA", "PRODUCTIVA"]), rnd.choice(["PRESENCIAL", "VIRTUAL"]),
+            f"INSTRUCTOR {rnd.randint(1, 500)}", "", f"MUNICIPIO {rnd.randint(1, 30)}", "",
+            "66", "REGIONAL RISARALDA", f"CENTRO {cod_centro}",
+            str(hombres), str(mujeres), "0", str(hombres + mujeres), str(hombres + mujeres - rnd.randint(0, 3)),
+        ])
+    wb.save(ruta)
+    return ruta
+
+
+def generar_df14(filas: int, ruta: str, semilla: int = 1) -> str:
+    """Libro DF-14 con las mismas fichas y programas que `generar_pe04` con la misma semilla."""
+    base = _datos_base(filas, semilla)
+    rnd = base["rnd"]
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("DF-14")
+    for i in range(4):
+        ws.append([f"Reporte DF-14 (fila {i + 1})"])
+    ws.append(COLUMNAS_DF14)
+    for i in range(filas):
+        cod_programa, version = base["programas"][i % len(base["programas"])]
+        estados = [rnd.randint(0, 5) for _ in range(14)]
+        ws.append([str(2800000 + i), str(cod_programa), str(version), "1760", "880", str(sum(estados))]
+                  + [str(e) for e in estados])
+    wb.save(ruta)
+    return ruta
+
+
+def generar_evaluaciones(filas: int, ruta: str, cod_programa: int = 228100, semilla: int = 1) -> str:
+    """
+    Libro de evaluaciones: ficha de caracterización en C3, encabezado de la tabla de
+    juicios en la fila 14 y los datos desde la fila 15.
+    """
+    rnd = random.Random(semilla)
+    competencias = [220501000 + i for i in range(max(1, filas // 200))]
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Evaluaciones")
+    ws.append(["Reporte de juicios evaluativos"])
+    ws.append(["Campo", "", "Valor"])
+    ws.append(["Ficha de Caracterización:", "", str(cod_programa)])
+    for i in range(4, 14):
+        ws.append([f"Dato {i}:", "", f"valor {i}"])
+    ws.append(COLUMNAS_EVALUACIONES)
+    inicio = date(2024, 3, 1)
+    for i in range(filas):
+        cod_competencia = competencias[i % len(competencias)]
+        cod_resultado = cod_competencia * 10 + rnd.randint(0, 9)
+        ws.append([
+            "CC", str(1000000000 + i), f"NOMBRE {i}", f"APELLIDO {i}", "EN FORMACION",
+            f"{cod_competencia} - COMPETENCIA {cod_competencia}",
+            f"{cod_resultado} - RESULTADO {cod_resultado}",
+            rnd.choice(["APROBADO", "POR EVALUAR"]),
+            (inicio + timedelta(days=rnd.randint(0, 300))).strftime("%d/%m/%Y %H:%M"),
+            f"INSTRUCTOR {rnd.randint(1, 500)}",
+        ])
+    wb.save(ruta)
+    return ruta
+
+
+# ----------------------------------------------------------------------
+# Ejecución
+# ----------------------------------------------------------------------
+class _MedidorRSS:
+    """Pico de memoria residente mientras dura un bloque (lee /proc/self/statm)."""
+
+    def __init__(self, intervalo_s: float = 0.01):
+        self.intervalo_s = intervalo_s
+        self.pico_bytes = 0
+        self._detener = threading.Event()
+        self._pagina = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _rss(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._pagina
+        except OSError:
+            # Sin /proc solo está el pico de todo el proceso
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo_s):
+            self.pico_bytes = max(self.pico_bytes, self._rss())
+
+    def __enter__(self):
+        self.pico_bytes = self._rss()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._detener.set()
+        self._hilo.join()
+        self.pico_bytes = max(self.pico_bytes, self._rss())
+
+
+def _tiempos_etapas(archivo: str) -> Dict[str, float]:
+    from core.metrics import REGISTRY
+
+    tiempos = {}
+    for metrica in REGISTRY.collect():
+        if metrica.name != "carga_etapa_duration_seconds":
+            continue
+        for muestra in metrica.samples:
+            if muestra.name.endswith("_sum") and muestra.labels.get("archivo") == archivo:
+                tiempos[muestra.labels["etapa"]] = muestra.value
+    return tiempos
+
+
+def _crear_cliente(database_url: Optional[str], directorio: str):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+
+    from app.api import cargar_archivos
+    from core.database import get_db
+
+    if database_url:
+        engine = create_engine(database_url, pool_pre_ping=True)
+    else:
+        # pymysql convierte los enteros de NumPy que llegan desde pandas; sqlite3 no
+        sqlite3.register_adapter(np.int64, int)
+        sqlite3.register_adapter(np.float64, float)
+        engine = create_engine(f"sqlite:///{os.path.join(directorio, 'benchmark.db')}")
+        event.listen(engine, "before_cursor_execute", _mysql_a_sqlite, retval=True)
+        with engine.begin() as conn:
+            for sentencia in DDL_SQLITE.split(";"):
+                if sentencia.strip():
+                    conn.exec_driver_sql(sentencia)
+            conn.exec_driver_sql("INSERT INTO usuario (id_usuario, id_rol, estado, cod_centro) VALUES (1, 2, 1, 9100)")
+
+    SessionBenchmark = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_db_benchmark():
+        db = SessionBenchmark()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(cargar_archivos.router, prefix="/files")
+    app.dependency_overrides[get_db] = get_db_benchmark
+    return TestClient(app)
+
+
+def _subir(client, ruta_endpoint: str, archivo: str, clave: str, filas: int) -> dict:
+    antes = _tiempos_etapas(clave)
+    with open(archivo, "rb") as f, _MedidorRSS() as rss:
+        inicio = time.perf_counter()
+        response = client.post(ruta_endpoint, files={"file": (os.path.basename(archivo), f, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")})
+        duracion = time.perf_counter() - inicio
+    despues = _tiempos_etapas(clave)
+    cuerpo = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+    return {
+        "archivo": clave,
+        "filas": filas,
+        "tamano_mb": round(os.path.getsize(archivo) / 1_048_576, 2),
+        "status": response.status_code,
+        "errores": len(cuerpo.get("errores", [])),
+        "duracion_s": round(duracion, 3),
+        "filas_por_s": round(filas / duracion, 1) if duracion else 0.0,
+        "rss_pico_mb": round(rss.pico_bytes / 1_048_576, 1),
+        "etapas_ms": {etapa: round((valor - antes.get(etapa, 0.0)) * 1000, 1) for etapa, valor in despues.items()},
+    }
+
+
+def _imprimir(resultados: List[dict]) -> None:
+    print(f"{'archivo':<14} {'filas':>8} {'MB':>6} {'seg':>8} {'filas/s':>10} {'RSS MB':>8} {'err':>5}")
+    for r in resultados:
+        print(f"{r['archivo']:<14} {r['filas']:>8} {r['tamano_mb']:>6} {r['duracion_s']:>8} {r['filas_por_s']:>10} {r['rss_pico_mb']:>8} {r['errores']:>5}")
+    print()
+    for r in resultados:
+        etapas = ", ".join(f"{etapa} {ms} ms" for etapa, ms in r["etapas_ms"].items())
+        print(f"{r['archivo']}: {etapas}")
+
+
+def main(args) -> List[dict]:
+    directorio = args.directorio or tempfile.mkdtemp(prefix="benchmark_importacion_")
+    os.makedirs(directorio, exist_ok=True)
+    filas_df14 = args.filas_df14 or args.filas
+
+    inicio = time.perf_counter()
+    pe04 = generar_pe04(args.filas, os.path.join(directorio, "pe04.xlsx"), args.semilla)
+    df14 = generar_df14(filas_df14, os.path.join(directorio, "df14.xlsx"), args.semilla)
+    evaluaciones = generar_evaluaciones(args.filas_evaluaciones, os.path.join(directorio, "evaluaciones.xlsx"), semilla=args.semilla)
+    print(f"Libros generados en {directorio} ({time.perf_counter() - inicio:.1f} s)")
+    if args.solo_generar:
+        return []
+
+    client = _crear_cliente(args.database_url, directorio)
+    resultados = []
+    for _ in range(args.repeticiones):
+        resultados.append(_subir(client, "/files/upload-excel/", pe04, "pe04", args.filas))
+        resultados.append(_subir(client, "/files/upload-df14-excel/", df14, "df14", filas_df14))
+        resultados.append(_subir(client, "/files/upload-evaluaciones-excel/", evaluaciones, "evaluaciones", args.filas_evaluaciones))
+    _imprimir(resultados)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, ensure_ascii=False, indent=2)
+    return resultados
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=10000, help="Filas del PE-04 (y del DF-14 si no se indica)")
+    parser.add_argument("--filas-df14", type=int, default=None)
+    parser.add_argument("--filas-evaluaciones", type=int, default=5000)
+    parser.add_argument("--repeticiones", type=int, default=1, help="Veces que se repite cada carga (la segunda mide actualizaciones)")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--directorio", default=None, help="Dónde escribir los libros y la base SQLite (por defecto un temporal)")
+    parser.add_argument("--database-url", default=None, help="URL de una base MySQL con el esquema (por defecto SQLite temporal)")
+    parser.add_argument("--json", default=None, help="Archivo donde guardar los resultados")
+    parser.add_argument("--solo-generar", action="store_true", help="Solo genera los libros de Excel")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    main(_parse_args())
@@ -0,0 +1,151 @@
+"""
+Benchmark de la serialización de listados: `response_model` contra `respuesta_rapida`.
+
+Genera N filas `RowMapping` con los mismos tipos que entrega MySQL (TIME como
+timedelta, SUM() como Decimal) y mide, por cada 10.000 filas, el costo de convertirlas
+en el cuerpo JSON de la respuesta por los dos caminos:
+
+- `response_model`: lo que hace FastAPI con `response_model=List[Modelo]`
+  (`serialize_response`: validación Pydantic por fila, volcado a tipos JSON y
+  `JSONResponse`).
+- `respuesta_rapida`: conversores precalculados por campo + orjson
+  (`core.serializacion`).
+
+Antes de medir comprueba que los dos cuerpos decodifican al mismo JSON.
+
+    python -m benchmarks.serializacion
+    python -m benchmarks.serializacion --filas 50000 --repeticiones 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from app.schemas.grupos import GrupoOut, GruposPorMunicipioSchema
+from app.schemas.programacion import ProgramacionOut
+from core.serializacion import respuesta_rapida
+
+
+def _mappings(columnas: List[str], filas: List[tuple]):
+    # Mismo tipo de fila que `db.execute(...).mappings().all()`
+    return IteratorResult(SimpleResultMetaData(columnas), iter(filas)).mappings().all()
+
+
+def _programaciones(n: int, rng: random.Random):
+    columnas = [
+        "id_programacion", "id_instructor", "cod_ficha", "fecha_programada", "horas_programadas",
+        "hora_inicio", "hora_fin", "cod_competencia", "cod_resultado", "id_user",
+        "nombre_instructor", "nombre_competencia", "nombre_resultado",
+    ]
+    filas = []
+    for i in range(n):
+        inicio = rng.choice((7, 9, 13, 18))
+        horas = rng.randint(2, 4)
+        filas.append((
+            i + 1, rng.randint(100, 400), 2800000 + rng.randint(0, 5000), date(2026, 1, 1) + timedelta(days=rng.randint(0, 360)),
+            horas, timedelta(hours=inicio), timedelta(hours=inicio + horas), 220501000 + rng.randint(0, 90),
+            2205010000 + rng.randint(0, 900), rng.randint(1, 50), f"Instructor {i % 300}",
+            "Desarrollar la solución de software de acuerdo con el diseño", "Codificar los módulos del sistema",
+        ))
+    return _mappings(columnas, filas)
+
+
+def _grupos(n: int, rng: random.Random):
+    columnas = [
+        "cod_ficha", "cod_centro", "cod_programa", "la_version", "estado_grupo", "nombre_nivel", "jornada",
+        "fecha_inicio", "fecha_fin", "etapa", "modalidad", "responsable", "nombre_empresa",
+        "nombre_municipio", "nombre_programa_especial", "hora_inicio", "hora_fin", "id_ambiente",
+    ]
+    filas = []
+    for i in range(n):
+        inicio = date(2025, 1, 1) + timedelta(days=rng.randint(0, 500))
+        filas.append((
+            2800000 + i, 9501, 228106, 1, "En ejecucion", "TECNÓLOGO", rng.choice(("MAÑANA", "TARDE", "NOCHE")),
+            inicio, inicio + timedelta(days=730), "LECTIVA", "PRESENCIAL", f"Responsable {i % 80}", None,
+            "POPAYÁN", None, timedelta(hours=7), timedelta(hours=13), rng.randint(1, 60),
+        ))
+    return _mappings(columnas, filas)
+
+
+def _distribucion(n: int, rng: random.Random):
+    filas = [(f"Municipio {i}", rng.randint(1, 300), Decimal(rng.randint(0, 9000))) for i in range(n)]
+    return _mappings(["municipio", "cantidad", "total_aprendices_formacion"], filas)
+
+
+CASOS = {
+    "programaciones": (ProgramacionOut, _programaciones),
+    "grupos": (GrupoOut, _grupos),
+    "distribucion": (GruposPorMunicipioSchema, _distribucion),
+}
+
+
+def _response_model(modelo) -> Callable[[list], bytes]:
+    campo = create_model_field(name="Response", type_=List[modelo], mode="serialization")
+
+    def serializar(filas) -> bytes:
+        contenido = asyncio.run(serialize_response(field=campo, response_content=filas))
+        return JSONResponse(contenido).body
+
+    return serializar
+
+
+def _rapida(modelo) -> Callable[[list], bytes]:
+    return lambda filas: respuesta_rapida(modelo, filas).body
+
+
+def _medir(funcion: Callable[[list], bytes], filas, repeticiones: int) -> List[float]:
+    funcion(filas)  # calentamiento (caches de pydantic y de conversores)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(filas)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=10000, help="Filas por listado (por defecto 10000)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    resultados = {}
+    print(f"{'listado':<16}{'response_model':>16}{'rápida':>12}{'ahorro':>12}{'x':>7}   (ms por 10k filas, mediana)")
+    for nombre, (modelo, generar) in CASOS.items():
+        filas = generar(args.filas, rng)
+        lento, rapido = _response_model(modelo), _rapida(modelo)
+        if json.loads(lento(filas)) != json.loads(rapido(filas)):
+            raise SystemExit(f"{nombre}: las dos serializaciones no producen el mismo JSON")
+
+        escala = 10000 / args.filas * 1000
+        ms_lento = statistics.median(_medir(lento, filas, args.repeticiones)) * escala
+        ms_rapido = statistics.median(_medir(rapido, filas, args.repeticiones)) * escala
+        resultados[nombre] = {
+            "filas": args.filas,
+            "response_model_ms_10k": round(ms_lento, 2),
+            "rapida_ms_10k": round(ms_rapido, 2),
+            "ahorro_ms_10k": round(ms_lento - ms_rapido, 2),
+            "bytes": len(rapido(filas)),
+        }
+        print(f"{nombre:<16}{ms_lento:>16.1f}{ms_rapido:>12.1f}{ms_lento - ms_rapido:>12.1f}{ms_lento / ms_rapido:>7.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Prueba de carga del canal SSE de notificaciones (/notificaciones/stream).
+
+Levanta un único worker de uvicorn con el router de notificaciones, conecta N
+suscriptores concurrentes (uno por usuario) y publica notificaciones desde otro
+hilo, igual que lo hace create_programacion desde el threadpool. Reporta cuántos
+clientes quedaron conectados, la latencia de entrega y la memoria del proceso.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.sse_suscriptores --suscriptores 1000 --rondas 3
+"""
+import argparse
+import asyncio
+import resource
+import socket
+import statistics
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Query
+
+from app.api import notificacion
+from app.api.dependencies import get_current_user_stream
+from app.crud import notificacion as crud_notificacion
+from app.schemas.notificacion import NotificacionCreate
+from core.broker import notification_broker
+
+
+def _usuario_de_prueba(usuario: int = Query(...)):
+    # Solo para la prueba de carga: cada suscriptor se identifica con ?usuario=N
+    return SimpleNamespace(id_usuario=usuario)
+
+
+def _crear_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(notificacion.router, prefix="/notificaciones")
+    app.dependency_overrides[get_current_user_stream] = _usuario_de_prueba
+    return app
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _iniciar_servidor(port: int) -> uvicorn.Server:
+    config = uvicorn.Config(_crear_app(), host="127.0.0.1", port=port, log_level="warning", workers=1)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _suscriptor(client: httpx.AsyncClient, usuario: int, conectados: asyncio.Event,
+                      contador: list, total: int, latencias: list) -> None:
+    async with client.stream("GET", "/notificaciones/stream", params={"usuario": usuario}) as response:
+        avisado = False
+        async for linea in response.aiter_lines():
+            if not avisado:
+                avisado = True
+                contador[0] += 1
+                if contador[0] == total:
+                    conectados.set()
+            if linea.startswith("data: "):
+                enviado = float(linea.split('"mensaje": "', 1)[1].split('"', 1)[0])
+                latencias.append(time.perf_counter() - enviado)
+
+
+def _publicar(usuarios: int) -> None:
+    # Productor en otro hilo, como un endpoint síncrono en el threadpool
+    notificaciones = [
+        NotificacionCreate(id_usuario=usuario, mensaje=str(time.perf_counter()))
+        for usuario in range(usuarios)
+    ]
+    crud_notificacion.publish_notifications(notificaciones)
+
+
+async def main(args) -> None:
+    port = _puerto_libre()
+    server = _iniciar_servidor(port)
+    rss_inicial = _rss_mb()
+
+    limits = httpx.Limits(max_connections=args.suscriptores + 10, max_keepalive_connections=0)
+    timeout = httpx.Timeout(None, connect=30)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=timeout) as client:
+        conectados = asyncio.Event()
+        contador = [0]
+        latencias: list = []
+
+        inicio = time.perf_counter()
+        tareas = [
+            asyncio.create_task(_suscriptor(client, usuario, conectados, contador, args.suscriptores, latencias))
+            for usuario in range(args.suscriptores)
+        ]
+        await asyncio.wait_for(conectados.wait(), timeout=120)
+        tiempo_conexion = time.perf_counter() - inicio
+
+        for _ in range(args.rondas):
+            await asyncio.to_thread(_publicar, args.suscriptores)
+            await asyncio.sleep(args.pausa)
+
+        esperados = args.suscriptores * args.rondas
+        limite = time.perf_counter() + 30
+        while len(latencias) < esperados and time.perf_counter() < limite:
+            await asyncio.sleep(0.1)
+
+        print(f"Suscriptores conectados:     {contador[0]} (broker: {notification_broker.subscriber_count})")
+        print(f"Tiempo en conectar todos:    {tiempo_conexion:.2f} s")
+        print(f"Eventos entregados:          {len(latencias)}/{esperados}")
+        if latencias:
+            cuantiles = statistics.quantiles(latencias, n=100)
+            print(f"Latencia de entrega p50:     {cuantiles[49] * 1000:.1f} ms")
+            print(f"Latencia de entrega p99:     {cuantiles[98] * 1000:.1f} ms")
+        print(f"RSS máximo del proceso:      {_rss_mb():.1f} MB (inicial {rss_inicial:.1f} MB)")
+
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suscriptores", type=int, default=1000, help="Conexiones SSE concurrentes")
+    parser.add_argument("--rondas", type=int, default=3, help="Notificaciones publicadas por suscriptor")
+    parser.add_argument("--pausa", type=float, default=0.5, help="Segundos entre rondas de publicación")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationBroker:
+    """
+    Pub/sub en proceso para enviar notificaciones a los clientes suscritos (SSE).
+
+    Cada suscripción es una cola asyncio acotada que vive en el event loop del worker.
+    Los productores (endpoints síncronos que corren en el threadpool) publican con
+    `publish`, que es seguro entre hilos: el evento se entrega en el event loop con
+    `call_soon_threadsafe`. Si un cliente lento llena su cola se descarta el evento
+    más antiguo para no bloquear al productor.
+    """
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Registra una nueva suscripción del usuario. Debe llamarse desde el event loop."""
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        """Elimina la suscripción (el cliente se desconectó)."""
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id: int, event: dict) -> None:
+        """
+        Publica un evento para todas las suscripciones del usuario.
+        Se puede llamar desde cualquier hilo; no hace nada si el usuario no está conectado.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self.is_subscribed(user_id):
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is loop:
+            self._deliver(user_id, event)
+        else:
+            loop.call_soon_threadsafe(self._deliver, user_id, event)
+
+    def is_subscribed(self, user_id: int) -> bool:
+        return user_id in self._subscribers
+
+    @property
+    def subscriber_count(self) -> int:
+        """Número total de conexiones suscritas en este worker."""
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    def _deliver(self, user_id: int, event: dict) -> None:
+        with self._lock:
+            queues = list(self._subscribers.get(user_id, ()))
+        for queue in queues:
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                    logger.warning(f"Cola de notificaciones llena para el usuario {user_id}; se descartó el evento más antiguo")
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+
+# Instancia global del broker de notificaciones
+notification_broker = NotificationBroker()
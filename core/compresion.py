@@ -0,0 +1,203 @@
+"""
+Compresión de respuestas (brotli o gzip) según Accept-Encoding.
+
+- Solo se comprimen tipos de texto (JSON, NDJSON, CSV, HTML...). Quedan fuera
+  text/event-stream (cada evento SSE debe llegar apenas se publica) y los formatos
+  que ya vienen comprimidos (Parquet, XLSX, imágenes).
+- Las respuestas de menos de COMPRESSION_MIN_SIZE bytes se envían sin comprimir:
+  en ellas el encabezado gzip/brotli y el tiempo de CPU cuestan más de lo que ahorran.
+- Las respuestas por partes (StreamingResponse) se comprimen bloque a bloque y se
+  vacía el compresor después de cada uno, para que el cliente reciba cada lote de
+  un listado NDJSON sin esperar al final. Mientras no se alcance el umbral los
+  primeros bloques se acumulan; si la respuesta termina antes, va sin comprimir.
+"""
+import zlib
+from typing import List, Optional
+
+from core.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
+
+# Prefijos de Content-Type que vale la pena comprimir
+TIPOS_COMPRIMIBLES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/problem+json",
+    "image/svg+xml",
+)
+TIPOS_EXCLUIDOS = ("text/event-stream",)
+
+
+def _codificaciones_aceptadas(accept_encoding: str) -> dict:
+    aceptadas = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                calidad = float(parametros[2:])
+            except ValueError:
+                calidad = 0.0
+        if nombre:
+            aceptadas[nombre.strip().lower()] = calidad
+    return aceptadas
+
+
+def elegir_codificacion(accept_encoding: str, brotli_habilitado: bool = True) -> Optional[str]:
+    """Codificación a usar ("br", "gzip") o None; ante la misma calidad se prefiere brotli."""
+    aceptadas = _codificaciones_aceptadas(accept_encoding)
+    comodin = aceptadas.get("*", 0.0)
+    candidatas = []
+    if brotli_habilitado and brotli is not None:
+        candidatas.append(("br", aceptadas.get("br", comodin)))
+    candidatas.append(("gzip", aceptadas.get("gzip", comodin)))
+    codificacion, calidad = max(candidatas, key=lambda c: c[1])
+    return codificacion if calidad > 0 else None
+
+
+class _Compresor:
+    def __init__(self, codificacion: str, nivel_gzip: int, calidad_brotli: int):
+        self.codificacion = codificacion
+        if codificacion == "br":
+            self._br = brotli.Compressor(quality=calidad_brotli)
+        else:
+            self._gzip = zlib.compressobj(nivel_gzip, zlib.DEFLATED, 31)
+
+    def bloque(self, datos: bytes) -> bytes:
+        """Comprime y vacía el compresor para que el bloque se pueda decodificar al llegar."""
+        if self.codificacion == "br":
+            return self._br.process(datos) + self._br.flush()
+        return self._gzip.compress(datos) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def final(self, datos: bytes = b"") -> bytes:
+        if self.codificacion == "br":
+            return self._br.process(datos) + self._br.finish()
+        return self._gzip.compress(datos) + self._gzip.flush(zlib.Z_FINISH)
+
+
+class CompresionMiddleware:
+    """Middleware ASGI de compresión; ver el docstring del módulo."""
+
+    def __init__(self, app, minimum_size: int = None, gzip_level: int = None,
+                 brotli_quality: int = None, brotli_enabled: bool = None):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else settings.COMPRESSION_MIN_SIZE
+        self.gzip_level = gzip_level if gzip_level is not None else settings.COMPRESSION_GZIP_LEVEL
+        self.brotli_quality = brotli_quality if brotli_quality is not None else settings.COMPRESSION_BROTLI_QUALITY
+        self.brotli_enabled = brotli_enabled if brotli_enabled is not None else settings.COMPRESSION_BROTLI_ENABLED
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for nombre, valor in scope["headers"]:
+            if nombre == b"accept-encoding":
+                accept_encoding = valor.decode("latin-1")
+                break
+        codificacion = elegir_codificacion(accept_encoding, self.brotli_enabled)
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+        await _RespuestaComprimida(self, codificacion, send).ejecutar(scope, receive)
+
+
+class _RespuestaComprimida:
+    def __init__(self, middleware: CompresionMiddleware, codificacion: str, send):
+        self.middleware = middleware
+        self.codificacion = codificacion
+        self.send = send
+        self.inicio: Optional[dict] = None
+        self.pendiente: List[bytes] = []
+        self.tamano_pendiente = 0
+        self.compresor: Optional[_Compresor] = None
+        # None mientras no se decide; luego True (comprimir) o False (pasar tal cual)
+        self.comprimir: Optional[bool] = None
+
+    async def ejecutar(self, scope, receive) -> None:
+        await self.middleware.app(scope, receive, self.enviar)
+
+    def _comprimible(self, mensaje: dict) -> bool:
+        if mensaje["status"] < 200 or mensaje["status"] in (204, 206, 304):
+            return False
+        encabezados = {k.lower(): v for k, v in mensaje.get("headers", [])}
+        if b"content-encoding" in encabezados or b"content-range" in encabezados:
+            return False
+        tipo = encabezados.get(b"content-type", b"").decode("latin-1").lower()
+        if tipo.startswith(TIPOS_EXCLUIDOS):
+            return False
+        return tipo.startswith(TIPOS_COMPRIMIBLES)
+
+    async def enviar(self, mensaje: dict) -> None:
+        if mensaje["type"] == "http.response.start":
+            if not self._comprimible(mensaje):
+                self.comprimir = False
+                await self.send(mensaje)
+                return
+            self.inicio = mensaje
+            return
+        if mensaje["type"] != "http.response.body" or self.comprimir is False:
+            await self.send(mensaje)
+            return
+
+        cuerpo = mensaje.get("body", b"")
+        mas = mensaje.get("more_body", False)
+        if self.comprimir:
+            datos = self.compresor.bloque(cuerpo) if mas else self.compresor.final(cuerpo)
+            if datos or not mas:
+                await self.send({"type": "http.response.body", "body": datos, "more_body": mas})
+            return
+
+        # Todavía no se decide: se acumula hasta llegar al umbral o al final de la respuesta
+        self.pendiente.append(cuerpo)
+        self.tamano_pendiente += len(cuerpo)
+        if mas and self.tamano_pendiente < self.middleware.minimum_size:
+            return
+        acumulado = b"".join(self.pendiente)
+        self.pendiente = []
+        if self.tamano_pendiente < self.middleware.minimum_size:
+            self.comprimir = False
+            await self._enviar_inicio(None)
+            await self.send({"type": "http.response.body", "body": acumulado, "more_body": False})
+            return
+
+        self.comprimir = True
+        self.compresor = _Compresor(self.codificacion, self.middleware.gzip_level, self.middleware.brotli_quality)
+        if mas:
+            await self._enviar_inicio(b"")
+            await self.send({"type": "http.response.body", "body": self.compresor.bloque(acumulado), "more_body": True})
+        else:
+            datos = self.compresor.final(acumulado)
+            await self._enviar_inicio(datos)
+            await self.send({"type": "http.response.body", "body": datos, "more_body": False})
+
+    async def _enviar_inicio(self, comprimido: Optional[bytes]) -> None:
+        """
+        Envía el inicio retenido. `comprimido` es None si la respuesta va sin comprimir,
+        b"" si va comprimida por partes o el cuerpo completo comprimido.
+        """
+        encabezados = [(k, v) for k, v in self.inicio.get("headers", []) if k.lower() not in (b"vary", b"content-length", b"etag")]
+        originales = {k.lower(): v for k, v in self.inicio.get("headers", [])}
+        vary = originales.get(b"vary")
+        encabezados.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        etag = originales.get(b"etag")
+        if comprimido is None:
+            if b"content-length" in originales:
+                encabezados.append((b"content-length", originales[b"content-length"]))
+            if etag:
+                encabezados.append((b"etag", etag))
+        else:
+            encabezados.append((b"content-encoding", self.codificacion.encode("latin-1")))
+            if comprimido:
+                encabezados.append((b"content-length", str(len(comprimido)).encode("latin-1")))
+            if etag:
+                # El cuerpo ya no es idéntico byte a byte: la etiqueta pasa a ser débil
+                encabezados.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+        await self.send({**self.inicio, "headers": encabezados})
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # librería en Python que permite cargar variables de entorno
@@ -21,6 +22,41 @@ class Settings(BaseSettings):
     DB_NAME: str = os.getenv("DB_NAME", "")
 
     DATABASE_URL: str = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # Misma base de datos con el driver asíncrono (aiomysql) para los endpoints async
+    ASYNC_DATABASE_URL: str = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+    # Réplica de solo lectura opcional para dashboard, búsquedas y listados (vacío = usar la primaria)
+    DATABASE_READ_URL: str = os.getenv("DATABASE_READ_URL", "")
+    ASYNC_DATABASE_READ_URL: str = os.getenv("ASYNC_DATABASE_READ_URL", DATABASE_READ_URL.replace("+pymysql", "+aiomysql"))
+    # Segundos durante los cuales un usuario que acaba de escribir sigue leyendo de la primaria.
+    # Se recuerda por proceso; entre workers el cliente envía `X-Consistencia: primaria`
+    READ_YOUR_WRITES_SECONDS: int = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+    # Pool de conexiones (aplica al motor síncrono y al asíncrono)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Imprime cada sentencia SQL con sus parámetros; solo para depuración
+    DB_ECHO: bool = os.getenv("DB_ECHO", "False").lower() == "true"
+    # Tiempo máximo de cada SELECT en milisegundos (max_execution_time de MySQL); 0 = sin límite
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    # Registro de consultas lentas: umbral en milisegundos (0 = desactivado), huellas conservadas y EXPLAIN automático
+    DB_SLOW_QUERY_MS: int = int(os.getenv("DB_SLOW_QUERY_MS", "500"))
+    DB_SLOW_QUERY_TOP: int = int(os.getenv("DB_SLOW_QUERY_TOP", "50"))
+    DB_SLOW_QUERY_EXPLAIN: bool = os.getenv("DB_SLOW_QUERY_EXPLAIN", "True").lower() == "true"
+
+    # Perfilado por petición (encabezado X-Profile o ?profile=1, solo superadministradores).
+    # Desactivado no agrega el middleware.
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+    PROFILING_MAX_PERFILES: int = int(os.getenv("PROFILING_MAX_PERFILES", "20"))
+
+    # Logging: nivel, formato ("json" o "texto") y una de cada cuántas filas se registra en DEBUG en las cargas
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_ROW_SAMPLE: int = int(os.getenv("LOG_ROW_SAMPLE", "1000"))
     
     # Configuración JWT
     # jwt_secret: str = os.getenv("JWT_SECRET")
@@ -40,6 +76,62 @@ class Settings(BaseSettings):
     use_credentials: bool = os.getenv("USE_CREDENTIALS", "True").lower() == "true"
     validate_certs: bool = os.getenv("VALIDATE_CERTS", "True").lower() == "true"
 
+    # Plantillas de correo (se compilan una sola vez al iniciar la aplicación)
+    email_templates_dir: str = os.getenv("EMAIL_TEMPLATES_DIR", "./templates/email")
+    email_templates_cache_dir: str = os.getenv("EMAIL_TEMPLATES_CACHE_DIR", "")
+
+    # Calendario de festivos en memoria (segundos antes de recargar desde la BD)
+    calendario_ttl_seconds: int = int(os.getenv("CALENDARIO_TTL_SECONDS", "3600"))
+
+    # Catálogo de competencias y resultados de aprendizaje en memoria (segundos antes de recargar)
+    catalogo_ttl_seconds: int = int(os.getenv("CATALOGO_TTL_SECONDS", "3600"))
+
+    # Capacidad de horas lectivas (dashboard)
+    capacidad_cache_ttl_seconds: int = int(os.getenv("CAPACIDAD_CACHE_TTL_SECONDS", "300"))
+    capacidad_horas_max_dia: int = int(os.getenv("CAPACIDAD_HORAS_MAX_DIA", "8"))
+
+    # Exportación Parquet de grupos: directorio de los archivos, filas por row group,
+    # compresión, vigencia del archivo en caché y número máximo de archivos guardados
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "gestion_formacion_exportaciones")
+    EXPORT_ROW_GROUP_SIZE: int = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "50000"))
+    EXPORT_PARQUET_COMPRESSION: str = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+    EXPORT_CACHE_TTL_SECONDS: int = int(os.getenv("EXPORT_CACHE_TTL_SECONDS", "3600"))
+    EXPORT_MAX_ARCHIVOS: int = int(os.getenv("EXPORT_MAX_ARCHIVOS", "20"))
+
+    # Caché HTTP de catálogos (ETag / Last-Modified): los validadores cambian al menos
+    # cada tantos segundos aunque no haya escrituras en este proceso
+    HTTP_CACHE_TTL_SECONDS: int = int(os.getenv("HTTP_CACHE_TTL_SECONDS", "300"))
+
+    # Compresión de respuestas (brotli si el cliente lo acepta, si no gzip); por debajo
+    # de COMPRESSION_MIN_SIZE bytes la respuesta va sin comprimir
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_ENABLED: bool = os.getenv("COMPRESSION_BROTLI_ENABLED", "True").lower() == "true"
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+    # Cargas de archivos con Idempotency-Key: cuánto se guarda el resultado para los
+    # reintentos y cuántas claves como máximo
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_MAX_ITEMS: int = int(os.getenv("IDEMPOTENCY_MAX_ITEMS", "500"))
+
+    # Cargas PE-04 concurrentes: espera máxima por el turno de un centro, GET_LOCK de
+    # MySQL entre workers, tamaño del lote por commit y reintentos por deadlock
+    IMPORT_LOCK_TIMEOUT_SECONDS: int = int(os.getenv("IMPORT_LOCK_TIMEOUT_SECONDS", "600"))
+    IMPORT_DISTRIBUTED_LOCK: bool = os.getenv("IMPORT_DISTRIBUTED_LOCK", "True").lower() == "true"
+    IMPORT_CHUNK_SIZE: int = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+    IMPORT_DEADLOCK_RETRIES: int = int(os.getenv("IMPORT_DEADLOCK_RETRIES", "3"))
+    # Cargas que pueden esperar turno a la vez; cada una ocupa un hilo del threadpool
+    # (40 por defecto) mientras espera, así que las siguientes reciben 409 de inmediato
+    IMPORT_MAX_WAITING: int = int(os.getenv("IMPORT_MAX_WAITING", "8"))
+
+    # Cargas de archivos por partes (/files/cargas): directorio de las partes, tamaño
+    # máximo de cada parte y del archivo, y vigencia de una carga sin actividad
+    UPLOAD_SPOOL_DIR: str = os.getenv("UPLOAD_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "gestion_formacion_cargas")
+    UPLOAD_PART_MAX_BYTES: int = int(os.getenv("UPLOAD_PART_MAX_BYTES", str(16 * 1024 * 1024)))
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+    UPLOAD_TTL_SECONDS: int = int(os.getenv("UPLOAD_TTL_SECONDS", "86400"))
+
     class Config:
         env_file = ".env"
 
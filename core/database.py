@@ -1,25 +1,77 @@
 import logging
-from typing import Generator
-from sqlalchemy import create_engine, text, MetaData
+import threading
+import time
+from typing import AsyncGenerator, Callable, Dict, Generator, Iterable, Iterator, Optional
+from fastapi import Request
+from sqlalchemy import create_engine, event, text, MetaData
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import SQLAlchemyError, OperationalError, DisconnectionError
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, DisconnectionError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from core.config import settings
+from core.diagnostics import slow_query_log
 
 # Configurar el módulo de logging de Python y se usa para crear un registrador de eventos (logger)
 logger = logging.getLogger(__name__)
 
+class _PoolWaitStatsMixin:
+    """
+    Mide cuánto esperan las peticiones para obtener una conexión del pool.
+    El tiempo incluye la espera en la cola y, si hace falta, la apertura de la conexión.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self._wait_stats = {"checkouts": 0, "wait_total_s": 0.0, "wait_max_s": 0.0, "timeouts": 0}
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._wait_lock:
+                self._wait_stats["timeouts"] += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._wait_lock:
+                self._wait_stats["checkouts"] += 1
+                self._wait_stats["wait_total_s"] += espera
+                self._wait_stats["wait_max_s"] = max(self._wait_stats["wait_max_s"], espera)
+
+    def wait_stats(self) -> dict:
+        with self._wait_lock:
+            stats = dict(self._wait_stats)
+        stats["wait_avg_ms"] = round(stats["wait_total_s"] * 1000 / stats["checkouts"], 3) if stats["checkouts"] else 0.0
+        stats["wait_max_ms"] = round(stats.pop("wait_max_s") * 1000, 3)
+        stats["wait_total_ms"] = round(stats.pop("wait_total_s") * 1000, 3)
+        return stats
+
+
+class InstrumentedQueuePool(_PoolWaitStatsMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_PoolWaitStatsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_pool_options = dict(
+    pool_pre_ping=settings.DB_POOL_PRE_PING,  # Verifica que las conexiones estén activas antes de usarlas
+    pool_recycle=settings.DB_POOL_RECYCLE,    # Recicla conexiones para evitar el error "connection has been closed"
+    pool_size=settings.DB_POOL_SIZE,          # Número máximo de conexiones permanentes en el pool
+    max_overflow=settings.DB_MAX_OVERFLOW,    # Conexiones adicionales permitidas temporalmente cuando el pool está lleno
+    pool_timeout=settings.DB_POOL_TIMEOUT,    # Tiempo máximo de espera para obtener una conexión del pool (en segundos)
+)
+
 # Crear el motor de base de datos con configuraciones óptimas
 engine = create_engine(
     settings.DATABASE_URL,
-    echo=True,           # Activar o desactivar el modo debug para imprimir en consola todas las sentencias SQL
-    pool_pre_ping=True,  # Verifica que las conexiones estén activas antes de usarlas
-    pool_recycle=3600,   # Recicla conexiones después de una hora para evitar el error "connection has been closed"
-    pool_size=10,        # Número máximo de conexiones permanentes en el pool
-    max_overflow=20,     # Conexiones adicionales permitidas temporalmente cuando el pool está lleno
-    pool_timeout=30,     # Tiempo máximo de espera para obtener una conexión del pool (en segundos)
-    poolclass=QueuePool  # Clase de pool para manejo eficiente de conexiones
+    echo=settings.DB_ECHO,  # Imprimir en consola todas las sentencias SQL (solo para depuración)
+    poolclass=InstrumentedQueuePool,
+    **_pool_options
 )
 
 # Crear la fábrica de sesiones
@@ -28,6 +80,99 @@ engine = create_engine(
 # - bind=engine: Vincula la sesión al motor creado anteriormente
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor asíncrono para los endpoints de lectura más consultados.
+# No ocupa hilos del threadpool mientras espera a MySQL, así que la concurrencia
+# queda limitada solo por el tamaño de su propio pool.
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    echo=settings.DB_ECHO,
+    poolclass=InstrumentedAsyncQueuePool,
+    **_pool_options
+)
+
+# expire_on_commit=False: los resultados siguen disponibles después del commit sin volver a consultar
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Réplica de lectura opcional. Si no está configurada, las sesiones de lectura usan la primaria.
+if settings.DATABASE_READ_URL:
+    read_engine = create_engine(
+        settings.DATABASE_READ_URL,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedQueuePool,
+        **_pool_options
+    )
+    async_read_engine = create_async_engine(
+        settings.ASYNC_DATABASE_READ_URL,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedAsyncQueuePool,
+        **_pool_options
+    )
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False)
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+    ReadSessionLocal = SessionLocal
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+
+def _set_statement_timeout(dbapi_connection, connection_record):
+    # max_execution_time solo existe en MySQL y solo aplica a SELECT
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SET SESSION max_execution_time = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+    finally:
+        cursor.close()
+
+
+if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+    _engines = {id(e): e for e in (engine, async_engine.sync_engine, read_engine, async_read_engine.sync_engine)}
+    for _engine in _engines.values():
+        if _engine.dialect.name == "mysql":
+            event.listen(_engine, "connect", _set_statement_timeout)
+
+# Registro de consultas lentas; el EXPLAIN de las sentencias asíncronas se ejecuta
+# con el motor síncrono que apunta a la misma base de datos
+if settings.DB_SLOW_QUERY_MS > 0:
+    slow_query_log.instrument(engine)
+    slow_query_log.instrument(async_engine.sync_engine, explain_engine=engine)
+    if read_engine is not engine:
+        slow_query_log.instrument(read_engine)
+        slow_query_log.instrument(async_read_engine.sync_engine, explain_engine=read_engine)
+
+
+# Encabezado y cookie con los que un cliente pide leer de la primaria (read-your-writes)
+CONSISTENCIA_HEADER = "x-consistencia"
+CONSISTENCIA_COOKIE = "leer_primaria"
+
+# Usuarios que escribieron hace poco -> instante (monotonic) hasta el que leen de la primaria.
+# Lo llena ReadYourWritesMiddleware; es por proceso.
+_primaria_hasta: Dict[int, float] = {}
+
+
+def fijar_primaria(id_usuario: int, segundos: float) -> None:
+    """Envía a la primaria las lecturas de `id_usuario` durante `segundos`."""
+    ahora = time.monotonic()
+    if len(_primaria_hasta) > 1000:
+        for usuario, hasta in list(_primaria_hasta.items()):
+            if hasta <= ahora:
+                _primaria_hasta.pop(usuario, None)
+    _primaria_hasta[id_usuario] = ahora + segundos
+
+
+def hay_usuarios_en_primaria() -> bool:
+    return bool(_primaria_hasta)
+
+
+def _usuario_en_primaria(id_usuario: Optional[int]) -> bool:
+    hasta = _primaria_hasta.get(id_usuario) if id_usuario is not None else None
+    if hasta is None:
+        return False
+    if hasta <= time.monotonic():
+        _primaria_hasta.pop(id_usuario, None)
+        return False
+    return True
+
 # Declarar la base para los modelos ORM
 Base = declarative_base()
 
@@ -63,6 +208,133 @@ def get_db() -> Generator:
         # Esto es esencial para evitar fugas de memoria y conexiones abiertas.
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependencia equivalente a `get_db` que entrega una sesión asíncrona.
+    
+    Se usa en endpoints `async def`, que se ejecutan directamente en el event loop
+    en lugar del threadpool.
+    
+    Example:
+        ```python
+        @app.get("/items/")
+        async def read_items(db: AsyncSession = Depends(get_async_db)):
+            result = await db.execute(text("SELECT * FROM item"))
+            return result.mappings().all()
+        ```
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Error de base de datos: {str(e)}")
+            raise
+
+
+def debe_leer_de_primaria(request: Request) -> bool:
+    """
+    Read-your-writes: la petición lee de la primaria si lo pide explícitamente con el
+    encabezado `X-Consistencia: primaria`, si su usuario escribió hace menos de
+    READ_YOUR_WRITES_SECONDS en este proceso (ReadYourWritesMiddleware), o si trae la
+    cookie que ese middleware pone para los clientes que envían cookies.
+    """
+    if request.headers.get(CONSISTENCIA_HEADER, "").lower() == "primaria":
+        return True
+    if _usuario_en_primaria(request.scope.get("state", {}).get("id_usuario")):
+        return True
+    return CONSISTENCIA_COOKIE in request.cookies
+
+
+def get_read_db(request: Request) -> Generator:
+    """
+    Igual que `get_db` pero para consultas de solo lectura (dashboard, búsquedas, listados).
+    Usa la réplica configurada en DATABASE_READ_URL, salvo que la petición deba leer
+    de la primaria (ver `debe_leer_de_primaria`).
+    """
+    session_factory = SessionLocal if debe_leer_de_primaria(request) else ReadSessionLocal
+    db = session_factory()
+    try:
+        yield db
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error de base de datos (lectura): {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Versión asíncrona de `get_read_db`.
+    """
+    session_factory = AsyncSessionLocal if debe_leer_de_primaria(request) else AsyncReadSessionLocal
+    async with session_factory() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Error de base de datos (lectura): {str(e)}")
+            raise
+
+
+def iter_lotes(db, query, params: Optional[dict] = None, lote: int = 1000) -> Iterator[list]:
+    """
+    Ejecuta `query` con un cursor del lado del servidor (stream_results; SSCursor en
+    PyMySQL) y entrega las filas en listas de hasta `lote` filas, sin materializar
+    todo el resultado.
+    """
+    result = db.execute(query, params or {}, execution_options={"stream_results": True, "yield_per": lote})
+    yield from result.mappings().partitions(lote)
+
+
+def iter_con_sesion(consulta: Callable[..., Iterable], session_factory=None, **kwargs) -> Iterator:
+    """
+    Recorre `consulta(db, **kwargs)` con una sesión propia que se cierra al terminar.
+
+    Para las respuestas que se transmiten (StreamingResponse): FastAPI cierra las
+    dependencias con `yield` (como `get_db`) antes de enviar el cuerpo, así que el
+    generador no puede usar la sesión de la petición.
+    """
+    db = (session_factory or ReadSessionLocal)()
+    try:
+        yield from consulta(db, **kwargs)
+    finally:
+        db.close()
+
+
+def _pool_stats(pool) -> dict:
+    stats = {
+        "pool": pool.__class__.__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "timeout_s": settings.DB_POOL_TIMEOUT,
+    }
+    if isinstance(pool, _PoolWaitStatsMixin):
+        stats.update(pool.wait_stats())
+    return stats
+
+
+def get_pool_stats() -> dict:
+    """
+    Estado actual de los pools de conexiones (síncrono y asíncrono):
+    conexiones prestadas, en reposo, overflow y tiempos de espera acumulados.
+    """
+    stats = {
+        "sync": _pool_stats(engine.pool),
+        "async": _pool_stats(async_engine.sync_engine.pool),
+        "echo": settings.DB_ECHO,
+        "statement_timeout_ms": settings.DB_STATEMENT_TIMEOUT_MS,
+    }
+    if read_engine is not engine:
+        stats["read_sync"] = _pool_stats(read_engine.pool)
+        stats["read_async"] = _pool_stats(async_read_engine.sync_engine.pool)
+    return stats
+
+
 def check_database_connection() -> bool:
     """
     Verifica la conexión a la base de datos.
@@ -0,0 +1,212 @@
+"""
+Registro de consultas lentas con captura automática de EXPLAIN.
+
+Cada sentencia que supera `DB_SLOW_QUERY_MS` se agrupa por su huella (el SQL sin
+literales ni parámetros) y se guarda con sus parámetros de ejemplo. La primera vez
+que aparece una huella se ejecuta su EXPLAIN en un hilo aparte, con una conexión
+propia, para no sumar latencia a la petición que la disparó.
+
+Solo se conservan las `DB_SLOW_QUERY_TOP` huellas más lentas y las últimas capturas
+en un búfer circular; ambos se consultan en GET /diagnostico/consultas-lentas.
+"""
+import logging
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Opción de ejecución que marca las sentencias del propio diagnóstico (no se registran)
+_OPCION_DIAGNOSTICO = "diagnostico"
+_MAX_VALOR_PARAMETRO = 200
+
+_RE_COMENTARIOS = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_RE_CADENAS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_RE_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_PARAMETROS = re.compile(r"%\(\w+\)s|%s|\?|:\w+")
+_RE_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+_PREFIJO_EXPLAIN = {"mysql": "EXPLAIN ", "mariadb": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+
+
+def huella_sql(statement: str) -> str:
+    """
+    Normaliza una sentencia para agrupar las que solo difieren en valores:
+    quita comentarios, literales y parámetros, y colapsa listas IN (...).
+    """
+    sql = _RE_COMENTARIOS.sub(" ", statement)
+    sql = _RE_CADENAS.sub("?", sql)
+    sql = _RE_NUMEROS.sub("?", sql)
+    sql = _RE_PARAMETROS.sub("?", sql)
+    sql = _RE_LISTAS.sub("(...)", sql)
+    return _RE_ESPACIOS.sub(" ", sql).strip()
+
+
+def _resumir_parametros(parameters):
+    # Los parámetros se guardan solo como muestra; se recortan los valores largos
+    def recortar(valor):
+        texto = repr(valor)
+        return texto if len(texto) <= _MAX_VALOR_PARAMETRO else texto[:_MAX_VALOR_PARAMETRO] + "..."
+
+    if isinstance(parameters, dict):
+        return {str(k): recortar(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [recortar(v) for v in parameters]
+    return recortar(parameters)
+
+
+class SlowQueryLog:
+    """Huellas de las consultas más lentas y búfer de las últimas capturas."""
+
+    def __init__(self, umbral_ms: float, max_huellas: int = 50, max_recientes: int = 200, explain: bool = True):
+        self.umbral_ms = umbral_ms
+        self.max_huellas = max_huellas
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._huellas: Dict[str, dict] = {}
+        self._recientes = deque(maxlen=max_recientes)
+        self._explain_pendientes = set()
+        # Un solo hilo: los EXPLAIN se ejecutan de a uno y nunca compiten con las peticiones
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+
+    # ------------------------------------------------------------------
+    # Eventos de SQLAlchemy
+    # ------------------------------------------------------------------
+    def instrument(self, engine, explain_engine=None) -> None:
+        """
+        Registra los eventos en un Engine (para AsyncEngine usar .sync_engine).
+
+        Args:
+            explain_engine: Motor síncrono con el que se ejecuta el EXPLAIN; para un
+                motor asíncrono debe ser el síncrono que apunta a la misma base de datos
+        """
+        explain_engine = explain_engine or engine
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context._diagnostico_inicio = time.perf_counter()
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            inicio = getattr(context, "_diagnostico_inicio", None)
+            if inicio is None or context.execution_options.get(_OPCION_DIAGNOSTICO):
+                return
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            if duracion_ms >= self.umbral_ms:
+                self.registrar(statement, parameters, duracion_ms, executemany, explain_engine)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    # ------------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------------
+    def registrar(self, statement: str, parameters, duracion_ms: float, executemany: bool = False, explain_engine=None) -> None:
+        huella = huella_sql(statement)
+        ahora = datetime.now()
+        parametros = None if executemany else _resumir_parametros(parameters)
+        logger.warning(f"Consulta lenta ({duracion_ms:.0f} ms): {huella[:300]}")
+
+        with self._lock:
+            self._recientes.append({
+                "huella": huella,
+                "duracion_ms": round(duracion_ms, 2),
+                "parametros": parametros,
+                "fecha": ahora,
+            })
+            entrada = self._huellas.get(huella)
+            if entrada is None:
+                entrada = {
+                    "huella": huella,
+                    "sql": statement,
+                    "parametros": parametros,
+                    "ejecuciones": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "ultima_vez": ahora,
+                    "explain": None,
+                }
+                self._huellas[huella] = entrada
+                self._recortar()
+            entrada["ejecuciones"] += 1
+            entrada["total_ms"] += duracion_ms
+            entrada["ultima_vez"] = ahora
+            if duracion_ms > entrada["max_ms"]:
+                # Se guarda la muestra de la ejecución más lenta
+                entrada["max_ms"] = duracion_ms
+                entrada["sql"] = statement
+                entrada["parametros"] = parametros
+
+            pedir_explain = (
+                self.explain and explain_engine is not None and not executemany
+                and entrada["explain"] is None and huella not in self._explain_pendientes
+                and statement.lstrip()[:6].upper() == "SELECT"
+            )
+            if pedir_explain:
+                self._explain_pendientes.add(huella)
+
+        if pedir_explain:
+            self._executor.submit(self._ejecutar_explain, explain_engine, huella, statement, parameters)
+
+    def _recortar(self) -> None:
+        # Descarta la huella menos lenta cuando se supera el máximo
+        if len(self._huellas) > self.max_huellas:
+            menos_lenta = min(self._huellas.values(), key=lambda e: e["max_ms"])
+            del self._huellas[menos_lenta["huella"]]
+
+    def _ejecutar_explain(self, explain_engine, huella: str, statement: str, parameters) -> None:
+        prefijo = _PREFIJO_EXPLAIN.get(explain_engine.dialect.name, "EXPLAIN ")
+        try:
+            with explain_engine.connect() as conn:
+                conn = conn.execution_options(**{_OPCION_DIAGNOSTICO: True})
+                result = conn.exec_driver_sql(prefijo + statement, parameters or ())
+                plan = [{k: (v if isinstance(v, (int, float, str)) or v is None else str(v)) for k, v in row.items()}
+                        for row in result.mappings()]
+        except Exception as e:
+            logger.error(f"No se pudo obtener el EXPLAIN de una consulta lenta: {e}")
+            plan = [{"error": str(e)}]
+        with self._lock:
+            self._explain_pendientes.discard(huella)
+            if huella in self._huellas:
+                self._huellas[huella]["explain"] = plan
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def get_top(self, limit: Optional[int] = None) -> List[dict]:
+        """Huellas ordenadas de la más lenta a la menos lenta."""
+        with self._lock:
+            entradas = [dict(e) for e in self._huellas.values()]
+        for entrada in entradas:
+            entrada["promedio_ms"] = round(entrada["total_ms"] / entrada["ejecuciones"], 2)
+            entrada["total_ms"] = round(entrada["total_ms"], 2)
+            entrada["max_ms"] = round(entrada["max_ms"], 2)
+        entradas.sort(key=lambda e: e["max_ms"], reverse=True)
+        return entradas[:limit] if limit else entradas
+
+    def get_recientes(self, limit: Optional[int] = None) -> List[dict]:
+        """Últimas capturas, de la más reciente a la más antigua."""
+        with self._lock:
+            recientes = list(self._recientes)
+        recientes.reverse()
+        return recientes[:limit] if limit else recientes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._huellas.clear()
+            self._recientes.clear()
+
+
+slow_query_log = SlowQueryLog(
+    umbral_ms=settings.DB_SLOW_QUERY_MS,
+    max_huellas=settings.DB_SLOW_QUERY_TOP,
+    explain=settings.DB_SLOW_QUERY_EXPLAIN,
+)
@@ -1,11 +1,15 @@
+import logging
 import os
-from typing import List
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from pydantic import EmailStr, BaseModel
-from jinja2 import Template
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, Template, select_autoescape
 from core.config import settings
 import asyncio
 
+logger = logging.getLogger(__name__)
+
 
 class EmailSchema(BaseModel):
     email: List[EmailStr]
@@ -47,14 +51,83 @@ class EmailConfig:
             MAIL_SSL_TLS=self.MAIL_SSL_TLS,
             USE_CREDENTIALS=self.USE_CREDENTIALS,
             VALIDATE_CERTS=self.VALIDATE_CERTS,
-            TEMPLATE_FOLDER="./templates/email"
+            TEMPLATE_FOLDER=settings.email_templates_dir
         )
 
 
+class EmailTemplateRegistry:
+    """
+    Registro de plantillas de correo.
+
+    Las plantillas se cargan y compilan una sola vez (con caché de bytecode de Jinja2)
+    y se renderizan en el proceso, de modo que un envío masivo cuesta una compilación
+    y N renderizados.
+    """
+
+    def __init__(self, template_folder: str, cache_folder: Optional[str] = None):
+        bytecode_cache = FileSystemBytecodeCache(cache_folder) if cache_folder else FileSystemBytecodeCache()
+        self.env = Environment(
+            loader=FileSystemLoader(template_folder),
+            autoescape=select_autoescape(["html", "xml"]),
+            bytecode_cache=bytecode_cache,
+            auto_reload=False  # No revisar el disco en cada uso: las plantillas no cambian en caliente
+        )
+        self._templates: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+
+    def load_all(self) -> int:
+        """
+        Carga y compila todas las plantillas HTML de la carpeta configurada.
+
+        Returns:
+            int: Número de plantillas compiladas
+        """
+        templates = {
+            name: self.env.get_template(name)
+            for name in self.env.list_templates(extensions=["html"])
+        }
+        with self._lock:
+            self._templates = templates
+        return len(templates)
+
+    def get(self, template_name: str) -> Template:
+        """Retorna la plantilla compilada, compilándola si aún no se había cargado"""
+        template = self._templates.get(template_name)
+        if template is None:
+            template = self.env.get_template(template_name)
+            with self._lock:
+                self._templates[template_name] = template
+        return template
+
+    def render(self, template_name: str, template_data: dict = None) -> str:
+        """Renderiza una plantilla con los datos indicados"""
+        return self.get(template_name).render(template_data or {})
+
+    def render_many(self, template_name: str, contexts: Iterable[dict]) -> List[str]:
+        """
+        Renderiza la misma plantilla para muchos destinatarios.
+
+        Args:
+            template_name: Nombre del archivo de plantilla
+            contexts: Datos de cada destinatario
+
+        Returns:
+            List[str]: HTML renderizado, en el mismo orden de los contextos
+        """
+        template = self.get(template_name)
+        return [template.render(context) for context in contexts]
+
+
 # Instancia global de configuración
 email_config = EmailConfig()
 conf = email_config.get_config()
 
+# Registro global de plantillas (se compila en el arranque desde main.py)
+template_registry = EmailTemplateRegistry(
+    settings.email_templates_dir,
+    settings.email_templates_cache_dir or None
+)
+
 
 class EmailService:
     """Servicio para el envío de correos electrónicos"""
@@ -96,7 +169,7 @@ class EmailService:
             return True
             
         except Exception as e:
-            print(f"Error al enviar correo: {str(e)}")
+            logger.error(f"Error al enviar correo: {e}")
             return False
     
     async def send_template_email_async(
@@ -121,20 +194,50 @@ class EmailService:
             bool: True si el correo se envió exitosamente, False en caso contrario
         """
         try:
-            message = MessageSchema(
-                subject=subject,
-                recipients=recipients,
-                template_body=template_data or {},
-                subtype=MessageType.html,
-                attachments=attachments or []
-            )
-            
-            await self.fastmail.send_message(message, template_name=template_name)
-            return True
-            
+            body = template_registry.render(template_name, {"subject": subject, **(template_data or {})})
         except Exception as e:
-            print(f"Error al enviar correo con plantilla: {str(e)}")
+            logger.error(f"Error al renderizar la plantilla {template_name}: {e}")
             return False
+
+        return await self.send_email_async(recipients, subject, body, MessageType.html, attachments)
+
+    async def send_bulk_template_email_async(
+        self,
+        subject: str,
+        template_name: str,
+        recipients_data: List[Tuple[EmailStr, dict]],
+        max_concurrency: int = 5
+    ) -> int:
+        """
+        Envía la misma plantilla a muchos destinatarios, cada uno con sus propios datos.
+        La plantilla se compila una vez y se renderiza N veces en el proceso.
+        
+        Args:
+            subject: Asunto del correo
+            template_name: Nombre del archivo de plantilla
+            recipients_data: Lista de tuplas (correo, datos de la plantilla)
+            max_concurrency: Máximo de envíos simultáneos al servidor SMTP
+        
+        Returns:
+            int: Número de correos enviados exitosamente
+        """
+        if not recipients_data:
+            return 0
+
+        bodies = template_registry.render_many(
+            template_name,
+            ({"subject": subject, **(data or {})} for _, data in recipients_data)
+        )
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _send(recipient: EmailStr, body: str) -> bool:
+            async with semaphore:
+                return await self.send_email_async([recipient], subject, body)
+
+        results = await asyncio.gather(*(
+            _send(recipient, body) for (recipient, _), body in zip(recipients_data, bodies)
+        ))
+        return sum(1 for sent in results if sent)
     
     async def send_welcome_email(
         self,
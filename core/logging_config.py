@@ -0,0 +1,110 @@
+"""
+Configuración de logging de la aplicación.
+
+Los registros se encolan (QueueHandler) y un hilo aparte (QueueListener) los
+formatea y escribe en la consola, así que la escritura en stdout nunca ocurre en
+el hilo que atiende la petición. El formato es JSON (una línea por registro) o
+texto, según LOG_FORMAT, y el nivel se controla con LOG_LEVEL.
+
+Los campos pasados en `extra` se incluyen en el JSON:
+
+    logger.info("Etapa de carga completada", extra={"archivo": "pe04", "filas": 1200})
+"""
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from core.config import settings
+
+# Atributos propios de LogRecord; el resto son campos pasados en `extra`
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como un objeto JSON en una sola línea."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_RECORD and not clave.startswith("_"):
+                datos[clave] = valor
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            datos["excepcion"] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    # QueueHandler.prepare formatea el mensaje y descarta args/exc_info; aquí solo se
+    # resuelve el mensaje y se conserva el resto para que el listener lo formatee
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def setup_logging(level: Optional[str] = None, formato: Optional[str] = None) -> None:
+    """
+    Configura el logger raíz con un QueueHandler. Llamar una sola vez al iniciar;
+    las llamadas siguientes no hacen nada.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formato = (formato or settings.LOG_FORMAT).lower()
+    consola = logging.StreamHandler(sys.stdout)
+    if formato == "json":
+        consola.setFormatter(JsonFormatter())
+    else:
+        consola.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    cola: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [_QueueHandler(cola)]
+    root.setLevel((level or settings.LOG_LEVEL).upper())
+
+    _listener = QueueListener(cola, consola, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Detiene el hilo de escritura vaciando antes la cola."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class MuestreoFilas:
+    """
+    Diagnóstico por fila muestreado para los bucles de carga: registra en DEBUG la
+    primera fila y luego una de cada `cada` (LOG_ROW_SAMPLE). Los campos se leen de
+    la fila solo cuando se registra, así que fuera de la muestra el costo es una comparación.
+    """
+
+    def __init__(self, logger: logging.Logger, etapa: str, cada: Optional[int] = None):
+        self.logger = logger
+        self.etapa = etapa
+        self.cada = max(1, cada or settings.LOG_ROW_SAMPLE)
+        self.activo = logger.isEnabledFor(logging.DEBUG)
+
+    def registrar(self, indice: int, fila, *campos: str) -> None:
+        if self.activo and indice % self.cada == 0:
+            datos = {campo: fila.get(campo) for campo in campos}
+            self.logger.debug(f"Carga: fila {indice} de {self.etapa}", extra={"etapa": self.etapa, "fila": indice, **datos})
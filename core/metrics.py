@@ -0,0 +1,199 @@
+"""
+Métricas en formato Prometheus.
+
+- Latencia de cada petición HTTP por plantilla de ruta (`/grupos/{cod_ficha}`, no la URL concreta).
+- Duración de cada sentencia SQL, etiquetada con la función de app/crud (o app/services)
+  que la ejecutó, mediante los eventos before/after_cursor_execute de SQLAlchemy.
+- Duración, filas y resultado de cada etapa de las cargas de archivos (`medir_etapa`).
+
+Se exponen en GET /metrics. Con varios workers de uvicorn/gunicorn, definir
+PROMETHEUS_MULTIPROC_DIR para que cada proceso escriba sus métricas en disco.
+"""
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from greenlet import getcurrent
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# Módulos cuyas funciones se usan como etiqueta de las consultas SQL
+_MODULOS_CONSULTA = ("app.crud.", "app.services.")
+
+HTTP_LATENCIA = Histogram(
+    "http_request_duration_seconds",
+    "Duración de las peticiones HTTP por plantilla de ruta",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+SQL_LATENCIA = Histogram(
+    "db_query_duration_seconds",
+    "Duración de las sentencias SQL por función de crud",
+    ["funcion", "operacion"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+CARGA_ETAPA_LATENCIA = Histogram(
+    "carga_etapa_duration_seconds",
+    "Duración de cada etapa de las cargas de archivos",
+    ["archivo", "etapa"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+CARGA_ETAPAS = Counter(
+    "carga_etapas_total",
+    "Etapas de carga ejecutadas por resultado (ok / error)",
+    ["archivo", "etapa", "resultado"],
+)
+
+CARGA_FILAS = Counter(
+    "carga_filas_total",
+    "Filas procesadas por etapa de carga",
+    ["archivo", "etapa"],
+)
+
+
+# ----------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------
+class MetricsMiddleware:
+    """Registra la latencia de cada petición con la plantilla de la ruta que la atendió."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # FastAPI deja la ruta resuelta en el scope; sin ruta (404) se agrupa para no crear una serie por URL
+            route = scope.get("route")
+            plantilla = getattr(route, "path", None) or "sin_ruta"
+            HTTP_LATENCIA.labels(scope["method"], plantilla, str(status["code"])).observe(time.perf_counter() - inicio)
+
+
+def _registry() -> CollectorRegistry:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_endpoint(request) -> Response:
+    """Exposición de las métricas en el formato de texto de Prometheus."""
+    return Response(generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
+# ----------------------------------------------------------------------
+# SQL
+# ----------------------------------------------------------------------
+def _nombre_funcion(codigo, modulo: str) -> str:
+    return f"{modulo.rsplit('.', 1)[-1]}.{codigo.co_name}"
+
+
+def _funcion_en_pila(frame) -> Optional[str]:
+    while frame is not None:
+        modulo = frame.f_globals.get("__name__", "")
+        if modulo.startswith(_MODULOS_CONSULTA):
+            return _nombre_funcion(frame.f_code, modulo)
+        frame = frame.f_back
+    return None
+
+
+def _funcion_consulta() -> str:
+    """Función de app/crud (o app/services) que ejecutó la sentencia en curso."""
+    # Motor síncrono: la función está en la pila del hilo actual
+    funcion = _funcion_en_pila(sys._getframe(1))
+    if funcion is None:
+        # Motor asíncrono: la sentencia corre en un greenlet hijo; la corrutina que
+        # hizo el await está suspendida en la pila del greenlet padre
+        padre = getcurrent().parent
+        if padre is not None:
+            funcion = _funcion_en_pila(padre.gr_frame)
+    return funcion or "otra"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_inicio = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_metrics_inicio", None)
+    if inicio is None:
+        return
+    duracion = time.perf_counter() - inicio
+    funcion = _funcion_consulta()
+    operacion = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?"
+    SQL_LATENCIA.labels(funcion, operacion).observe(duracion)
+
+
+def instrument_engine(engine) -> None:
+    """Registra los eventos de temporización en un Engine (para AsyncEngine usar .sync_engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ----------------------------------------------------------------------
+# Cargas de archivos
+# ----------------------------------------------------------------------
+class _Etapa:
+    __slots__ = ("filas",)
+
+    def __init__(self):
+        self.filas = 0
+
+
+@contextmanager
+def medir_etapa(archivo: str, etapa: str):
+    """
+    Mide una etapa de una carga de archivo y emite un único registro de resumen
+    (archivo, etapa, filas, duración y resultado) al terminarla.
+
+    Example:
+        ```python
+        with medir_etapa("pe04", "grupos") as e:
+            resultado = upsert_grupos_bulk(db, df_grupos)
+            e.filas = len(df_grupos)
+        ```
+    """
+    registro = _Etapa()
+    resultado = "error"
+    inicio = time.perf_counter()
+    try:
+        yield registro
+        resultado = "ok"
+    finally:
+        duracion = time.perf_counter() - inicio
+        CARGA_ETAPAS.labels(archivo, etapa, resultado).inc()
+        CARGA_ETAPA_LATENCIA.labels(archivo, etapa).observe(duracion)
+        if registro.filas:
+            CARGA_FILAS.labels(archivo, etapa).inc(registro.filas)
+        logger.log(
+            logging.INFO if resultado == "ok" else logging.ERROR,
+            f"Carga {archivo}: etapa {etapa} {resultado}",
+            extra={"archivo": archivo, "etapa": etapa, "filas": registro.filas,
+                   "duracion_ms": round(duracion * 1000, 2), "resultado": resultado},
+        )
@@ -0,0 +1,59 @@
+from typing import Optional
+
+from core.config import settings
+from core.database import CONSISTENCIA_COOKIE, fijar_primaria, hay_usuarios_en_primaria
+from core.security import verify_token
+
+# Métodos que no modifican datos
+METODOS_LECTURA = {"GET", "HEAD", "OPTIONS"}
+
+
+def _id_usuario(scope) -> Optional[int]:
+    for nombre, valor in scope["headers"]:
+        if nombre == b"authorization":
+            esquema, _, token = valor.decode("latin-1").partition(" ")
+            if esquema.lower() == "bearer" and token:
+                return verify_token(token)
+            return None
+    return None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Después de una escritura exitosa (POST/PUT/PATCH/DELETE con estado < 400), las
+    lecturas del mismo usuario van a la primaria durante READ_YOUR_WRITES_SECONDS, para
+    que vea sus propios cambios aunque la réplica tenga retraso (ver `debe_leer_de_primaria`).
+
+    - El frontend se autentica con token Bearer y no envía cookies: el usuario se toma
+      del JWT y se recuerda en este proceso (`fijar_primaria`).
+    - Para clientes que sí envían cookies se agrega además una cookie de vida corta.
+    - Con varios workers la lectura puede caer en otro proceso que no vio la escritura;
+      el cliente que necesite la garantía entre workers envía `X-Consistencia: primaria`.
+    """
+
+    def __init__(self, app, max_age: int = None):
+        self.app = app
+        self.max_age = max_age if max_age is not None else settings.READ_YOUR_WRITES_SECONDS
+        self._cookie = f"{CONSISTENCIA_COOKIE}=1; Max-Age={self.max_age}; Path=/; HttpOnly; SameSite=Lax".encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_age <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in METODOS_LECTURA:
+            # Solo hace falta decodificar el token si hay usuarios con lecturas en la primaria
+            if hay_usuarios_en_primaria():
+                scope.setdefault("state", {})["id_usuario"] = _id_usuario(scope)
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", self._cookie)]
+                id_usuario = _id_usuario(scope)
+                if id_usuario is not None:
+                    fijar_primaria(id_usuario, self.max_age)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
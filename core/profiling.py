@@ -0,0 +1,220 @@
+"""
+Perfilado por petición mediante muestreo de pilas.
+
+Solo está activo si PROFILING_ENABLED=True y la petición trae el encabezado
+`X-Profile: 1` o el parámetro `?profile=1` con el token de un superadministrador.
+Mientras dura la petición, un hilo toma cada PROFILING_INTERVAL_MS una foto de las
+pilas (`sys._current_frames`) y cuenta solo las que pertenecen a esa petición:
+
+- en el hilo del event loop, las pilas que pasan por el middleware de esta petición;
+- en los hilos del threadpool (endpoints y dependencias síncronas), los que están
+  ejecutando una tarea con el contexto de esta petición.
+
+El resultado se guarda en formato "collapsed" (una línea por pila con su número de
+muestras), compatible con flamegraph.pl y speedscope, y se consulta en
+GET /diagnostico/perfiles/{id}. La respuesta perfilada trae el encabezado X-Profile-Id.
+"""
+import contextvars
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from app.crud.users import get_user_by_id_async
+from core.config import settings
+from core.database import AsyncSessionLocal
+from core.security import verify_token
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+# Perfil de la petición en curso; los hilos del threadpool heredan una copia del contexto
+_perfil_actual: contextvars.ContextVar[Optional["PerfilPeticion"]] = contextvars.ContextVar("perfil_actual", default=None)
+
+_VALORES_ACTIVOS = {"1", "true", "si", "sí"}
+
+
+def _nombre_frame(frame) -> str:
+    modulo = frame.f_globals.get("__name__", "?")
+    return f"{modulo}:{frame.f_code.co_name}:{frame.f_lineno}"
+
+
+class PerfilPeticion:
+    """Muestras de una petición y el hilo que las toma."""
+
+    def __init__(self, metodo: str, ruta: str, intervalo_s: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.metodo = metodo
+        self.ruta = ruta
+        self.intervalo_s = intervalo_s
+        self.pilas: Counter = Counter()
+        self.muestras = 0
+        self.inicio = time.perf_counter()
+        self.fecha = datetime.now()
+        self.duracion_ms = 0.0
+        self.status: Optional[int] = None
+        self._loop_thread = threading.get_ident()
+        self._frame_raiz = None
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name=f"perfil-{self.id}", daemon=True)
+
+    def iniciar(self, frame_raiz) -> None:
+        self._frame_raiz = frame_raiz
+        self._hilo.start()
+
+    def detener(self) -> None:
+        self._detener.set()
+        self._hilo.join()
+        self.duracion_ms = round((time.perf_counter() - self.inicio) * 1000, 2)
+        self._frame_raiz = None
+
+    # ------------------------------------------------------------------
+    # Muestreo
+    # ------------------------------------------------------------------
+    def _muestrear(self) -> None:
+        propio = threading.get_ident()
+        while not self._detener.wait(self.intervalo_s):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == propio:
+                    continue
+                if thread_id == self._loop_thread:
+                    pila = self._pila_loop(frame)
+                else:
+                    pila = self._pila_worker(frame)
+                if pila:
+                    self.pilas[";".join(pila)] += 1
+                    self.muestras += 1
+
+    def _pila_loop(self, frame) -> Optional[List[str]]:
+        # El event loop atiende muchas peticiones: solo cuenta si la corrutina del
+        # middleware de esta petición está en la pila
+        pila = []
+        while frame is not None:
+            if frame is self._frame_raiz:
+                pila.reverse()
+                return pila
+            pila.append(_nombre_frame(frame))
+            frame = frame.f_back
+        return None
+
+    def _pila_worker(self, frame) -> Optional[List[str]]:
+        # En el threadpool, el frame de WorkerThread.run (anyio) tiene en `context` la
+        # copia del contexto de la petición que encargó la tarea
+        pila = []
+        while frame is not None:
+            if frame.f_code.co_name == "run" and frame.f_globals.get("__name__", "").startswith("anyio."):
+                context = frame.f_locals.get("context")
+                if context is not None and context.get(_perfil_actual) is self:
+                    pila.reverse()
+                    return pila
+                return None
+            pila.append(_nombre_frame(frame))
+            frame = frame.f_back
+        return None
+
+    # ------------------------------------------------------------------
+    # Resultado
+    # ------------------------------------------------------------------
+    def resumen(self) -> dict:
+        return {
+            "id": self.id,
+            "metodo": self.metodo,
+            "ruta": self.ruta,
+            "status": self.status,
+            "fecha": self.fecha,
+            "duracion_ms": self.duracion_ms,
+            "intervalo_ms": round(self.intervalo_s * 1000, 2),
+            "muestras": self.muestras,
+        }
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{pila} {n}" for pila, n in self.pilas.most_common())
+
+
+class PerfilStore:
+    """Últimos perfiles tomados (búfer circular)."""
+
+    def __init__(self, max_perfiles: int):
+        self._lock = threading.Lock()
+        self._perfiles = deque(maxlen=max_perfiles)
+
+    def agregar(self, perfil: PerfilPeticion) -> None:
+        with self._lock:
+            self._perfiles.append(perfil)
+
+    def listar(self) -> List[dict]:
+        with self._lock:
+            perfiles = list(self._perfiles)
+        return [p.resumen() for p in reversed(perfiles)]
+
+    def get(self, perfil_id: str) -> Optional[PerfilPeticion]:
+        with self._lock:
+            return next((p for p in self._perfiles if p.id == perfil_id), None)
+
+
+perfiles = PerfilStore(settings.PROFILING_MAX_PERFILES)
+
+
+class ProfilingMiddleware:
+    """
+    Perfila las peticiones de superadministradores que lo pidan. Para el resto solo
+    revisa un encabezado y el query string; el token se valida únicamente si se pidió perfil.
+    """
+
+    def __init__(self, app, intervalo_ms: Optional[float] = None):
+        self.app = app
+        self.intervalo_s = (intervalo_ms if intervalo_ms is not None else settings.PROFILING_INTERVAL_MS) / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._pedido(scope) or not await self._es_superadmin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        perfil = PerfilPeticion(scope["method"], scope["path"], self.intervalo_s)
+        token = _perfil_actual.set(perfil)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                perfil.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, perfil.id.encode("latin-1"))]
+            await send(message)
+
+        perfil.iniciar(sys._getframe())
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            perfil.detener()
+            _perfil_actual.reset(token)
+            perfiles.agregar(perfil)
+            logger.info(f"Perfil {perfil.id}: {perfil.metodo} {perfil.ruta} {perfil.duracion_ms} ms, {perfil.muestras} muestras")
+
+    @staticmethod
+    def _pedido(scope) -> bool:
+        for nombre, valor in scope["headers"]:
+            if nombre == PROFILE_HEADER:
+                return valor.decode("latin-1").strip().lower() in _VALORES_ACTIVOS
+        query = scope.get("query_string", b"")
+        if b"profile" not in query:
+            return False
+        valores = parse_qs(query.decode("latin-1")).get("profile", [])
+        return any(v.strip().lower() in _VALORES_ACTIVOS for v in valores)
+
+    @staticmethod
+    async def _es_superadmin(scope) -> bool:
+        headers: Dict[bytes, bytes] = dict(scope["headers"])
+        autorizacion = headers.get(b"authorization", b"").decode("latin-1")
+        if not autorizacion.lower().startswith("bearer "):
+            return False
+        user_id = verify_token(autorizacion[7:].strip())
+        if user_id is None:
+            return False
+        async with AsyncSessionLocal() as db:
+            user = await get_user_by_id_async(db, user_id)
+        return user is not None and user.estado and user.id_rol == 1
@@ -0,0 +1,140 @@
+"""
+Serialización rápida para los listados grandes.
+
+Cuando un endpoint devuelve filas (`RowMapping`) con `response_model=List[Modelo]`,
+FastAPI crea un modelo Pydantic por fila, corre los validadores (por ejemplo
+`format_time` para las columnas TIME) y luego lo vuelve a convertir a JSON.
+Las filas de la base de datos ya tienen los tipos correctos, así que para los
+endpoints que lo usan esa validación es trabajo repetido.
+
+`respuesta_rapida` construye la respuesta directamente:
+
+- Por cada modelo se calcula una sola vez la lista de campos y el conversor de cada
+  uno según su anotación (timedelta a time, Decimal a int/float); el resto de columnas
+  pasa sin tocar y las que no están en el modelo se descartan, igual que con
+  `response_model`.
+- El JSON se genera con orjson (`ORJSONResponse`), que serializa date/time nativamente.
+
+Los endpoints conservan `response_model` para la documentación de OpenAPI; al
+devolver una `Response` FastAPI no vuelve a validar el contenido.
+"""
+import types
+from datetime import time, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple, Type, Union, get_args, get_origin
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from sqlalchemy.engine import RowMapping
+
+from app.utils.helpers import hora_desde_timedelta
+
+
+def _entero(valor):
+    # SUM() y algunos COUNT() de MySQL llegan como Decimal
+    if valor is None or type(valor) is int:
+        return valor
+    return int(valor)
+
+
+def _real(valor):
+    if valor is None or type(valor) is float:
+        return valor
+    return float(valor)
+
+
+_CONVERSORES = {
+    int: _entero,
+    float: _real,
+    time: hora_desde_timedelta,
+}
+
+
+def _tipo_base(anotacion):
+    # Optional[X] -> X
+    if get_origin(anotacion) in (Union, types.UnionType):
+        argumentos = [a for a in get_args(anotacion) if a is not type(None)]
+        if len(argumentos) == 1:
+            return argumentos[0]
+    return anotacion
+
+
+@lru_cache(maxsize=None)
+def campos_modelo(modelo: Type[BaseModel]) -> Tuple[Tuple[str, Optional[Callable], Any], ...]:
+    """(campo, conversor o None, valor por defecto) de cada campo del modelo, en orden."""
+    campos = []
+    for nombre, campo in modelo.model_fields.items():
+        defecto = None if campo.is_required() else campo.get_default(call_default_factory=True)
+        campos.append((nombre, _CONVERSORES.get(_tipo_base(campo.annotation)), defecto))
+    return tuple(campos)
+
+
+def _desde_mappings(campos, filas) -> List[dict]:
+    # Todas las filas de un resultado comparten columnas: la posición de cada campo
+    # se resuelve una vez y cada fila se arma con un itemgetter sobre sus valores
+    posiciones = {columna: i for i, columna in enumerate(filas[0].keys())}
+    presentes = [nombre for nombre, _, _ in campos if nombre in posiciones]
+    convertir = [(nombre, conversor) for nombre, conversor, _ in campos if conversor is not None and nombre in posiciones]
+    faltantes = {nombre: defecto for nombre, _, defecto in campos if nombre not in posiciones}
+    if not presentes:
+        return [dict(faltantes) for _ in filas]
+    obtener = itemgetter(*(posiciones[nombre] for nombre in presentes))
+    if len(presentes) == 1:
+        valores_de = lambda fila: (obtener(tuple(fila.values())),)
+    else:
+        valores_de = lambda fila: obtener(tuple(fila.values()))
+    resultado = []
+    for fila in filas:
+        item = dict(zip(presentes, valores_de(fila)))
+        for nombre, conversor in convertir:
+            item[nombre] = conversor(item[nombre])
+        if faltantes:
+            item.update(faltantes)
+        resultado.append(item)
+    return resultado
+
+
+def filas_a_dicts(modelo: Type[BaseModel], filas: Iterable) -> List[dict]:
+    """Convierte filas (RowMapping o dict) en diccionarios con los campos del modelo."""
+    campos = campos_modelo(modelo)
+    filas = filas if isinstance(filas, Sequence) else list(filas)
+    if filas and isinstance(filas[0], RowMapping):
+        return _desde_mappings(campos, filas)
+    resultado = []
+    for fila in filas:
+        item = {}
+        for nombre, conversor, defecto in campos:
+            valor = fila.get(nombre, defecto)
+            item[nombre] = conversor(valor) if conversor is not None else valor
+        resultado.append(item)
+    return resultado
+
+
+def _por_defecto(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, timedelta):
+        return hora_desde_timedelta(valor).isoformat()
+    raise TypeError
+
+
+class RespuestaRapida(ORJSONResponse):
+    """`ORJSONResponse` que además acepta Decimal y timedelta sueltos."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_por_defecto, option=orjson.OPT_NON_STR_KEYS)
+
+
+def respuesta_rapida(modelo: Type[BaseModel], filas: Iterable, **extra) -> RespuestaRapida:
+    """
+    Respuesta JSON con las filas serializadas según `modelo`, sin validación Pydantic.
+    Sin `extra` el cuerpo es la lista; con `extra` es una página
+    (`{**extra, "items": [...]}`), como `GrupoPage`.
+    """
+    items = filas_a_dicts(modelo, filas)
+    if extra:
+        return RespuestaRapida({**extra, "items": items})
+    return RespuestaRapida(items)
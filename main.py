@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import users
@@ -13,11 +14,31 @@ from app.api import competencia
 from app.api import resultado_aprendizaje
 from app.api import festivos
 from app.api import notificacion
+from app.api import diagnostico
+from core.config import settings
+from core.email import template_registry
+from core.logging_config import setup_logging, shutdown_logging
+from core.compresion import CompresionMiddleware
+from core.database import async_engine, async_read_engine, engine, read_engine
+from core.metrics import MetricsMiddleware, instrument_engine, metrics_endpoint
+from core.middleware import ReadYourWritesMiddleware
+from core.profiling import ProfilingMiddleware
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Logging asíncrono (cola + hilo escritor) con el nivel y formato de la configuración
+    setup_logging()
+    # Compilar una sola vez todas las plantillas de correo
+    template_registry.load_all()
+    # Temporizar cada sentencia SQL (motores síncronos, asíncronos y réplicas)
+    for db_engine in (engine, async_engine.sync_engine, read_engine, async_read_engine.sync_engine):
+        instrument_engine(db_engine)
+    yield
+    shutdown_logging()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Incluir en el objeto app los routers
 app.include_router(users.router, prefix="/users", tags=["Users"])
@@ -33,6 +54,13 @@ app.include_router(competencia.router, prefix="/competencias", tags=["Competenci
 app.include_router(resultado_aprendizaje.router, prefix="/resultados", tags=["Resultados de Aprendizaje"])
 app.include_router(festivos.router, prefix="/festivos", tags=["Festivos"])
 app.include_router(notificacion.router, prefix="/notificaciones", tags=["Notificaciones"])
+app.include_router(diagnostico.router, prefix="/diagnostico", tags=["Diagnóstico"])
+
+# Métricas Prometheus: latencia por plantilla de ruta, expuestas en /metrics
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+# Después de una escritura, las lecturas del mismo cliente van a la primaria por unos segundos
+app.add_middleware(ReadYourWritesMiddleware)
 
 # Configuración de CORS para permitir todas las solicitudes desde cualquier origen
 app.add_middleware(
@@ -43,6 +71,17 @@ app.add_middleware(
     allow_headers=["*"],  # Permitir cualquier encabezado en las solicitudes
 )
 
+# Perfilado por petición; si está desactivado el middleware ni siquiera se agrega
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Compresión gzip/brotli de las respuestas de texto por encima del umbral configurado
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompresionMiddleware)
+
+# Se agrega al final para que mida también el tiempo de los demás middlewares
+app.add_middleware(MetricsMiddleware)
+
 @app.get("/")
 def read_root():
     return {
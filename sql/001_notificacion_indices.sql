@@ -0,0 +1,9 @@
+-- Índices para el feed de notificaciones y el contador de no leídas.
+--
+-- idx_notificacion_usuario_fecha: GET /notificaciones/ (WHERE id_usuario ORDER BY fecha_creacion DESC LIMIT)
+--   se resuelve recorriendo el índice sin ordenar en memoria.
+-- idx_notificacion_usuario_leida: GET /notificaciones/unread-count y PUT /notificaciones/leer-todas
+--   cuentan y actualizan solo las entradas del índice del usuario.
+
+CREATE INDEX idx_notificacion_usuario_fecha ON notificacion (id_usuario, fecha_creacion);
+CREATE INDEX idx_notificacion_usuario_leida ON notificacion (id_usuario, leida);